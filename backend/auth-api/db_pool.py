@@ -0,0 +1,288 @@
+"""
+Пул соединений PostgreSQL на процесс (копия yandex-llm/infrastructure/db_pool.py —
+функции деплоятся независимо). Создаётся лениво и переживает тёплые вызовы.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Set
+
+import psycopg2
+import psycopg2.extensions
+from psycopg2.pool import PoolError
+
+
+class CountingCursor(psycopg2.extensions.cursor):
+    """Курсор, считающий запросы к серверу в queries соединения"""
+
+    def execute(self, query, vars=None):
+        self.connection.queries += 1
+        return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        vars_list = list(vars_list)
+        self.connection.queries += len(vars_list)
+        return super().executemany(query, vars_list)
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    """Соединение psycopg2 с метаданными пула"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.created_at = time.monotonic()
+        self.last_used_at = self.created_at
+        self.prepared_statements: Set[str] = set()
+        self.queries = 0
+        self.cursor_factory = CountingCursor
+
+
+def execute_prepared(cur, name: str, sql: str, params: tuple) -> None:
+    """
+    Выполнить запрос как серверный prepared statement.
+
+    PREPARE выполняется один раз на соединение пула, дальше только
+    EXECUTE, и Postgres не разбирает и не планирует запрос заново.
+    В sql плейсхолдеры $1, $2, ..., их типы Postgres выводит из контекста.
+    """
+    conn = cur.connection
+    if name not in conn.prepared_statements:
+        cur.execute(f"PREPARE {name} AS {sql}")
+        conn.prepared_statements.add(name)
+    placeholders = ', '.join(['%s'] * len(params))
+    cur.execute(f"EXECUTE {name} ({placeholders})", params)
+
+
+class ConnectionPool:
+    """
+    Потокобезопасный пул соединений в духе ThreadedConnectionPool,
+    но с ожиданием свободного соединения вместо ошибки, проверкой
+    здоровья после простоя и ограничениями max_idle / max_lifetime.
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        max_size: int = 4,
+        max_idle: float = 300,
+        max_lifetime: float = 1800,
+        health_check_after: float = 30,
+        acquire_timeout: float = 10
+    ):
+        """
+        Args:
+            dsn: Строка подключения
+            max_size: Максимум открытых соединений
+            max_idle: Закрывать соединения, простаивающие дольше (сек)
+            max_lifetime: Пересоздавать соединения старше (сек)
+            health_check_after: Проверять SELECT 1 после простоя дольше (сек)
+            acquire_timeout: Сколько ждать свободного соединения (сек)
+        """
+        self.dsn = dsn
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.health_check_after = health_check_after
+        self.acquire_timeout = acquire_timeout
+
+        self._idle: List[PooledConnection] = []
+        self._open = 0
+        self._in_use = 0
+        self._cond = threading.Condition()
+
+        self._acquired = 0
+        self._created = 0
+        self._closed = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._health_check_failures = 0
+        self._queries = 0
+
+    @contextmanager
+    def connection(self) -> Iterator[PooledConnection]:
+        """Взять соединение из пула на время блока with"""
+        conn = self.getconn()
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    def getconn(self) -> PooledConnection:
+        """Получить соединение; ждёт до acquire_timeout, если пул исчерпан"""
+        while True:
+            conn = self._checkout()
+            if conn is None:
+                conn = self._create()
+            elif not self._is_healthy(conn):
+                with self._cond:
+                    self._health_check_failures += 1
+                self._discard(conn)
+                continue
+            return conn
+
+    def putconn(self, conn: PooledConnection) -> None:
+        """Вернуть соединение в пул (незавершённая транзакция откатывается)"""
+        if conn.closed:
+            self._discard(conn)
+            return
+
+        if conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                self._discard(conn)
+                return
+
+        now = time.monotonic()
+        if now - conn.created_at > self.max_lifetime:
+            self._discard(conn)
+            return
+
+        conn.last_used_at = now
+        with self._cond:
+            self._queries += conn.queries
+            conn.queries = 0
+            self._in_use -= 1
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Текущее состояние и счётчики пула. queries - число запросов
+        к серверу, учитывается при возврате соединения в пул.
+        """
+        with self._cond:
+            return {
+                'open': self._open,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'max_size': self.max_size,
+                'acquired': self._acquired,
+                'created': self._created,
+                'closed': self._closed,
+                'waits': self._waits,
+                'wait_time_ms': round(self._wait_time * 1000, 1),
+                'health_check_failures': self._health_check_failures,
+                'queries': self._queries
+            }
+
+    def close_all(self) -> None:
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+            self._closed += len(idle)
+        for conn in idle:
+            conn.close()
+
+    def _checkout(self) -> Optional[PooledConnection]:
+        """
+        Забрать простаивающее соединение или зарезервировать слот под новое.
+        Возвращает None, если нужно создать соединение.
+        """
+        wait_started = None
+        expired = []
+        try:
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    while self._idle:
+                        conn = self._idle.pop()
+                        if (now - conn.last_used_at > self.max_idle
+                                or now - conn.created_at > self.max_lifetime):
+                            self._open -= 1
+                            self._closed += 1
+                            expired.append(conn)
+                            continue
+                        self._reserve(wait_started, now)
+                        return conn
+
+                    if self._open < self.max_size:
+                        self._open += 1
+                        self._reserve(wait_started, now)
+                        return None
+
+                    if wait_started is None:
+                        wait_started = now
+                        self._waits += 1
+                    remaining = self.acquire_timeout - (now - wait_started)
+                    if remaining <= 0:
+                        self._wait_time += now - wait_started
+                        raise PoolError(
+                            f"Нет свободных соединений за {self.acquire_timeout} сек "
+                            f"(max_size={self.max_size})"
+                        )
+                    self._cond.wait(remaining)
+        finally:
+            for conn in expired:
+                conn.close()
+
+    def _reserve(self, wait_started: Optional[float], now: float) -> None:
+        self._in_use += 1
+        self._acquired += 1
+        if wait_started is not None:
+            self._wait_time += now - wait_started
+            print(f"[DB_POOL] Ожидание соединения {(now - wait_started) * 1000:.1f} мс, "
+                  f"stats={{'in_use': {self._in_use}, 'waits': {self._waits}}}")
+
+    def _create(self) -> PooledConnection:
+        try:
+            conn = psycopg2.connect(self.dsn, connection_factory=PooledConnection)
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._created += 1
+        return conn
+
+    def _is_healthy(self, conn: PooledConnection) -> bool:
+        if conn.closed:
+            return False
+        if time.monotonic() - conn.last_used_at < self.health_check_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute('SELECT 1')
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn: PooledConnection) -> None:
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+        with self._cond:
+            self._queries += conn.queries
+            self._open -= 1
+            self._in_use -= 1
+            self._closed += 1
+            self._cond.notify()
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """
+    Общий пул процесса. Создаётся при первом обращении к БД
+    и переиспользуется тёплыми вызовами функции.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    dsn=os.environ.get('DATABASE_URL', ''),
+                    max_size=int(os.environ.get('DB_POOL_MAX_SIZE', '4')),
+                    max_idle=float(os.environ.get('DB_POOL_MAX_IDLE', '300')),
+                    max_lifetime=float(os.environ.get('DB_POOL_MAX_LIFETIME', '1800')),
+                    health_check_after=float(os.environ.get('DB_POOL_HEALTH_CHECK_AFTER', '30')),
+                    acquire_timeout=float(os.environ.get('DB_POOL_ACQUIRE_TIMEOUT', '10'))
+                )
+    return _pool
@@ -1,11 +1,17 @@
 import os
+import sys
 import json
-import psycopg2
-import bcrypt
 import secrets
+import time
 from datetime import datetime, timedelta
 
-DATABASE_URL = os.environ.get('DATABASE_URL', '')
+sys.path.insert(0, os.path.dirname(__file__))
+
+from db_pool import get_pool
+from password_hasher import HasherBusyError, get_hasher
+from session_cache import MISS, SessionCache
+from signed_tokens import RevocationList, SignedTokenCodec, is_signed_token
+
 SEARCH_PATH = 't_p66738329_webapp_functionality'
 
 CORS_HEADERS = {
@@ -15,8 +21,100 @@ CORS_HEADERS = {
     'Content-Type': 'application/json'
 }
 
+session_cache = SessionCache(
+    max_entries=int(os.environ.get('SESSION_CACHE_MAX_ENTRIES', '10000')),
+    ttl_seconds=float(os.environ.get('SESSION_CACHE_TTL', '30')),
+    negative_ttl_seconds=float(os.environ.get('SESSION_CACHE_NEGATIVE_TTL', '10'))
+)
+
+SESSION_LIFETIME = timedelta(days=7)
+
+# SESSION_TOKEN_FORMAT=signed включает выпуск подписанных токенов.
+# Пока задан SESSION_SIGNING_KEY, подписанные токены принимаются при любом формате,
+# а непрозрачные токены проверяются по user_sessions как раньше
+SESSION_TOKEN_FORMAT = os.environ.get('SESSION_TOKEN_FORMAT', 'opaque')
+SESSION_SIGNING_KEY = os.environ.get('SESSION_SIGNING_KEY', '')
+token_codec = SignedTokenCodec(SESSION_SIGNING_KEY) if SESSION_SIGNING_KEY else None
+if SESSION_TOKEN_FORMAT == 'signed' and token_codec is None:
+    print("[AUTH] SESSION_TOKEN_FORMAT=signed без SESSION_SIGNING_KEY, выпускаются обычные токены")
+
 def get_db_connection():
-    return psycopg2.connect(DATABASE_URL)
+    """Взять соединение из общего пула процесса"""
+    return get_pool().getconn()
+
+def release_db_connection(conn):
+    """Вернуть соединение в пул (незавершённая транзакция откатывается)"""
+    get_pool().putconn(conn)
+
+def load_revocations(after_epoch):
+    """Записи session_revocations новее эпохи (срок - в секундах unix-времени)"""
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"""
+                SELECT id, session_id, user_id, EXTRACT(EPOCH FROM expires_at - NOW())
+                FROM {SEARCH_PATH}.session_revocations
+                WHERE id > %s AND expires_at > NOW()
+                ORDER BY id
+            """, (after_epoch,))
+            now = time.time()
+            return [(row[0], row[1], row[2], now + float(row[3])) for row in cur.fetchall()]
+    finally:
+        release_db_connection(conn)
+
+revocations = RevocationList(
+    load_revocations,
+    refresh_seconds=float(os.environ.get('SESSION_REVOCATION_REFRESH', '15'))
+)
+
+def issue_signed_token(user_id, username, email, full_name, role_id, expires_at, epoch):
+    """
+    Подписанный токен и идентификатор сессии для user_sessions.
+    epoch берётся из revocations.current_epoch() до того, как вход возьмёт
+    соединение из пула: догрузка отзывов сама обращается к БД.
+    """
+    session_id = secrets.token_urlsafe(16)
+    token = token_codec.issue({
+        'sid': session_id,
+        'uid': user_id,
+        'rid': role_id,
+        'un': username,
+        'em': email,
+        'fn': full_name,
+        'exp': int(expires_at.timestamp()),
+        'ver': epoch
+    })
+    return token, session_id
+
+def user_from_claims(claims):
+    return {
+        'id': claims['uid'],
+        'username': claims['un'],
+        'email': claims['em'],
+        'full_name': claims['fn'],
+        'role_id': claims['rid'],
+        'role_name': 'Администратор' if claims['rid'] == 1 else 'Сотрудник'
+    }
+
+def validation_response(user):
+    return {
+        'statusCode': 200,
+        'headers': CORS_HEADERS,
+        'body': json.dumps({
+            'valid': True,
+            'user': user,
+            'permissions': []
+        }),
+        'isBase64Encoded': False
+    }
+
+def session_expired_response():
+    return {
+        'statusCode': 401,
+        'headers': CORS_HEADERS,
+        'body': json.dumps({'valid': False, 'error': 'Сессия истекла'}),
+        'isBase64Encoded': False
+    }
 
 def handler(event, context):
     """API для авторизации с поддержкой БД"""
@@ -66,81 +164,115 @@ def handler(event, context):
                         'isBase64Encoded': False
                     }
                 
+                # bcrypt идёт без соединения из пула: иначе шторм входов выбирает
+                # пул (PoolError, 500) раньше, чем хешер ответит 503
                 conn = get_db_connection()
                 try:
                     with conn.cursor() as cur:
                         query = f"SELECT id, password_hash, full_name, email, role_id, is_blocked FROM {SEARCH_PATH}.users WHERE username = %s"
                         cur.execute(query, (username,))
                         user = cur.fetchone()
-                        
-                        if not user:
-                            print(f"[AUTH] User not found: {username}")
-                            return {
-                                'statusCode': 401,
-                                'headers': CORS_HEADERS,
-                                'body': json.dumps({'error': 'Неверный логин или пароль'}),
-                                'isBase64Encoded': False
-                            }
-                        
-                        user_id, password_hash, full_name, email, role_id, is_blocked = user
-                        print(f"[AUTH] User found: id={user_id}, blocked={is_blocked}")
-                        
-                        if is_blocked:
-                            print(f"[AUTH] User blocked: {username}")
-                            return {
-                                'statusCode': 403,
-                                'headers': CORS_HEADERS,
-                                'body': json.dumps({'error': 'Пользователь заблокирован'}),
-                                'isBase64Encoded': False
-                            }
-                        
-                        password_check = bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
-                        print(f"[AUTH] Password check result: {password_check}")
-                        
-                        if not password_check:
-                            print(f"[AUTH] Invalid password for: {username}")
-                            return {
-                                'statusCode': 401,
-                                'headers': CORS_HEADERS,
-                                'body': json.dumps({'error': 'Неверный логин или пароль'}),
-                                'isBase64Encoded': False
-                            }
-                        
-                        new_session_token = secrets.token_urlsafe(32)
-                        expires_at = datetime.now() + timedelta(days=7)
-                        
+                    conn.rollback()
+                except Exception as e:
+                    print(f"[AUTH] Database error during login: {str(e)}")
+                    raise
+                finally:
+                    release_db_connection(conn)
+                
+                if not user:
+                    print(f"[AUTH] User not found: {username}")
+                    return {
+                        'statusCode': 401,
+                        'headers': CORS_HEADERS,
+                        'body': json.dumps({'error': 'Неверный логин или пароль'}),
+                        'isBase64Encoded': False
+                    }
+                
+                user_id, password_hash, full_name, email, role_id, is_blocked = user
+                print(f"[AUTH] User found: id={user_id}, blocked={is_blocked}")
+                
+                if is_blocked:
+                    print(f"[AUTH] User blocked: {username}")
+                    session_cache.invalidate_user(user_id)
+                    return {
+                        'statusCode': 403,
+                        'headers': CORS_HEADERS,
+                        'body': json.dumps({'error': 'Пользователь заблокирован'}),
+                        'isBase64Encoded': False
+                    }
+                
+                try:
+                    password_check, new_password_hash = get_hasher().verify_and_rehash(password, password_hash)
+                except HasherBusyError as e:
+                    print(f"[AUTH] Password hasher busy: {get_hasher().stats()}")
+                    return {
+                        'statusCode': 503,
+                        'headers': {**CORS_HEADERS, 'Retry-After': '1'},
+                        'body': json.dumps({'error': str(e)}),
+                        'isBase64Encoded': False
+                    }
+                print(f"[AUTH] Password check result: {password_check}")
+                
+                if not password_check:
+                    print(f"[AUTH] Invalid password for: {username}")
+                    return {
+                        'statusCode': 401,
+                        'headers': CORS_HEADERS,
+                        'body': json.dumps({'error': 'Неверный логин или пароль'}),
+                        'isBase64Encoded': False
+                    }
+                
+                expires_at = datetime.now() + SESSION_LIFETIME
+                if SESSION_TOKEN_FORMAT == 'signed' and token_codec is not None:
+                    # Догрузка отзывов берёт своё соединение: до соединения входа, не внутри
+                    new_session_token, stored_token = issue_signed_token(
+                        user_id, username, email, full_name, role_id, expires_at, revocations.current_epoch()
+                    )
+                else:
+                    new_session_token = stored_token = secrets.token_urlsafe(32)
+                
+                conn = get_db_connection()
+                try:
+                    with conn.cursor() as cur:
                         insert_query = f"INSERT INTO {SEARCH_PATH}.user_sessions (user_id, session_token, expires_at, ip_address) VALUES (%s, %s, %s, %s)"
-                        cur.execute(insert_query, (user_id, new_session_token, expires_at, '0.0.0.0'))
+                        cur.execute(insert_query, (user_id, stored_token, expires_at, '0.0.0.0'))
                         
                         update_query = f"UPDATE {SEARCH_PATH}.users SET last_login = NOW() WHERE id = %s"
                         cur.execute(update_query, (user_id,))
+                        if new_password_hash:
+                            print(f"[AUTH] Rehashing password for {username} with cost {get_hasher().rounds}")
+                            # Пароль могли сменить, пока шла проверка - тогда rehash не нужен
+                            cur.execute(
+                                f"UPDATE {SEARCH_PATH}.users SET password_hash = %s WHERE id = %s AND password_hash = %s",
+                                (new_password_hash, user_id, password_hash)
+                            )
                         conn.commit()
-                        
-                        print(f"[AUTH] Login successful for: {username}")
-                        
-                        return {
-                            'statusCode': 200,
-                            'headers': CORS_HEADERS,
-                            'body': json.dumps({
-                                'success': True,
-                                'session_token': new_session_token,
-                                'user': {
-                                    'id': user_id,
-                                    'username': username,
-                                    'full_name': full_name,
-                                    'email': email,
-                                    'role_id': role_id,
-                                    'role_name': 'Администратор' if role_id == 1 else 'Сотрудник'
-                                },
-                                'permissions': []
-                            }),
-                            'isBase64Encoded': False
-                        }
                 except Exception as e:
                     print(f"[AUTH] Database error during login: {str(e)}")
                     raise
                 finally:
-                    conn.close()
+                    release_db_connection(conn)
+                
+                print(f"[AUTH] Login successful for: {username}")
+                
+                return {
+                    'statusCode': 200,
+                    'headers': CORS_HEADERS,
+                    'body': json.dumps({
+                        'success': True,
+                        'session_token': new_session_token,
+                        'user': {
+                            'id': user_id,
+                            'username': username,
+                            'full_name': full_name,
+                            'email': email,
+                            'role_id': role_id,
+                            'role_name': 'Администратор' if role_id == 1 else 'Сотрудник'
+                        },
+                        'permissions': []
+                    }),
+                    'isBase64Encoded': False
+                }
             
             # Validate action
             elif action == 'validate':
@@ -153,11 +285,28 @@ def handler(event, context):
                         'isBase64Encoded': False
                     }
                 
+                if is_signed_token(session_token):
+                    claims = token_codec.verify(session_token) if token_codec else None
+                    if claims is None or revocations.is_revoked(claims):
+                        print("[AUTH] Validation: signed token invalid, expired or revoked")
+                        return session_expired_response()
+                    return validation_response(user_from_claims(claims))
+                
+                started = time.perf_counter()
+                cached_user = session_cache.get(session_token)
+                if cached_user is not MISS:
+                    session_cache.record_latency(True, time.perf_counter() - started)
+                    print(f"[AUTH] Validation from cache, stats: {session_cache.stats()}")
+                    if cached_user is None:
+                        return session_expired_response()
+                    return validation_response(cached_user)
+                
                 conn = get_db_connection()
                 try:
                     with conn.cursor() as cur:
                         query = f"""
-                            SELECT us.user_id, u.username, u.email, u.full_name, u.role_id, u.is_blocked
+                            SELECT us.user_id, u.username, u.email, u.full_name, u.role_id, u.is_blocked,
+                                   us.expires_at
                             FROM {SEARCH_PATH}.user_sessions us
                             JOIN {SEARCH_PATH}.users u ON us.user_id = u.id
                             WHERE us.session_token = %s
@@ -168,17 +317,15 @@ def handler(event, context):
                         
                         if not result:
                             print("[AUTH] Validation: session not found or expired")
-                            return {
-                                'statusCode': 401,
-                                'headers': CORS_HEADERS,
-                                'body': json.dumps({'valid': False, 'error': 'Сессия истекла'}),
-                                'isBase64Encoded': False
-                            }
+                            session_cache.put(session_token, None)
+                            session_cache.record_latency(False, time.perf_counter() - started)
+                            return session_expired_response()
                         
-                        user_id, username, email, full_name, role_id, is_blocked = result
+                        user_id, username, email, full_name, role_id, is_blocked, expires_at = result
                         
                         if is_blocked:
                             print(f"[AUTH] Validation: user blocked - {username}")
+                            session_cache.invalidate_user(user_id)
                             return {
                                 'statusCode': 403,
                                 'headers': CORS_HEADERS,
@@ -186,29 +333,25 @@ def handler(event, context):
                                 'isBase64Encoded': False
                             }
                         
-                        print(f"[AUTH] Validation successful for: {username}")
-                        return {
-                            'statusCode': 200,
-                            'headers': CORS_HEADERS,
-                            'body': json.dumps({
-                                'valid': True,
-                                'user': {
-                                    'id': user_id,
-                                    'username': username,
-                                    'email': email,
-                                    'full_name': full_name,
-                                    'role_id': role_id,
-                                    'role_name': 'Администратор' if role_id == 1 else 'Сотрудник'
-                                },
-                                'permissions': []
-                            }),
-                            'isBase64Encoded': False
+                        user = {
+                            'id': user_id,
+                            'username': username,
+                            'email': email,
+                            'full_name': full_name,
+                            'role_id': role_id,
+                            'role_name': 'Администратор' if role_id == 1 else 'Сотрудник'
                         }
+                        session_cache.put(session_token, user, expires_at)
+                        session_cache.record_latency(False, time.perf_counter() - started)
+                        
+                        print(f"[AUTH] Validation successful for: {username}, "
+                              f"cache stats: {session_cache.stats()}")
+                        return validation_response(user)
                 except Exception as e:
                     print(f"[AUTH] Database error during validation: {str(e)}")
                     raise
                 finally:
-                    conn.close()
+                    release_db_connection(conn)
             
             # Logout action
             elif action == 'logout':
@@ -220,12 +363,34 @@ def handler(event, context):
                         'isBase64Encoded': False
                     }
                 
+                claims = None
+                if is_signed_token(session_token):
+                    claims = token_codec.verify(session_token) if token_codec else None
+                    if claims is None:
+                        return {
+                            'statusCode': 200,
+                            'headers': CORS_HEADERS,
+                            'body': json.dumps({'message': 'Выход выполнен'}),
+                            'isBase64Encoded': False
+                        }
+                
                 conn = get_db_connection()
                 try:
                     with conn.cursor() as cur:
+                        stored_token = claims['sid'] if claims else session_token
                         query = f"UPDATE {SEARCH_PATH}.user_sessions SET expires_at = NOW() WHERE session_token = %s"
-                        cur.execute(query, (session_token,))
+                        cur.execute(query, (stored_token,))
+                        if claims:
+                            cur.execute(
+                                f"INSERT INTO {SEARCH_PATH}.session_revocations (session_id, expires_at) VALUES (%s, %s) RETURNING id",
+                                (claims['sid'], datetime.fromtimestamp(claims['exp']))
+                            )
+                            revocation_id = cur.fetchone()[0]
                         conn.commit()
+                    if claims:
+                        revocations.add(revocation_id, claims['sid'], None, claims['exp'])
+                    else:
+                        session_cache.invalidate_token(session_token)
                     
                     print("[AUTH] Logout successful")
                     return {
@@ -238,7 +403,7 @@ def handler(event, context):
                     print(f"[AUTH] Error during logout: {str(e)}")
                     raise
                 finally:
-                    conn.close()
+                    release_db_connection(conn)
             
             else:
                 print(f"[AUTH] Unknown action: {action}")
@@ -0,0 +1,135 @@
+"""
+Кэш проверок сессий в памяти процесса.
+Ключ - SHA-256 от токена (сами токены в памяти не хранятся), короткий TTL,
+отрицательное кэширование неизвестных токенов, явная инвалидация.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, Optional, Set, Tuple
+
+MISS = object()
+
+
+class SessionCache:
+    """LRU-кэш результатов validate: user dict для живой сессии или None для неизвестной"""
+
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        ttl_seconds: float = 30,
+        negative_ttl_seconds: float = 10,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+
+        # ключ -> (истекает в, user dict или None)
+        self._entries: 'OrderedDict[str, Tuple[float, Optional[dict]]]' = OrderedDict()
+        self._keys_by_user: Dict[int, Set[str]] = {}
+
+        self._hits = 0
+        self._negative_hits = 0
+        self._misses = 0
+        self._invalidations = 0
+        self._hit_time = 0.0
+        self._miss_time = 0.0
+
+    @staticmethod
+    def token_key(token: str) -> str:
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+    def get(self, token: str):
+        """Закэшированный результат: user dict, None (неизвестный токен) или MISS"""
+        key = self.token_key(token)
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return MISS
+            expires_at, user = entry
+            if expires_at <= now:
+                self._remove(key)
+                self._misses += 1
+                return MISS
+            self._entries.move_to_end(key)
+            if user is None:
+                self._negative_hits += 1
+            else:
+                self._hits += 1
+            return user
+
+    def put(self, token: str, user: Optional[dict], session_expires_at: Optional[datetime] = None) -> None:
+        """
+        Запомнить результат проверки. TTL положительной записи не дольше,
+        чем осталось жить самой сессии.
+        """
+        key = self.token_key(token)
+        ttl = self.ttl_seconds if user is not None else self.negative_ttl_seconds
+        if session_expires_at is not None:
+            ttl = min(ttl, (session_expires_at - datetime.now()).total_seconds())
+        if ttl <= 0:
+            return
+
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (self._clock() + ttl, user)
+            if user is not None:
+                self._keys_by_user.setdefault(user['id'], set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+
+    def invalidate_token(self, token: str) -> None:
+        """Выход из сессии"""
+        with self._lock:
+            if self._remove(self.token_key(token)):
+                self._invalidations += 1
+
+    def invalidate_user(self, user_id: int) -> None:
+        """Все сессии пользователя (блокировка)"""
+        with self._lock:
+            for key in list(self._keys_by_user.get(user_id, ())):
+                if self._remove(key):
+                    self._invalidations += 1
+
+    def record_latency(self, hit: bool, seconds: float) -> None:
+        with self._lock:
+            if hit:
+                self._hit_time += seconds
+            else:
+                self._miss_time += seconds
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self._hits + self._negative_hits
+            lookups = hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'hits': self._hits,
+                'negative_hits': self._negative_hits,
+                'misses': self._misses,
+                'hit_rate': round(hits / lookups, 3) if lookups else 0.0,
+                'invalidations': self._invalidations,
+                'avg_hit_ms': round(self._hit_time / hits * 1000, 3) if hits else 0.0,
+                'avg_miss_ms': round(self._miss_time / self._misses * 1000, 3) if self._misses else 0.0
+            }
+
+    def _remove(self, key: str) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        user = entry[1]
+        if user is not None:
+            keys = self._keys_by_user.get(user['id'])
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_user[user['id']]
+        return True
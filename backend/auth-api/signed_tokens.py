@@ -0,0 +1,162 @@
+"""
+Подписанные HMAC-SHA256 токены сессий: проверка без обращения к БД.
+Формат: v1.<base64url(JSON claims)>.<base64url(подпись)>.
+Старые непрозрачные токены (secrets.token_urlsafe) точек не содержат
+и продолжают проверяться по user_sessions.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+TOKEN_PREFIX = 'v1.'
+
+
+def is_signed_token(token: str) -> bool:
+    return token.startswith(TOKEN_PREFIX)
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+
+class SignedTokenCodec:
+    """Выпуск и проверка подписанных токенов"""
+
+    def __init__(self, secret: str):
+        self._key = secret.encode('utf-8')
+
+    def issue(self, claims: dict) -> str:
+        body = _b64encode(json.dumps(claims, separators=(',', ':'), ensure_ascii=False).encode('utf-8'))
+        return f"{TOKEN_PREFIX}{body}.{self._sign(body)}"
+
+    def verify(self, token: str) -> Optional[dict]:
+        """Claims токена, если подпись верна и срок не истёк, иначе None"""
+        if not is_signed_token(token):
+            return None
+        try:
+            body, signature = token[len(TOKEN_PREFIX):].split('.')
+        except ValueError:
+            return None
+        if not hmac.compare_digest(signature, self._sign(body)):
+            return None
+        try:
+            claims = json.loads(_b64decode(body))
+        except ValueError:
+            return None
+        if claims.get('exp', 0) <= time.time():
+            return None
+        return claims
+
+    def _sign(self, body: str) -> str:
+        digest = hmac.new(self._key, (TOKEN_PREFIX + body).encode('ascii'), hashlib.sha256).digest()
+        return _b64encode(digest)
+
+
+class RevocationList:
+    """
+    Компактный список отзыва в памяти процесса.
+
+    Записи session_revocations нумеруются возрастающим id (эпоха). Токен
+    несёт эпоху на момент выпуска (ver): если с тех пор ничего не отзывалось,
+    список не проверяется вовсе. Новые записи догружаются инкрементально
+    не чаще refresh_seconds; каждое full_reload_every-е обновление читает
+    список целиком, чтобы подобрать записи, закоммиченные не по порядку id.
+
+    Отзывы этого инстанса (add) поднимают epoch, но не границу догрузки
+    loaded_through: записи других инстансов с меньшими id ещё не прочитаны.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[int], Iterable[Tuple[int, Optional[str], Optional[int], float]]],
+        refresh_seconds: float = 15,
+        full_reload_every: int = 20,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            loader: Функция (после какой эпохи) -> строки (id, session_id, user_id, expires_ts)
+            refresh_seconds: Как часто догружать новые отзывы
+            full_reload_every: Раз во сколько обновлений перечитывать список целиком
+        """
+        self._loader = loader
+        self._refresh_seconds = refresh_seconds
+        self._full_reload_every = full_reload_every
+        self._refreshes = 0
+        self._clock = clock
+        self._lock = threading.Lock()
+
+        self.epoch = 0
+        self.loaded_through = 0
+        self._loaded_at: Optional[float] = None
+        self._sessions: Dict[str, float] = {}
+        self._users: Dict[int, Tuple[int, float]] = {}
+
+    def current_epoch(self) -> int:
+        """Эпоха для выпуска нового токена (список догружается при необходимости)"""
+        self.refresh()
+        return self.epoch
+
+    def is_revoked(self, claims: dict) -> bool:
+        self.refresh()
+        if claims.get('ver', 0) >= self.epoch:
+            return False
+        with self._lock:
+            if claims.get('sid') in self._sessions:
+                return True
+            user_entry = self._users.get(claims.get('uid'))
+            return user_entry is not None and user_entry[0] > claims.get('ver', 0)
+
+    def refresh(self) -> None:
+        now = self._clock()
+        if self._loaded_at is not None and now - self._loaded_at < self._refresh_seconds:
+            return
+
+        self._refreshes += 1
+        full_reload = self._refreshes % self._full_reload_every == 0
+        rows = list(self._loader(0 if full_reload else self.loaded_through))
+        wall_now = time.time()
+        with self._lock:
+            for row in rows:
+                self._add(*row)
+                self.loaded_through = max(self.loaded_through, row[0])
+            self._sessions = {sid: exp for sid, exp in self._sessions.items() if exp > wall_now}
+            self._users = {uid: entry for uid, entry in self._users.items() if entry[1] > wall_now}
+            self._loaded_at = now
+
+    def add(
+        self,
+        revocation_id: int,
+        session_id: Optional[str],
+        user_id: Optional[int],
+        expires_ts: float
+    ) -> None:
+        """Учесть только что записанный отзыв без повторного чтения из БД"""
+        with self._lock:
+            self._add(revocation_id, session_id, user_id, expires_ts)
+
+    def _add(self, revocation_id, session_id, user_id, expires_ts) -> None:
+        if session_id:
+            self._sessions[session_id] = expires_ts
+        if user_id is not None:
+            previous = self._users.get(user_id)
+            if previous is None or previous[0] < revocation_id:
+                self._users[user_id] = (revocation_id, expires_ts)
+        self.epoch = max(self.epoch, revocation_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'epoch': self.epoch,
+                'loaded_through': self.loaded_through,
+                'revoked_sessions': len(self._sessions),
+                'revoked_users': len(self._users)
+            }
@@ -0,0 +1,218 @@
+"""
+Массовое заведение пользователей: разбор CSV/JSON, проверка строк,
+хеширование паролей в пуле процессов и вставка одной транзакцией.
+"""
+import csv
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional
+
+import bcrypt
+from psycopg2.extras import execute_values
+
+FIELDS = ('username', 'email', 'full_name', 'password', 'role_id', 'company_id', 'department_id')
+REQUIRED_FIELDS = ('username', 'email', 'full_name', 'password')
+ID_FIELDS = ('role_id', 'company_id', 'department_id')
+
+MAX_USERS = int(os.environ.get('BULK_MAX_USERS', '1000'))
+INSERT_PAGE_SIZE = 500
+
+
+def parse_users(body: dict) -> List[dict]:
+    """Список пользователей из body['users'] (JSON) или body['csv'] (CSV с заголовком)"""
+    if not isinstance(body, dict):
+        raise ValueError('Тело запроса должно быть объектом')
+    if 'csv' in body:
+        if not isinstance(body['csv'], str):
+            raise ValueError('csv должен быть текстом с заголовком')
+        reader = csv.DictReader(io.StringIO(body['csv']))
+        users = [{k.strip(): (v or '').strip() for k, v in row.items() if k} for row in reader]
+    elif isinstance(body.get('users'), list):
+        users = body['users']
+    else:
+        raise ValueError('Передайте users (список) или csv (текст с заголовком)')
+
+    if not users:
+        raise ValueError('Список пользователей пуст')
+    if len(users) > MAX_USERS:
+        raise ValueError(f'Не больше {MAX_USERS} пользователей за запрос')
+    return users
+
+
+def validate_row(raw) -> dict:
+    """Нормализовать строку; ValueError с понятным текстом, если она некорректна"""
+    if not isinstance(raw, dict):
+        raise ValueError('Строка должна быть объектом')
+
+    row = {field: raw.get(field) for field in FIELDS}
+    for field in REQUIRED_FIELDS:
+        value = row[field]
+        if not isinstance(value, str) or not value.strip():
+            raise ValueError(f'Поле {field} обязательно')
+        if field != 'password':
+            row[field] = value.strip()
+
+    for field in ID_FIELDS:
+        value = row[field]
+        if value in (None, ''):
+            row[field] = None
+            continue
+        try:
+            row[field] = int(value)
+        except (TypeError, ValueError):
+            raise ValueError(f'Поле {field} должно быть целым числом')
+
+    if '@' not in row['email']:
+        raise ValueError('Некорректный email')
+    if len(row['username']) > 50:
+        raise ValueError('username длиннее 50 символов')
+    return row
+
+
+def _hash_one(password: str, rounds: int) -> str:
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def hash_passwords(passwords: List[str], rounds: int, workers: Optional[int] = None) -> List[str]:
+    """
+    Хеши паролей по всем ядрам через пул процессов. Там, где процессы
+    недоступны (нет /dev/shm и т.п.), - пул потоков: bcrypt отпускает GIL.
+    """
+    workers = workers or os.cpu_count() or 1
+    rounds_list = [rounds] * len(passwords)
+    if workers > 1 and len(passwords) > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                chunksize = max(1, len(passwords) // (workers * 4))
+                return list(pool.map(_hash_one, passwords, rounds_list, chunksize=chunksize))
+        except (OSError, NotImplementedError, BrokenProcessPool) as e:
+            print(f"[CREATE_USER] Пул процессов недоступен ({e}), хешируем в потоках")
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_hash_one, passwords, rounds_list))
+
+
+def provision_users(conn, schema: str, raw_users: List, created_by: int, rounds: int) -> Dict:
+    """
+    Завести пользователей одной транзакцией.
+
+    Строки с ошибками и уже существующие логины/email не прерывают
+    загрузку: по каждой строке возвращается свой результат.
+    """
+    results: List[dict] = []
+    valid = []
+    seen_usernames, seen_emails = set(), set()
+
+    for index, raw in enumerate(raw_users):
+        try:
+            row = validate_row(raw)
+            if row['username'] in seen_usernames or row['email'].lower() in seen_emails:
+                raise ValueError('Дубликат username или email в загрузке')
+        except ValueError as e:
+            username = raw.get('username') if isinstance(raw, dict) else None
+            results.append({'row': index, 'username': username, 'status': 'error', 'error': str(e)})
+            continue
+        seen_usernames.add(row['username'])
+        seen_emails.add(row['email'].lower())
+        results.append({'row': index, 'username': row['username'], 'status': None})
+        valid.append((index, row))
+
+    with conn.cursor() as cur:
+        valid = _check_references(cur, schema, valid, results)
+        valid = _skip_existing(cur, schema, valid, results)
+
+        hashes = hash_passwords([row['password'] for _, row in valid], rounds)
+
+        inserted = {}
+        if valid:
+            returned = execute_values(
+                cur,
+                f"""
+                INSERT INTO {schema}.users
+                (username, email, password_hash, full_name, role_id, company_id, department_id, created_by)
+                VALUES %s
+                ON CONFLICT DO NOTHING
+                RETURNING id, username
+                """,
+                [
+                    (row['username'], row['email'], password_hash, row['full_name'],
+                     row['role_id'], row['company_id'], row['department_id'], created_by)
+                    for (_, row), password_hash in zip(valid, hashes)
+                ],
+                page_size=INSERT_PAGE_SIZE,
+                fetch=True
+            )
+            inserted = {username: user_id for user_id, username in returned}
+        conn.commit()
+
+    for index, row in valid:
+        result = results[index]
+        if row['username'] in inserted:
+            result.update(status='created', id=inserted[row['username']])
+        else:
+            result.update(status='exists', error='Пользователь с таким username или email уже есть')
+
+    summary = {'created': 0, 'exists': 0, 'error': 0}
+    for result in results:
+        summary[result['status']] += 1
+    return {**summary, 'results': results}
+
+
+def _check_references(cur, schema: str, valid: list, results: List[dict]) -> list:
+    """Отсеять строки со ссылками на несуществующие группы доступа, компании и подразделения"""
+    role_ids = {row['role_id'] for _, row in valid if row['role_id'] is not None}
+    company_ids = {row['company_id'] for _, row in valid if row['company_id'] is not None}
+    department_ids = {row['department_id'] for _, row in valid if row['department_id'] is not None}
+
+    # users.role_id ссылается на access_groups (бывшая roles, V0007)
+    roles, companies, departments = set(), set(), {}
+    if role_ids:
+        cur.execute(f"SELECT id FROM {schema}.access_groups WHERE id = ANY(%s)", (list(role_ids),))
+        roles = {r[0] for r in cur.fetchall()}
+    if company_ids:
+        cur.execute(f"SELECT id FROM {schema}.companies WHERE id = ANY(%s)", (list(company_ids),))
+        companies = {r[0] for r in cur.fetchall()}
+    if department_ids:
+        cur.execute(f"SELECT id, company_id FROM {schema}.departments WHERE id = ANY(%s)", (list(department_ids),))
+        departments = dict(cur.fetchall())
+
+    checked = []
+    for index, row in valid:
+        error = None
+        if row['role_id'] is not None and row['role_id'] not in roles:
+            error = f"Группа доступа {row['role_id']} не найдена"
+        elif row['company_id'] is not None and row['company_id'] not in companies:
+            error = f"Компания {row['company_id']} не найдена"
+        elif row['department_id'] is not None:
+            if row['department_id'] not in departments:
+                error = f"Подразделение {row['department_id']} не найдено"
+            elif row['company_id'] is not None and departments[row['department_id']] != row['company_id']:
+                error = f"Подразделение {row['department_id']} не относится к компании {row['company_id']}"
+        if error:
+            results[index].update(status='error', error=error)
+        else:
+            checked.append((index, row))
+    return checked
+
+
+def _skip_existing(cur, schema: str, valid: list, results: List[dict]) -> list:
+    """Не тратить bcrypt на пользователей, которые уже заведены"""
+    if not valid:
+        return valid
+    cur.execute(
+        f"SELECT username, lower(email) FROM {schema}.users WHERE username = ANY(%s) OR lower(email) = ANY(%s)",
+        ([row['username'] for _, row in valid], [row['email'].lower() for _, row in valid])
+    )
+    existing_usernames, existing_emails = set(), set()
+    for username, email in cur.fetchall():
+        existing_usernames.add(username)
+        existing_emails.add(email)
+
+    remaining = []
+    for index, row in valid:
+        if row['username'] in existing_usernames or row['email'].lower() in existing_emails:
+            results[index].update(status='exists', error='Пользователь с таким username или email уже есть')
+        else:
+            remaining.append((index, row))
+    return remaining
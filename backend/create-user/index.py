@@ -1,12 +1,97 @@
-import bcrypt
 import json
+import os
+import sys
+
+import psycopg2
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from bulk_provisioning import parse_users, provision_users
+from password_hasher import HasherBusyError, get_hasher
+from signed_tokens import SignedTokenCodec, is_signed_token
+
+SEARCH_PATH = 't_p66738329_webapp_functionality'
+
+JSON_HEADERS = {'Content-Type': 'application/json'}
+
+# Тот же ключ, что у auth-api: подписанные токены принимаются только с верной подписью
+SESSION_SIGNING_KEY = os.environ.get('SESSION_SIGNING_KEY', '')
+token_codec = SignedTokenCodec(SESSION_SIGNING_KEY) if SESSION_SIGNING_KEY else None
+
+def json_response(status_code, payload, headers=None):
+    return {
+        'statusCode': status_code,
+        'headers': {**JSON_HEADERS, **(headers or {})},
+        'body': json.dumps(payload, ensure_ascii=False),
+        'isBase64Encoded': False
+    }
+
+def session_lookup_key(session_token):
+    """
+    Ключ сессии в user_sessions: сам токен или sid подписанного токена.
+    sid берётся только из токена с верной подписью и неистёкшим сроком;
+    без SESSION_SIGNING_KEY подписанные токены не принимаются.
+    """
+    if not is_signed_token(session_token):
+        return session_token
+    claims = token_codec.verify(session_token) if token_codec else None
+    return claims.get('sid') if claims else None
+
+def get_admin_id(cur, session_token):
+    """id администратора по токену сессии или None"""
+    lookup_key = session_lookup_key(session_token) if session_token else None
+    if not lookup_key:
+        return None
+    cur.execute(f"""
+        SELECT u.id
+        FROM {SEARCH_PATH}.user_sessions us
+        JOIN {SEARCH_PATH}.users u ON us.user_id = u.id
+        WHERE us.session_token = %s AND us.expires_at > NOW()
+          AND u.role_id = 1 AND NOT u.is_blocked
+    """, (lookup_key,))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+def bulk_handler(event, body):
+    """Массовое заведение пользователей (только для администратора)"""
+    headers = {k.lower(): v for k, v in (event.get('headers') or {}).items()}
+    try:
+        users = parse_users(body)
+    except ValueError as e:
+        return json_response(400, {'error': str(e)})
+    
+    conn = None
+    try:
+        conn = psycopg2.connect(os.environ['DATABASE_URL'])
+        with conn.cursor() as cur:
+            admin_id = get_admin_id(cur, headers.get('x-session-token', ''))
+        if admin_id is None:
+            return json_response(403, {'error': 'Доступно только администратору'})
+        
+        result = provision_users(conn, SEARCH_PATH, users, admin_id, get_hasher().rounds)
+        print(f"[CREATE_USER] Bulk provisioning: created={result['created']}, "
+              f"exists={result['exists']}, errors={result['error']}")
+        return json_response(200, result)
+    except Exception as e:
+        print(f"[CREATE_USER] Bulk provisioning error: {type(e).__name__}: {e}")
+        return json_response(500, {'error': 'Внутренняя ошибка сервера'})
+    finally:
+        if conn is not None:
+            conn.close()
 
 def handler(event, context):
     """Генерация хеша пароля для нового пользователя"""
     body = json.loads(event.get('body', '{}'))
+    
+    if body.get('action') == 'bulk':
+        return bulk_handler(event, body)
+    
     password = body.get('password', 'newuser123')
     
-    password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    try:
+        password_hash = get_hasher().hash(password)
+    except HasherBusyError as e:
+        return json_response(503, {'error': str(e)}, {'Retry-After': '1'})
     
     return {
         'statusCode': 200,
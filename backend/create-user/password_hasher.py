@@ -0,0 +1,147 @@
+"""
+Хеширование и проверка паролей bcrypt в ограниченном пуле потоков.
+bcrypt отпускает GIL, поэтому потоки дают параллелизм по ядрам,
+а лимит очереди не даёт шторму логинов копить бесконечный backlog.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+import bcrypt
+
+
+class HasherBusyError(RuntimeError):
+    """Пул хеширования переполнен - запрос стоит повторить позже"""
+
+
+class PasswordHasher:
+    """
+    Сервис паролей с целевой стоимостью bcrypt (rounds).
+
+    Одновременно выполняется не больше max_workers операций, ещё max_pending
+    ждут в очереди; остальные получают HasherBusyError через queue_timeout.
+    """
+
+    def __init__(
+        self,
+        rounds: int = 12,
+        max_workers: Optional[int] = None,
+        max_pending: Optional[int] = None,
+        queue_timeout: float = 2.0
+    ):
+        """
+        Args:
+            rounds: Целевая стоимость bcrypt (log2 числа итераций)
+            max_workers: Потоков хеширования (по умолчанию - число ядер)
+            max_pending: Сколько операций может ждать свободного потока
+            queue_timeout: Сколько ждать места в очереди (сек)
+        """
+        self.rounds = rounds
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = self.max_workers * 4 if max_pending is None else max_pending
+        self.queue_timeout = queue_timeout
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix='bcrypt'
+        )
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_pending)
+        self._lock = threading.Lock()
+        self._operations = 0
+        self._rejected = 0
+        self._rehashed = 0
+        self._busy_time = 0.0
+
+    def hash(self, password: str) -> str:
+        return self._run(self._hash, password)
+
+    def verify(self, password: str, password_hash: str) -> bool:
+        return self._run(self._verify, password, password_hash)
+
+    def verify_and_rehash(self, password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+        """
+        Проверить пароль и, если хеш посчитан с другой стоимостью,
+        пересчитать его с целевой.
+
+        Returns:
+            (пароль верен, новый хеш или None)
+        """
+        if not self.verify(password, password_hash):
+            return False, None
+        if not self.needs_rehash(password_hash):
+            return True, None
+        new_hash = self.hash(password)
+        with self._lock:
+            self._rehashed += 1
+        return True, new_hash
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        return self.cost_of(password_hash) != self.rounds
+
+    @staticmethod
+    def cost_of(password_hash: str) -> Optional[int]:
+        """Стоимость из хеша вида $2b$12$..."""
+        parts = password_hash.split('$')
+        if len(parts) < 4 or not parts[2].isdigit():
+            return None
+        return int(parts[2])
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'rounds': self.rounds,
+                'max_workers': self.max_workers,
+                'operations': self._operations,
+                'rejected': self._rejected,
+                'rehashed': self._rehashed,
+                'avg_ms': round(self._busy_time / self._operations * 1000, 1) if self._operations else 0.0
+            }
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self._rejected += 1
+            raise HasherBusyError('Сервис проверки паролей перегружен, повторите попытку')
+        try:
+            return self._executor.submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def _hash(self, password: str) -> str:
+        started = time.perf_counter()
+        result = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(self.rounds)).decode('utf-8')
+        self._record(started)
+        return result
+
+    def _verify(self, password: str, password_hash: str) -> bool:
+        started = time.perf_counter()
+        result = bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+        self._record(started)
+        return result
+
+    def _record(self, started: float) -> None:
+        with self._lock:
+            self._operations += 1
+            self._busy_time += time.perf_counter() - started
+
+
+_hasher: Optional[PasswordHasher] = None
+_hasher_lock = threading.Lock()
+
+
+def get_hasher() -> PasswordHasher:
+    """Общий сервис паролей процесса, настраивается переменными окружения"""
+    global _hasher
+    if _hasher is None:
+        with _hasher_lock:
+            if _hasher is None:
+                _hasher = PasswordHasher(
+                    rounds=int(os.environ.get('BCRYPT_ROUNDS', '12')),
+                    max_workers=int(os.environ.get('PASSWORD_HASH_WORKERS', '0')) or None,
+                    max_pending=int(os.environ['PASSWORD_HASH_MAX_PENDING'])
+                    if os.environ.get('PASSWORD_HASH_MAX_PENDING') else None,
+                    queue_timeout=float(os.environ.get('PASSWORD_HASH_QUEUE_TIMEOUT', '2'))
+                )
+    return _hasher
@@ -0,0 +1,100 @@
+import hmac
+import json
+import os
+import time
+
+import psycopg2
+
+SEARCH_PATH = 't_p66738329_webapp_functionality'
+
+BATCH_SIZE = int(os.environ.get('SWEEP_BATCH_SIZE', '5000'))
+MAX_BATCHES = int(os.environ.get('SWEEP_MAX_BATCHES', '20'))
+# Истёкшие сессии хранятся ещё столько часов для разбора инцидентов
+SESSION_GRACE_HOURS = int(os.environ.get('SWEEP_SESSION_GRACE_HOURS', '24'))
+# Ручной запуск по HTTP - только с заголовком X-Internal-Token с этим секретом
+INTERNAL_TRIGGER_SECRET = os.environ.get('INTERNAL_TRIGGER_SECRET', '')
+TIMER_EVENT_TYPE = 'yandex.cloud.events.serverless.triggers.TimerMessage'
+
+def is_timer_trigger(event):
+    """Событие таймер-триггера: приходит не через HTTP-шлюз"""
+    messages = event.get('messages')
+    if not isinstance(messages, list) or not messages or not isinstance(messages[0], dict):
+        return False
+    metadata = messages[0].get('event_metadata')
+    return isinstance(metadata, dict) and metadata.get('event_type') == TIMER_EVENT_TYPE
+
+def is_internal_call(event):
+    """Таймер-триггер или HTTP-запрос с верным X-Internal-Token"""
+    if is_timer_trigger(event):
+        return True
+    headers = {k.lower(): v for k, v in (event.get('headers') or {}).items()}
+    token = headers.get('x-internal-token') or ''
+    return bool(INTERNAL_TRIGGER_SECRET) and bool(token) and hmac.compare_digest(
+        token.encode('utf-8'), INTERNAL_TRIGGER_SECRET.encode('utf-8')
+    )
+
+def sweep_table(conn, table, grace_hours):
+    """
+    Удалить истёкшие строки пачками по BATCH_SIZE, каждая пачка - своя
+    транзакция. SKIP LOCKED не даёт двум запускам драться за одни строки,
+    а MAX_BATCHES ограничивает время одного запуска.
+    """
+    started = time.perf_counter()
+    deleted = 0
+    batches = 0
+    more_pending = False
+    
+    for _ in range(MAX_BATCHES):
+        with conn.cursor() as cur:
+            cur.execute(f"""
+                DELETE FROM {SEARCH_PATH}.{table}
+                WHERE id IN (
+                    SELECT id FROM {SEARCH_PATH}.{table}
+                    WHERE expires_at < NOW() - %s * INTERVAL '1 hour'
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+            """, (grace_hours, BATCH_SIZE))
+            batch_deleted = cur.rowcount
+        conn.commit()
+        
+        batches += 1
+        deleted += batch_deleted
+        more_pending = batch_deleted == BATCH_SIZE
+        if not more_pending:
+            break
+    
+    return {
+        'deleted': deleted,
+        'batches': batches,
+        'more_pending': more_pending,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)
+    }
+
+def handler(event, context):
+    """Очистка истёкших сессий и записей отзыва токенов (запуск по таймеру)"""
+    if not is_internal_call(event):
+        print("[SESSION_SWEEPER] Отклонён вызов без таймер-триггера и внутреннего токена")
+        return {
+            'statusCode': 403,
+            'headers': {'Content-Type': 'application/json'},
+            'body': json.dumps({'error': 'Доступно только по таймеру или с внутренним токеном'}),
+            'isBase64Encoded': False
+        }
+    
+    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    try:
+        report = {
+            'user_sessions': sweep_table(conn, 'user_sessions', SESSION_GRACE_HOURS),
+            'session_revocations': sweep_table(conn, 'session_revocations', 0)
+        }
+    finally:
+        conn.close()
+    
+    print(f"[SESSION_SWEEPER] Reclaimed: {json.dumps(report)}")
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json'},
+        'body': json.dumps(report),
+        'isBase64Encoded': False
+    }
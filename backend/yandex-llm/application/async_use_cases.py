@@ -0,0 +1,187 @@
+"""
+Application слой: асинхронные варианты use cases с обращением к модели.
+Логика хода та же, что в SendMessageUseCase и ChatWithPatientUseCase;
+ожидание модели и БД не занимает поток, и один инстанс ведёт много ходов сразу.
+"""
+import asyncio
+from typing import AsyncIterator, Dict, List, Optional
+
+from domain.entities import Dialog, Message, MessageRole, PrecomputedSummary
+from domain.interfaces import (
+    IAsyncDialogRepository, IAsyncLLMService, IAsyncSummaryJobRepository, ITokenCounter
+)
+from domain.patient_persona import PatientPersona, PatientPromptBuilder
+from application.chat_use_case import build_chat_messages
+from application.history_trimmer import TokenBudgetTrimmer
+from application.use_cases import (
+    add_assistant_reply,
+    message_result,
+    summary_job_window,
+    summary_placeholder,
+    usage_metrics
+)
+
+
+class AsyncSendMessageUseCase:
+    """UC: Отправка сообщения и получение ответа (async)"""
+
+    def __init__(
+        self,
+        dialog_repo: IAsyncDialogRepository,
+        llm_service: IAsyncLLMService,
+        token_counter: ITokenCounter,
+        summary_jobs: Optional[IAsyncSummaryJobRepository] = None
+    ):
+        self._dialog_repo = dialog_repo
+        self._llm_service = llm_service
+        self._token_counter = token_counter
+        self._summary_jobs = summary_jobs
+
+    async def execute(self, dialog_id: str, message_text: str) -> dict:
+        """
+        Returns:
+            {'user_message': ..., 'assistant_response': ..., 'usage': ...}
+
+        Raises:
+            ValueError: Диалог не найден
+        """
+        dialog, user_msg, applied = await self._prepare(dialog_id, message_text)
+        llm_response = await self._llm_service.generate_response(dialog.get_full_history())
+        return await self._complete(dialog, user_msg, llm_response, applied)
+
+    async def stream(self, dialog_id: str, message_text: str) -> AsyncIterator[dict]:
+        """
+        Yields:
+            {'type': 'delta', 'text': str} и в конце
+            {'type': 'done', 'user_message': ..., 'assistant_response': ...}
+        """
+        dialog, user_msg, applied = await self._prepare(dialog_id, message_text)
+
+        llm_response = None
+        async for event in self._llm_service.stream_response(dialog.get_full_history()):
+            if event['type'] == 'done':
+                llm_response = event
+            else:
+                yield event
+
+        if llm_response is None:
+            raise RuntimeError("Поток ответа оборвался")
+
+        result = await self._complete(dialog, user_msg, llm_response, applied)
+        yield {'type': 'done', **result}
+
+    async def _prepare(self, dialog_id: str, message_text: str):
+        dialog = await self._dialog_repo.get_by_id(dialog_id)
+        if not dialog:
+            raise ValueError(f"Диалог {dialog_id} не найден")
+
+        user_msg = dialog.add_message(
+            role=MessageRole.USER,
+            content=message_text,
+            token_count=self._token_counter.count(message_text)
+        )
+
+        applied = None
+        if self._summary_jobs and dialog.should_precompute_summary():
+            applied = await self._use_precomputed_summary(dialog)
+
+        if dialog.needs_summarization():
+            await self._apply_summarization(dialog)
+
+        return dialog, user_msg, applied
+
+    async def _complete(
+        self,
+        dialog: Dialog,
+        user_msg: Message,
+        llm_response: dict,
+        applied: Optional[PrecomputedSummary]
+    ) -> dict:
+        assistant_msg = add_assistant_reply(dialog, llm_response)
+        await self._dialog_repo.save(dialog)
+        # Как в SendMessageUseCase: задача удаляется только после сохранения
+        if applied is not None:
+            await self._summary_jobs.delete(dialog.id)
+        return message_result(user_msg, assistant_msg, llm_response)
+
+    async def _apply_summarization(self, dialog: Dialog) -> None:
+        old_messages = dialog.get_messages_for_summary()
+        if not old_messages:
+            return
+
+        print(f"[SUMMARIZE] Создание саммари для {len(old_messages)} сообщений")
+        try:
+            summary = await self._llm_service.create_summary(old_messages)
+        except RuntimeError as e:
+            print(f"[SUMMARIZE] Ошибка создания саммари: {e}")
+            summary = summary_placeholder(old_messages)
+        dialog.replace_history_with_summary(
+            summary, self._token_counter.count, self._token_counter.count_messages
+        )
+
+    async def _use_precomputed_summary(self, dialog: Dialog) -> Optional[PrecomputedSummary]:
+        ready = await self._summary_jobs.get_ready(dialog.id)
+        if ready is not None:
+            if dialog.apply_precomputed_summary(
+                ready, self._token_counter.count, self._token_counter.count_messages
+            ):
+                return ready
+            await self._summary_jobs.delete(dialog.id)
+
+        window = summary_job_window(dialog)
+        if window:
+            await self._summary_jobs.enqueue(dialog.id, *window)
+        return None
+
+
+class AsyncChatWithPatientUseCase:
+    """UC: один ход ролевого диалога без хранения состояния (async)"""
+
+    def __init__(
+        self,
+        llm_service: IAsyncLLMService,
+        prompt_builder: Optional[PatientPromptBuilder] = None,
+        history_trimmer: Optional[TokenBudgetTrimmer] = None
+    ):
+        self._llm_service = llm_service
+        self._prompt_builder = prompt_builder or PatientPromptBuilder()
+        self._history_trimmer = history_trimmer or TokenBudgetTrimmer()
+
+    async def execute(
+        self,
+        persona: PatientPersona,
+        history: List[Dict[str, str]],
+        user_message: str
+    ) -> dict:
+        messages = await self._build_messages(persona, history, user_message)
+        llm_response = await self._llm_service.generate_response(messages)
+
+        return {
+            'message': llm_response['text'].strip(),
+            'usage': usage_metrics(llm_response)
+        }
+
+    async def stream(
+        self,
+        persona: PatientPersona,
+        history: List[Dict[str, str]],
+        user_message: str
+    ) -> AsyncIterator[dict]:
+        messages = await self._build_messages(persona, history, user_message)
+        async for event in self._llm_service.stream_response(messages):
+            if event['type'] == 'done':
+                yield {'type': 'done', 'message': event['text'].strip(), 'usage': usage_metrics(event)}
+            else:
+                yield event
+
+    async def _build_messages(
+        self,
+        persona: PatientPersona,
+        history: List[Dict[str, str]],
+        user_message: str
+    ) -> List[Dict[str, str]]:
+        """Обрезка истории с саммари обращается к синхронной модели - её уводим в поток"""
+        args = (self._prompt_builder, self._history_trimmer, persona, history, user_message)
+        if self._history_trimmer.has_summarizer:
+            return await asyncio.to_thread(build_chat_messages, *args)
+        return build_chat_messages(*args)
@@ -2,20 +2,26 @@
 Application слой: stateless-чат с ИИ-пациентом для пользовательских сценариев.
 История диалога хранится на клиенте (localStorage), сервер не сохраняет состояние.
 """
-from typing import List, Dict
+from typing import Dict, Iterator, List, Optional
 
 from domain.interfaces import ILLMService
 from domain.patient_persona import PatientPersona, PatientPromptBuilder
+from application.history_trimmer import TokenBudgetTrimmer
+from application.use_cases import usage_metrics
 
 
 class ChatWithPatientUseCase:
     """UC: один ход ролевого диалога без хранения состояния на сервере"""
 
-    MAX_HISTORY_MESSAGES = 20
-
-    def __init__(self, llm_service: ILLMService):
+    def __init__(
+        self,
+        llm_service: ILLMService,
+        prompt_builder: Optional[PatientPromptBuilder] = None,
+        history_trimmer: Optional[TokenBudgetTrimmer] = None
+    ):
         self._llm_service = llm_service
-        self._prompt_builder = PatientPromptBuilder()
+        self._prompt_builder = prompt_builder or PatientPromptBuilder()
+        self._history_trimmer = history_trimmer or TokenBudgetTrimmer()
 
     def execute(
         self,
@@ -32,12 +38,34 @@ class ChatWithPatientUseCase:
             user_message: Новая реплика обучаемого
 
         Returns:
-            {'message': str}
+            {'message': str, 'usage': {...}}
         """
         messages = self._build_messages(persona, history, user_message)
         llm_response = self._llm_service.generate_response(messages)
 
-        return {'message': llm_response['text'].strip()}
+        return {
+            'message': llm_response['text'].strip(),
+            'usage': usage_metrics(llm_response)
+        }
+
+    def stream(
+        self,
+        persona: PatientPersona,
+        history: List[Dict[str, str]],
+        user_message: str
+    ) -> Iterator[dict]:
+        """
+        Потоковый вариант execute: фрагменты ответа отдаются по мере генерации.
+
+        Yields:
+            {'type': 'delta', 'text': str} и в конце {'type': 'done', 'message': str, 'usage': {...}}
+        """
+        messages = self._build_messages(persona, history, user_message)
+        for event in self._llm_service.stream_response(messages):
+            if event['type'] == 'done':
+                yield {'type': 'done', 'message': event['text'].strip(), 'usage': usage_metrics(event)}
+            else:
+                yield event
 
     def _build_messages(
         self,
@@ -45,19 +73,35 @@ class ChatWithPatientUseCase:
         history: List[Dict[str, str]],
         user_message: str
     ) -> List[Dict[str, str]]:
-        system_prompt = self._prompt_builder.build(persona)
-        messages = [{'role': 'system', 'text': system_prompt}]
-
-        for item in self._trim_history(history):
-            role = 'assistant' if item.get('role') == 'assistant' else 'user'
-            content = item.get('content', '').strip()
-            if content:
-                messages.append({'role': role, 'text': content})
-
-        messages.append({'role': 'user', 'text': user_message})
-        return messages
-
-    def _trim_history(self, history: List[Dict[str, str]]) -> List[Dict[str, str]]:
-        if len(history) <= self.MAX_HISTORY_MESSAGES:
-            return history
-        return history[-self.MAX_HISTORY_MESSAGES:]
+        return build_chat_messages(
+            self._prompt_builder, self._history_trimmer, persona, history, user_message
+        )
+
+
+def build_chat_messages(
+    prompt_builder: PatientPromptBuilder,
+    history_trimmer: TokenBudgetTrimmer,
+    persona: PatientPersona,
+    history: List[Dict[str, str]],
+    user_message: str
+) -> List[Dict[str, str]]:
+    """Системный промпт, саммари отброшенного начала, окно истории и новая реплика"""
+    system_prompt = prompt_builder.build(persona)
+    messages = [{'role': 'system', 'text': system_prompt, 'cache': True}]
+
+    summary, window = history_trimmer.trim(system_prompt, history, user_message)
+    if summary:
+        messages.append({
+            'role': 'system',
+            'text': TokenBudgetTrimmer.SUMMARY_PREFIX + summary,
+            'cache': True
+        })
+
+    for item in window:
+        role = 'assistant' if item.get('role') == 'assistant' else 'user'
+        content = item.get('content', '').strip()
+        if content:
+            messages.append({'role': role, 'text': content})
+
+    messages.append({'role': 'user', 'text': user_message, 'cache': True})
+    return messages
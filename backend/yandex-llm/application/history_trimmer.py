@@ -0,0 +1,173 @@
+"""
+Application слой: обрезка истории чата по бюджету токенов.
+Окно истории заполняется с самых новых реплик, пока помещается в бюджет;
+отброшенное начало по желанию сворачивается в кэшируемое саммари.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+
+from domain.entities import Message, MessageRole
+from domain.interfaces import ILLMService
+
+
+@lru_cache(maxsize=8192)
+def estimate_tokens(text: str) -> int:
+    """Быстрая оценка с запасом: ~3 символа на токен (кириллица дробится мельче латиницы)"""
+    return len(text) // 3 + 4
+
+
+class TokenBudgetTrimmer:
+    """
+    Подбирает окно истории под бюджет токенов.
+
+    Системный промпт и новая реплика пользователя не обрезаются никогда.
+    Начало окна выравнивается на align_step реплик: оно сдвигается блоками,
+    и кэшируемый провайдером префикс живёт несколько ходов подряд.
+    """
+
+    SUMMARY_PREFIX = "[КРАТКОЕ СОДЕРЖАНИЕ ПРЕДЫДУЩЕГО ДИАЛОГА]\n"
+
+    def __init__(
+        self,
+        budget_tokens: int = 6000,
+        align_step: int = 6,
+        summarizer: Optional[ILLMService] = None,
+        summary_reserve_tokens: int = 300,
+        max_summaries: int = 256,
+        estimator: Callable[[str], int] = estimate_tokens,
+        batch_estimator: Optional[Callable[[List[str]], List[int]]] = None
+    ):
+        """
+        Args:
+            budget_tokens: Бюджет на весь запрос (промпт + саммари + история + реплика)
+            align_step: Шаг выравнивания начала окна (в репликах)
+            summarizer: LLM для саммари отброшенных реплик; None - просто отбрасывать
+            summary_reserve_tokens: Сколько бюджета оставить под саммари
+            max_summaries: Сколько саммари держать в кэше
+            estimator: Оценка числа токенов текста
+            batch_estimator: Пакетная оценка истории (ITokenCounter.count_many);
+                по умолчанию estimator по одной реплике
+        """
+        self.budget_tokens = budget_tokens
+        self.align_step = max(1, align_step)
+        self._summarizer = summarizer
+        self.summary_reserve_tokens = summary_reserve_tokens
+        self._estimator = estimator
+        self._batch_estimator = batch_estimator or (lambda texts: [estimator(text) for text in texts])
+        self.max_summaries = max_summaries
+
+        self._summaries: 'OrderedDict[str, str]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._summary_hits = 0
+        self._summary_misses = 0
+
+    def trim(
+        self,
+        system_prompt: str,
+        history: List[Dict[str, str]],
+        user_message: str
+    ) -> Tuple[Optional[str], List[Dict[str, str]]]:
+        """
+        Returns:
+            (саммари отброшенного начала или None, оставленные реплики)
+        """
+        available = (
+            self.budget_tokens
+            - self._estimator(system_prompt)
+            - self._estimator(user_message)
+        )
+        # История считается один раз на оба подбора окна
+        sizes = self._batch_estimator([item.get('content', '') for item in history])
+        start = self._window_start(sizes, available)
+        if start == 0:
+            return None, history
+
+        if self._summarizer:
+            start = self._window_start(sizes, available - self.summary_reserve_tokens)
+            return self._summarize(history[:start]), history[start:]
+        return None, history[start:]
+
+    @property
+    def has_summarizer(self) -> bool:
+        """trim может обращаться к модели (блокирующий вызов)"""
+        return self._summarizer is not None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'budget_tokens': self.budget_tokens,
+                'summary_hits': self._summary_hits,
+                'summary_misses': self._summary_misses,
+                'cached_summaries': len(self._summaries)
+            }
+
+    def _window_start(self, sizes: List[int], available: int) -> int:
+        """Индекс первой реплики окна: новые реплики набираются, пока влезают"""
+        used = 0
+        start = len(sizes)
+        for index in range(len(sizes) - 1, -1, -1):
+            used += sizes[index]
+            if used > available:
+                break
+            start = index
+        if start == 0:
+            return 0
+        aligned = -(-start // self.align_step) * self.align_step
+        return min(aligned, len(sizes))
+
+    def _summarize(self, dropped: List[Dict[str, str]]) -> Optional[str]:
+        """
+        Саммари отброшенных реплик. Кэшируется по содержимому, а при промахе
+        строится от саммари предыдущего блока плюс новые реплики.
+        """
+        key = self._key(dropped)
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is not None:
+                self._summaries.move_to_end(key)
+                self._summary_hits += 1
+                return summary
+            self._summary_misses += 1
+
+            previous_end, previous = 0, None
+            for end in range(len(dropped) - self.align_step, 0, -self.align_step):
+                previous = self._summaries.get(self._key(dropped[:end]))
+                if previous is not None:
+                    previous_end = end
+                    break
+
+        messages = []
+        if previous:
+            messages.append(Message(role=MessageRole.SYSTEM, content=previous))
+        for item in dropped[previous_end:]:
+            content = (item.get('content') or '').strip()
+            if content:
+                role = MessageRole.ASSISTANT if item.get('role') == 'assistant' else MessageRole.USER
+                messages.append(Message(role=role, content=content))
+
+        try:
+            summary = self._summarizer.create_summary(messages) if messages else ''
+        except RuntimeError as e:
+            print(f"[SUMMARIZE] Саммари истории чата не создано: {e}")
+            return None
+        if not summary:
+            return None
+
+        with self._lock:
+            self._summaries[key] = summary
+            if len(self._summaries) > self.max_summaries:
+                self._summaries.popitem(last=False)
+        return summary
+
+    @staticmethod
+    def _key(items: List[Dict[str, str]]) -> str:
+        digest = hashlib.sha256()
+        for item in items:
+            digest.update((item.get('role') or '').encode('utf-8'))
+            digest.update(b'\x00')
+            digest.update((item.get('content') or '').encode('utf-8'))
+            digest.update(b'\x01')
+        return digest.hexdigest()
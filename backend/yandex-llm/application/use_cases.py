@@ -3,11 +3,65 @@ Application слой: Use Cases для управления тренировка
 Оркестрирует бизнес-логику через интерфейсы domain слоя.
 """
 import uuid
-from typing import List
+from typing import Iterator, List, Optional, Tuple
 from datetime import datetime
 
-from domain.entities import Dialog, Scenario, MessageRole
-from domain.interfaces import IDialogRepository, IScenarioRepository, ILLMService
+from domain.entities import Dialog, PrecomputedSummary, Scenario, Message, MessageRole
+from domain.interfaces import (
+    IDialogRepository, IScenarioRepository, ILLMService, ISummaryJobRepository, ITokenCounter
+)
+
+
+def usage_metrics(llm_response: dict) -> dict:
+    """Метрики токенов ответа LLM для клиента (cached_tokens - из кэша префикса)"""
+    return {
+        'prompt_tokens': llm_response.get('prompt_tokens', 0),
+        'completion_tokens': llm_response.get('tokens', 0),
+        'cached_tokens': llm_response.get('cached_tokens', 0)
+    }
+
+
+def add_assistant_reply(dialog: Dialog, llm_response: dict) -> Message:
+    """Дописать ответ модели в диалог и учесть потраченные токены"""
+    total_tokens_used = llm_response.get('total_tokens', 0)
+    if total_tokens_used > 0:
+        dialog.total_tokens = total_tokens_used
+    
+    return dialog.add_message(
+        role=MessageRole.ASSISTANT,
+        content=llm_response['text'],
+        token_count=llm_response.get('tokens', 0)
+    )
+
+
+def message_result(user_msg: Message, assistant_msg: Message, llm_response: dict) -> dict:
+    """Ответ API на ход диалога"""
+    return {
+        'user_message': {
+            'role': user_msg.role.value,
+            'content': user_msg.content,
+            'timestamp': user_msg.timestamp.isoformat()
+        },
+        'assistant_response': {
+            'role': assistant_msg.role.value,
+            'content': assistant_msg.content,
+            'timestamp': assistant_msg.timestamp.isoformat()
+        },
+        'usage': usage_metrics(llm_response)
+    }
+
+
+def summary_placeholder(old_messages: List[Message]) -> str:
+    """Саммари-заглушка, когда модель не смогла его создать"""
+    return f"[Краткое содержание {len(old_messages)} сообщений]"
+
+
+def summary_job_window(dialog: Dialog) -> Optional[Tuple[int, int]]:
+    """(from_seq, up_to_seq) для фоновой суммаризации или None, если окно ещё не сохранено"""
+    old_messages = [msg for msg in dialog.get_messages_for_summary() if msg.seq is not None]
+    if old_messages and dialog.messages[0].seq is not None:
+        return dialog.messages[0].seq, old_messages[-1].seq
+    return None
 
 
 class StartTrainingUseCase:
@@ -54,10 +108,18 @@ class SendMessageUseCase:
     def __init__(
         self,
         dialog_repo: IDialogRepository,
-        llm_service: ILLMService
+        llm_service: ILLMService,
+        token_counter: ITokenCounter,
+        summary_jobs: Optional[ISummaryJobRepository] = None
     ):
+        """
+        Args:
+            summary_jobs: Очередь фоновой суммаризации; None - только синхронная
+        """
         self._dialog_repo = dialog_repo
         self._llm_service = llm_service
+        self._token_counter = token_counter
+        self._summary_jobs = summary_jobs
     
     def execute(self, dialog_id: str, message_text: str) -> dict:
         """
@@ -73,6 +135,47 @@ class SendMessageUseCase:
         Raises:
             ValueError: Диалог не найден
         """
+        dialog, user_msg, applied = self._prepare(dialog_id, message_text)
+        
+        full_history = dialog.get_full_history()
+        llm_response = self._llm_service.generate_response(full_history)
+        
+        return self._complete(dialog, user_msg, llm_response, applied)
+    
+    def stream(self, dialog_id: str, message_text: str) -> Iterator[dict]:
+        """
+        Потоковая обработка сообщения пользователя.
+        
+        Фрагменты ответа отдаются по мере генерации, собранное сообщение
+        сохраняется в диалог после окончания потока.
+        
+        Yields:
+            {'type': 'delta', 'text': str} и в конце
+            {'type': 'done', 'user_message': ..., 'assistant_response': ...}
+        
+        Raises:
+            ValueError: Диалог не найден
+        """
+        dialog, user_msg, applied = self._prepare(dialog_id, message_text)
+        
+        llm_response = None
+        for event in self._llm_service.stream_response(dialog.get_full_history()):
+            if event['type'] == 'done':
+                llm_response = event
+            else:
+                yield event
+        
+        if llm_response is None:
+            raise RuntimeError("Поток ответа оборвался")
+        
+        result = self._complete(dialog, user_msg, llm_response, applied)
+        yield {'type': 'done', **result}
+    
+    def _prepare(self, dialog_id: str, message_text: str):
+        """
+        Returns:
+            (dialog, user_msg, применённое готовое саммари или None)
+        """
         dialog = self._dialog_repo.get_by_id(dialog_id)
         if not dialog:
             raise ValueError(f"Диалог {dialog_id} не найден")
@@ -80,39 +183,32 @@ class SendMessageUseCase:
         user_msg = dialog.add_message(
             role=MessageRole.USER,
             content=message_text,
-            token_count=len(message_text) // 4
+            token_count=self._token_counter.count(message_text)
         )
         
+        applied = None
+        if self._summary_jobs and dialog.should_precompute_summary():
+            applied = self._use_precomputed_summary(dialog)
+        
         if dialog.needs_summarization():
             self._apply_summarization(dialog)
         
-        full_history = dialog.get_full_history()
-        llm_response = self._llm_service.generate_response(full_history)
-        
-        total_tokens_used = llm_response.get('total_tokens', 0)
-        if total_tokens_used > 0:
-            dialog.total_tokens = total_tokens_used
-        
-        assistant_msg = dialog.add_message(
-            role=MessageRole.ASSISTANT,
-            content=llm_response['text'],
-            token_count=llm_response.get('tokens', 0)
-        )
-        
+        return dialog, user_msg, applied
+    
+    def _complete(
+        self,
+        dialog: Dialog,
+        user_msg: Message,
+        llm_response: dict,
+        applied: Optional[PrecomputedSummary]
+    ) -> dict:
+        assistant_msg = add_assistant_reply(dialog, llm_response)
         self._dialog_repo.save(dialog)
-        
-        return {
-            'user_message': {
-                'role': user_msg.role.value,
-                'content': user_msg.content,
-                'timestamp': user_msg.timestamp.isoformat()
-            },
-            'assistant_response': {
-                'role': assistant_msg.role.value,
-                'content': assistant_msg.content,
-                'timestamp': assistant_msg.timestamp.isoformat()
-            }
-        }
+        # Задачу удаляем только после сохранения: если ход сорвался,
+        # готовое саммари пригодится следующему
+        if applied is not None:
+            self._summary_jobs.delete(dialog.id)
+        return message_result(user_msg, assistant_msg, llm_response)
     
     def _apply_summarization(self, dialog: Dialog) -> None:
         old_messages = dialog.get_messages_for_summary()
@@ -120,34 +216,145 @@ class SendMessageUseCase:
             return
         
         print(f"[SUMMARIZE] Создание саммари для {len(old_messages)} сообщений")
-        summary = self._llm_service.create_summary(old_messages)
-        dialog.replace_history_with_summary(summary)
+        try:
+            summary = self._llm_service.create_summary(old_messages)
+        except RuntimeError as e:
+            print(f"[SUMMARIZE] Ошибка создания саммари: {e}")
+            summary = summary_placeholder(old_messages)
+        dialog.replace_history_with_summary(
+            summary, self._token_counter.count, self._token_counter.count_messages
+        )
         print(f"[SUMMARIZE] Саммари создано, осталось {len(dialog.messages)} сообщений")
+    
+    def _use_precomputed_summary(self, dialog: Dialog) -> Optional[PrecomputedSummary]:
+        """
+        Применить готовое фоновое саммари или поставить его в очередь.
+        
+        Returns:
+            Применённое саммари - его задача удаляется после сохранения диалога
+        """
+        ready = self._summary_jobs.get_ready(dialog.id)
+        if ready is not None:
+            if dialog.apply_precomputed_summary(
+                ready, self._token_counter.count, self._token_counter.count_messages
+            ):
+                print(f"[SUMMARIZE] Применено готовое саммари до seq {ready.up_to_seq}, "
+                      f"осталось {len(dialog.messages)} сообщений")
+                return ready
+            self._summary_jobs.delete(dialog.id)
+        
+        window = summary_job_window(dialog)
+        if window:
+            self._summary_jobs.enqueue(dialog.id, *window)
+        return None
+
+
+class PrecomputeSummariesUseCase:
+    """UC: Фоновый воркер - посчитать саммари для диалогов из очереди"""
+    
+    def __init__(
+        self,
+        summary_jobs: ISummaryJobRepository,
+        dialog_repo: IDialogRepository,
+        llm_service: ILLMService
+    ):
+        self._summary_jobs = summary_jobs
+        self._dialog_repo = dialog_repo
+        self._llm_service = llm_service
+    
+    def execute(self, limit: int = 10) -> dict:
+        """
+        Обработать до limit задач.
+        
+        Returns:
+            {'claimed': int, 'completed': int, 'stale': int, 'failed': int}
+        """
+        result = {'claimed': 0, 'completed': 0, 'stale': 0, 'failed': 0}
+        for job in self._summary_jobs.claim_pending(limit):
+            result['claimed'] += 1
+            messages = self._messages_for(job)
+            if not messages:
+                self._summary_jobs.delete(job.dialog_id)
+                result['stale'] += 1
+                continue
+            
+            try:
+                text = self._llm_service.create_summary(messages)
+            except RuntimeError as e:
+                print(f"[SUMMARIZE] Фоновое саммари {job.dialog_id} не создано: {e}")
+                self._summary_jobs.fail(job, str(e))
+                result['failed'] += 1
+                continue
+            
+            self._summary_jobs.complete(job, text)
+            result['completed'] += 1
+        
+        return result
+    
+    def _messages_for(self, job: PrecomputedSummary) -> List[Message]:
+        """Сообщения задачи; пусто, если окно истории с тех пор сменилось"""
+        dialog = self._dialog_repo.get_by_id(job.dialog_id)
+        if not dialog or not dialog.messages or dialog.messages[0].seq != job.from_seq:
+            return []
+        return [msg for msg in dialog.messages if msg.seq is not None and msg.seq <= job.up_to_seq]
 
 
 class GetDialogHistoryUseCase:
     """UC: Получение истории диалога"""
     
+    MAX_PAGE_SIZE = 500
+    
     def __init__(self, dialog_repo: IDialogRepository):
         self._dialog_repo = dialog_repo
     
-    def execute(self, dialog_id: str) -> dict:
+    def version(self, dialog_id: str) -> str:
         """
-        Получить полную историю диалога.
+        Версия истории диалога (для условных запросов) без загрузки сообщений.
+        
+        Raises:
+            ValueError: Диалог не найден
+        """
+        version = self._dialog_repo.get_history_version(dialog_id)
+        if version is None:
+            raise ValueError(f"Диалог {dialog_id} не найден")
+        return version
+    
+    def execute(
+        self,
+        dialog_id: str,
+        since_seq: Optional[int] = None,
+        since: Optional[datetime] = None,
+        limit: Optional[int] = None
+    ) -> dict:
+        """
+        Получить историю диалога целиком или инкрементально.
         
         Args:
             dialog_id: ID диалога
+            since_seq: Курсор - вернуть только сообщения с seq больше указанного
+            since: Вернуть только сообщения новее указанного момента
+            limit: Максимум сообщений (не больше MAX_PAGE_SIZE)
         
         Returns:
-            Данные диалога с историей сообщений
+            Данные диалога со срезом сообщений. next_since_seq - курсор для
+            следующего запроса; reset=True означает, что история была заменена
+            саммари и клиенту нужно заменить свой список сообщений, а не дополнить.
         
         Raises:
-            ValueError: Диалог не найден
+            ValueError: Диалог не найден или некорректные параметры
         """
-        dialog = self._dialog_repo.get_by_id(dialog_id)
-        if not dialog:
+        if limit is not None and not 1 <= limit <= self.MAX_PAGE_SIZE:
+            raise ValueError(f"limit должен быть от 1 до {self.MAX_PAGE_SIZE}")
+        
+        page = self._dialog_repo.get_history_page(dialog_id, since_seq, since, limit)
+        if not page:
             raise ValueError(f"Диалог {dialog_id} не найден")
         
+        dialog = page.dialog
+        next_since_seq = page.next_since_seq
+        if next_since_seq is None:
+            next_since_seq = since_seq
+        
         return {
             'id': dialog.id,
             'scenario': {
@@ -159,10 +366,14 @@ class GetDialogHistoryUseCase:
                 {
                     'role': msg.role.value,
                     'content': msg.content,
-                    'timestamp': msg.timestamp.isoformat()
+                    'timestamp': msg.timestamp.isoformat(),
+                    'seq': msg.seq
                 }
-                for msg in dialog.messages
+                for msg in page.messages
             ],
+            'has_more': page.has_more,
+            'next_since_seq': next_since_seq,
+            'reset': since_seq is not None and since_seq < page.window_start_seq,
             'total_tokens': dialog.total_tokens,
             'created_at': dialog.created_at.isoformat(),
             'updated_at': dialog.updated_at.isoformat()
@@ -175,6 +386,10 @@ class ListScenariosUseCase:
     def __init__(self, scenario_repo: IScenarioRepository):
         self._scenario_repo = scenario_repo
     
+    def version(self) -> str:
+        """Версия списка сценариев (для условных запросов)"""
+        return self._scenario_repo.get_version()
+    
     def execute(self) -> List[dict]:
         """
         Получить список всех сценариев.
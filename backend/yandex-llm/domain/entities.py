@@ -4,7 +4,7 @@ Domain entities: диалоги, сценарии, сообщения.
 """
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import List, Literal
+from typing import Callable, List, Literal, Optional
 from enum import Enum
 
 
@@ -22,6 +22,7 @@ class Message:
     content: str
     timestamp: datetime = field(default_factory=datetime.now)
     token_count: int = 0
+    seq: Optional[int] = None  # Порядковый номер в хранилище (None - ещё не сохранено)
     
     def __post_init__(self):
         if not self.content.strip():
@@ -44,9 +45,24 @@ class Scenario:
             raise ValueError("Минимум 1000 токенов")
 
 
+@dataclass(frozen=True)
+class PrecomputedSummary:
+    """Саммари начала истории, посчитанное фоновым воркером"""
+    dialog_id: str
+    from_seq: int  # seq первого сообщения окна на момент постановки в очередь
+    up_to_seq: int  # seq последнего сообщения, вошедшего в саммари
+    text: Optional[str] = None
+
+
 @dataclass
 class Dialog:
     """Диалог тренировки - основная агрегатная сущность"""
+    
+    # Доля max_tokens: после мягкого порога саммари готовится в фоне,
+    # после жёсткого - строится синхронно, если готового нет
+    SUMMARY_SOFT_THRESHOLD = 0.6
+    SUMMARY_HARD_THRESHOLD = 0.8
+    
     id: str
     scenario: Scenario
     messages: List[Message] = field(default_factory=list)
@@ -63,8 +79,15 @@ class Dialog:
         return message
     
     def get_full_history(self) -> List[dict]:
-        """Получить полную историю для отправки в LLM"""
-        history = [{'role': 'system', 'text': self.scenario.system_prompt}]
+        """
+        Получить полную историю для отправки в LLM.
+        
+        Порядок от самого стабильного к самому изменчивому: системный промпт,
+        саммари, реплики. Флаг 'cache' отмечает границы префикса, который
+        провайдер может закэшировать: после системного промпта, после саммари
+        и после последней реплики (следующий ход переиспользует весь этот запрос).
+        """
+        history = [{'role': 'system', 'text': self.scenario.system_prompt, 'cache': True}]
         
         for msg in self.messages:
             history.append({
@@ -72,11 +95,20 @@ class Dialog:
                 'text': msg.content
             })
         
+        if self.messages and self.messages[0].role == MessageRole.SYSTEM:
+            history[1]['cache'] = True
+        if len(history) > 1:
+            history[-1]['cache'] = True
+        
         return history
     
     def needs_summarization(self) -> bool:
         """Проверка необходимости саммари"""
-        return self.total_tokens > self.scenario.max_tokens * 0.8
+        return self.total_tokens > self.scenario.max_tokens * self.SUMMARY_HARD_THRESHOLD
+    
+    def should_precompute_summary(self) -> bool:
+        """Пора готовить саммари заранее"""
+        return self.total_tokens > self.scenario.max_tokens * self.SUMMARY_SOFT_THRESHOLD
     
     def get_messages_for_summary(self) -> List[Message]:
         """Получить старые сообщения для саммари (кроме последних 5)"""
@@ -88,13 +120,77 @@ class Dialog:
         """Получить последние 5 сообщений"""
         return self.messages[-5:] if len(self.messages) > 5 else self.messages
     
-    def replace_history_with_summary(self, summary_text: str):
-        """Заменить старые сообщения на саммари"""
+    def replace_history_with_summary(
+        self,
+        summary_text: str,
+        count_tokens: Callable[[str], int],
+        count_messages: Optional[Callable[[List['Message']], int]] = None
+    ):
+        """
+        Заменить старые сообщения на саммари.
+        
+        Args:
+            summary_text: Текст саммари
+            count_tokens: Подсчёт токенов (ITokenCounter.count)
+            count_messages: Итог по сообщениям (ITokenCounter.count_messages) -
+                досчитывает старые сообщения без token_count
+        """
         recent = self.get_recent_messages()
+        content = f"[КРАТКОЕ СОДЕРЖАНИЕ ПРЕДЫДУЩЕГО ДИАЛОГА]\n{summary_text}"
+        summary_msg = Message(
+            role=MessageRole.SYSTEM,
+            content=content,
+            token_count=count_tokens(content)
+        )
+        self.messages = [summary_msg] + recent
+        self._recount_tokens(count_messages)
+    
+    def apply_precomputed_summary(
+        self,
+        summary: PrecomputedSummary,
+        count_tokens: Callable[[str], int],
+        count_messages: Optional[Callable[[List['Message']], int]] = None
+    ) -> bool:
+        """
+        Заменить сообщения до summary.up_to_seq готовым саммари.
+        Аргументы подсчёта - как у replace_history_with_summary.
+        
+        Returns:
+            False, если саммари устарело (окно истории с тех пор менялось)
+        """
+        if not summary.text or not self.messages or self.messages[0].seq != summary.from_seq:
+            return False
+        
+        recent = [msg for msg in self.messages if msg.seq is None or msg.seq > summary.up_to_seq]
+        if len(recent) == len(self.messages):
+            return False
+        
+        content = f"[КРАТКОЕ СОДЕРЖАНИЕ ПРЕДЫДУЩЕГО ДИАЛОГА]\n{summary.text}"
         summary_msg = Message(
             role=MessageRole.SYSTEM,
-            content=f"[КРАТКОЕ СОДЕРЖАНИЕ ПРЕДЫДУЩЕГО ДИАЛОГА]\n{summary_text}",
-            token_count=len(summary_text) // 4  # Примерная оценка
+            content=content,
+            token_count=count_tokens(content)
         )
         self.messages = [summary_msg] + recent
-        self.total_tokens = sum(msg.token_count for msg in self.messages)
+        self._recount_tokens(count_messages)
+        return True
+    
+    def _recount_tokens(self, count_messages: Optional[Callable[[List['Message']], int]]) -> None:
+        if count_messages:
+            self.total_tokens = count_messages(self.messages)
+        else:
+            self.total_tokens = sum(msg.token_count for msg in self.messages)
+
+
+@dataclass
+class HistoryPage:
+    """Срез истории диалога для постраничной (инкрементальной) выдачи"""
+    dialog: Dialog  # Заголовок диалога, сообщения не загружаются
+    messages: List[Message]
+    has_more: bool
+    window_start_seq: int  # seq первого сообщения активного окна истории
+    
+    @property
+    def next_since_seq(self) -> Optional[int]:
+        """Курсор для следующего запроса"""
+        return self.messages[-1].seq if self.messages else None
@@ -3,8 +3,9 @@
 Domain не знает о реализациях - только контракты.
 """
 from abc import ABC, abstractmethod
-from typing import List, Optional
-from .entities import Dialog, Scenario, Message
+from typing import AsyncIterator, Iterator, List, Optional
+from datetime import datetime
+from .entities import Dialog, HistoryPage, PrecomputedSummary, Scenario, Message
 
 
 class IDialogRepository(ABC):
@@ -20,6 +21,30 @@ class IDialogRepository(ABC):
         """Получить диалог по ID"""
         pass
     
+    @abstractmethod
+    def get_history_page(
+        self,
+        dialog_id: str,
+        since_seq: Optional[int] = None,
+        since: Optional[datetime] = None,
+        limit: Optional[int] = None
+    ) -> Optional[HistoryPage]:
+        """
+        Срез активной истории диалога.
+        
+        Args:
+            dialog_id: ID диалога
+            since_seq: Вернуть сообщения с seq больше указанного
+            since: Вернуть сообщения новее указанного момента
+            limit: Максимум сообщений в срезе
+        """
+        pass
+    
+    @abstractmethod
+    def get_history_version(self, dialog_id: str) -> Optional[str]:
+        """Версия истории без загрузки сообщений (для условных запросов); None - диалога нет"""
+        pass
+    
     @abstractmethod
     def list_by_user(self, user_id: str) -> List[Dialog]:
         """Список диалогов пользователя"""
@@ -38,6 +63,63 @@ class IScenarioRepository(ABC):
     def list_all(self) -> List[Scenario]:
         """Все доступные сценарии"""
         pass
+    
+    @abstractmethod
+    def get_version(self) -> str:
+        """Версия набора сценариев: меняется при любом изменении, добавлении или удалении"""
+        pass
+
+
+class ISummaryJobRepository(ABC):
+    """Очередь фоновой суммаризации диалогов"""
+    
+    @abstractmethod
+    def enqueue(self, dialog_id: str, from_seq: int, up_to_seq: int) -> None:
+        """Поставить задачу (повторная постановка для того же окна ничего не делает)"""
+        pass
+    
+    @abstractmethod
+    def get_ready(self, dialog_id: str) -> Optional[PrecomputedSummary]:
+        """Готовое саммари диалога или None"""
+        pass
+    
+    @abstractmethod
+    def claim_pending(self, limit: int) -> List[PrecomputedSummary]:
+        """Забрать задачи в работу (конкурентные воркеры получают разные задачи)"""
+        pass
+    
+    @abstractmethod
+    def complete(self, job: PrecomputedSummary, text: str) -> None:
+        pass
+    
+    @abstractmethod
+    def fail(self, job: PrecomputedSummary, error: str) -> None:
+        pass
+    
+    @abstractmethod
+    def delete(self, dialog_id: str) -> None:
+        """Удалить задачу (саммари применено или устарело)"""
+        pass
+
+
+class ITokenCounter(ABC):
+    """Интерфейс подсчёта токенов текста"""
+    
+    @abstractmethod
+    def count(self, text: str) -> int:
+        """Число токенов в тексте"""
+        pass
+    
+    @abstractmethod
+    def count_many(self, texts: List[str]) -> List[int]:
+        """Число токенов для каждого текста (пакетно, для длинных историй)"""
+        pass
+    
+    def count_messages(self, messages: List[Message]) -> int:
+        """Сумма токенов сообщений; уже посчитанный token_count не пересчитывается"""
+        pending = [msg.content for msg in messages if not msg.token_count]
+        counted = sum(msg.token_count for msg in messages)
+        return counted + sum(self.count_many(pending))
 
 
 class ILLMService(ABC):
@@ -49,10 +131,27 @@ class ILLMService(ABC):
         Генерация ответа от LLM.
         
         Args:
-            messages: История диалога в формате [{'role': 'user', 'text': '...'}]
+            messages: История диалога в формате [{'role': 'user', 'text': '...'}];
+                'cache': True отмечает конец префикса, который можно кэшировать
         
         Returns:
-            {'text': str, 'tokens': int}
+            {'text': str, 'tokens': int, 'total_tokens': int,
+             'prompt_tokens': int, 'cached_tokens': int}
+        """
+        pass
+    
+    @abstractmethod
+    def stream_response(self, messages: List[dict]) -> Iterator[dict]:
+        """
+        Потоковая генерация ответа от LLM.
+        
+        Args:
+            messages: История диалога в формате [{'role': 'user', 'text': '...'}]
+        
+        Yields:
+            {'type': 'delta', 'text': str} по мере генерации,
+            в конце {'type': 'done', 'text': str, 'tokens': int, 'total_tokens': int,
+            'prompt_tokens': int, 'cached_tokens': int}
         """
         pass
     
@@ -66,5 +165,57 @@ class ILLMService(ABC):
         
         Returns:
             Краткое содержание диалога
+        
+        Raises:
+            RuntimeError: Модель недоступна или вернула пустой ответ
+        """
+        pass
+
+
+class IAsyncDialogRepository(ABC):
+    """Асинхронный репозиторий диалогов: операции, нужные на пути ответа модели"""
+    
+    @abstractmethod
+    async def save(self, dialog: Dialog) -> None:
+        pass
+    
+    @abstractmethod
+    async def get_by_id(self, dialog_id: str) -> Optional[Dialog]:
+        pass
+
+
+class IAsyncSummaryJobRepository(ABC):
+    """Асинхронная часть очереди суммаризации, которой пользуется ход диалога"""
+    
+    @abstractmethod
+    async def enqueue(self, dialog_id: str, from_seq: int, up_to_seq: int) -> None:
+        pass
+    
+    @abstractmethod
+    async def get_ready(self, dialog_id: str) -> Optional[PrecomputedSummary]:
+        pass
+    
+    @abstractmethod
+    async def delete(self, dialog_id: str) -> None:
+        pass
+
+
+class IAsyncLLMService(ABC):
+    """Асинхронный вариант ILLMService: те же форматы сообщений и ответов"""
+    
+    @abstractmethod
+    async def generate_response(self, messages: List[dict]) -> dict:
+        pass
+    
+    @abstractmethod
+    def stream_response(self, messages: List[dict]) -> AsyncIterator[dict]:
+        """Асинхронный генератор событий delta/done"""
+        pass
+    
+    @abstractmethod
+    async def create_summary(self, messages: List[Message]) -> str:
+        """
+        Raises:
+            RuntimeError: Модель недоступна или вернула пустой ответ
         """
         pass
@@ -2,8 +2,11 @@
 Domain: value object персонажа-пациента и построение системного промпта.
 Чистая логика без знания о фреймворках, БД и HTTP.
 """
-from dataclasses import dataclass, field
-from typing import List
+import hashlib
+import json
+from dataclasses import dataclass, field, fields
+from functools import cached_property
+from typing import Tuple
 
 
 EMOTION_LABELS = {
@@ -35,7 +38,10 @@ STYLE_LABELS = {
 
 @dataclass(frozen=True)
 class PatientPersona:
-    """Описание роли пациента для ролевой игры"""
+    """
+    Описание роли пациента для ролевой игры.
+    Неизменяемый и хешируемый: списки приводятся к кортежам.
+    """
 
     role: str
     situation: str
@@ -44,8 +50,19 @@ class PatientPersona:
     emotional_state: str
     knowledge: str
     communication_style: str
-    objectives: List[str] = field(default_factory=list)
-    challenges: List[str] = field(default_factory=list)
+    objectives: Tuple[str, ...] = field(default_factory=tuple)
+    challenges: Tuple[str, ...] = field(default_factory=tuple)
+
+    def __post_init__(self):
+        object.__setattr__(self, 'objectives', tuple(self.objectives))
+        object.__setattr__(self, 'challenges', tuple(self.challenges))
+
+    @cached_property
+    def content_hash(self) -> str:
+        """Стабильный между процессами хеш содержимого (в отличие от hash())"""
+        values = [getattr(self, f.name) for f in fields(self)]
+        payload = json.dumps(values, ensure_ascii=False, separators=(',', ':'))
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
 
     def emotion_text(self) -> str:
         return EMOTION_LABELS.get(self.emotional_state, 'нейтрален')
@@ -60,6 +77,8 @@ class PatientPersona:
 class PatientPromptBuilder:
     """Строит системный промпт для модели на основе персонажа"""
 
+    # Увеличивать при любом изменении текста промпта: версия входит в ключ кэша
+    VERSION = 1
     MAX_REPLY_SENTENCES = 3
 
     def build(self, persona: PatientPersona) -> str:
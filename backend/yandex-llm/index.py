@@ -2,10 +2,13 @@
 Presentation слой: HTTP API для системы тренировок.
 Точка входа для Cloud Function.
 """
+import asyncio
 import json
+import math
 import os
 import sys
-from datetime import datetime
+from datetime import datetime, timezone
+from typing import Iterator, Optional
 
 sys.path.insert(0, os.path.dirname(__file__))
 
@@ -13,26 +16,146 @@ from application.use_cases import (
     StartTrainingUseCase,
     SendMessageUseCase,
     GetDialogHistoryUseCase,
-    ListScenariosUseCase
+    ListScenariosUseCase,
+    PrecomputeSummariesUseCase
 )
 from application.chat_use_case import ChatWithPatientUseCase
+from application.async_use_cases import AsyncChatWithPatientUseCase, AsyncSendMessageUseCase
+from application.history_trimmer import TokenBudgetTrimmer
 from domain.patient_persona import PatientPersona
 from infrastructure.db_repositories import (
     PostgresDialogRepository,
-    PostgresScenarioRepository
+    PostgresScenarioRepository,
+    PostgresSummaryJobRepository
+)
+from infrastructure.scenario_cache import CachedScenarioRepository
+from infrastructure.prompt_cache import CachedPromptBuilder
+from infrastructure.token_counter import OfflineTokenCounter
+from infrastructure.async_db_repositories import (
+    AsyncPostgresDialogRepository,
+    AsyncPostgresSummaryJobRepository
 )
 from infrastructure.routerai_llm_client import RouterAILLMClient
+from infrastructure.async_routerai_llm_client import AsyncRouterAILLMClient
+from infrastructure.circuit_breaker import (
+    AsyncCircuitBreakerLLMService,
+    CircuitBreaker,
+    CircuitBreakerLLMService,
+    CircuitOpenError
+)
+from infrastructure.resilience import get_resilient_transport
+from infrastructure.db_pool import get_pool
 from infrastructure.rate_limiter import RateLimiter
+from infrastructure.pg_rate_limiter import PostgresRateLimiter
+from presentation.http_responses import (
+    is_not_modified,
+    json_response,
+    make_etag,
+    not_modified_response
+)
+from presentation.internal_trigger import is_internal_call, is_timer_trigger
 
 
 CORS_HEADERS = {
     'Access-Control-Allow-Origin': '*',
     'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-    'Access-Control-Allow-Headers': 'Content-Type',
+    'Access-Control-Allow-Headers': 'Content-Type, If-None-Match',
+    'Access-Control-Expose-Headers': 'ETag, Retry-After',
     'Content-Type': 'application/json'
 }
 
-rate_limiter = RateLimiter(max_requests=20, window_seconds=60)
+SSE_HEADERS = {
+    **CORS_HEADERS,
+    'Content-Type': 'text/event-stream; charset=utf-8',
+    'Cache-Control': 'no-cache'
+}
+
+STREAM_ACTIONS = ('message', 'chat')
+
+
+def build_rate_limiter():
+    """
+    Лимитер по RATE_LIMIT_BACKEND: memory - в памяти инстанса,
+    postgres - общий лимит на все инстансы через БД
+    """
+    local_limiter = RateLimiter(
+        max_requests=20,
+        window_seconds=60,
+        algorithm=os.environ.get('RATE_LIMIT_ALGORITHM', 'sliding_window'),
+        max_clients=int(os.environ.get('RATE_LIMIT_MAX_CLIENTS', '100000'))
+    )
+    if os.environ.get('RATE_LIMIT_BACKEND', 'memory') == 'postgres':
+        return PostgresRateLimiter(
+            local_limiter,
+            expected_instances=int(os.environ.get('RATE_LIMIT_EXPECTED_INSTANCES', '4')),
+            sync_fraction=float(os.environ.get('RATE_LIMIT_SYNC_FRACTION', '0.5'))
+        )
+    return local_limiter
+
+
+rate_limiter = build_rate_limiter()
+
+scenario_repo = CachedScenarioRepository(
+    PostgresScenarioRepository(),
+    ttl_seconds=float(os.environ.get('SCENARIO_CACHE_TTL', '60'))
+)
+
+summary_jobs = (
+    PostgresSummaryJobRepository()
+    if os.environ.get('SUMMARY_PRECOMPUTE', '1') == '1' else None
+)
+async_summary_jobs = AsyncPostgresSummaryJobRepository() if summary_jobs else None
+
+# Секрет для служебных HTTP-вызовов (summarize_pending); таймер-триггер его не требует
+INTERNAL_TRIGGER_SECRET = os.environ.get('INTERNAL_TRIGGER_SECRET', '')
+
+prompt_builder = CachedPromptBuilder(
+    max_entries=int(os.environ.get('PROMPT_CACHE_MAX_ENTRIES', '1024'))
+)
+
+
+token_counter = OfflineTokenCounter()
+
+llm_breaker = CircuitBreaker(
+    failure_rate_threshold=float(os.environ.get('LLM_BREAKER_FAILURE_RATE', '0.5')),
+    slow_call_seconds=float(os.environ.get('LLM_BREAKER_SLOW_CALL_SECONDS', '20')),
+    slow_call_rate_threshold=float(os.environ.get('LLM_BREAKER_SLOW_CALL_RATE', '0.8')),
+    min_calls=int(os.environ.get('LLM_BREAKER_MIN_CALLS', '10')),
+    open_seconds=float(os.environ.get('LLM_BREAKER_OPEN_SECONDS', '15'))
+)
+
+
+def build_llm_service() -> CircuitBreakerLLMService:
+    """Клиент RouterAI за общим для инстанса circuit breaker"""
+    return CircuitBreakerLLMService(RouterAILLMClient(), llm_breaker)
+
+
+def build_async_llm_service() -> AsyncCircuitBreakerLLMService:
+    """Асинхронный клиент за тем же circuit breaker; создавать внутри цикла событий"""
+    return AsyncCircuitBreakerLLMService(AsyncRouterAILLMClient(), llm_breaker)
+
+
+def build_history_trimmer() -> TokenBudgetTrimmer:
+    """
+    Общий для инстанса: кэш саммари переживает запросы.
+    Вызывается при импорте, поэтому ошибка конфигурации клиента модели
+    отключает саммари, а не ломает весь модуль (scenarios, history).
+    """
+    summarizer = None
+    if os.environ.get('CHAT_ROLLING_SUMMARY', '0') == '1':
+        try:
+            summarizer = build_llm_service()
+        except ValueError as e:
+            print(f"[TRAINING_API] Саммари истории чата отключено: {e}")
+    return TokenBudgetTrimmer(
+        budget_tokens=int(os.environ.get('CHAT_HISTORY_TOKEN_BUDGET', '6000')),
+        summarizer=summarizer,
+        estimator=token_counter.count,
+        batch_estimator=token_counter.count_many
+    )
+
+
+history_trimmer = build_history_trimmer()
 
 
 def get_client_id(event: dict) -> str:
@@ -49,6 +172,35 @@ def get_client_id(event: dict) -> str:
     return identity.get('sourceIp', 'unknown')
 
 
+def parse_int_param(query_params: dict, name: str) -> Optional[int]:
+    """Целочисленный query-параметр; ValueError, если передан не числом"""
+    value = query_params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} должен быть целым числом")
+
+
+def parse_datetime_param(query_params: dict, name: str) -> Optional[datetime]:
+    """
+    ISO-8601 query-параметр; ValueError при неверном формате.
+    Значение со смещением переводится в UTC, как хранится created_at
+    (функция работает в UTC); без смещения считается уже UTC.
+    """
+    value = query_params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} должен быть датой в формате ISO 8601")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc)
+    return parsed.replace(tzinfo=None)
+
+
 def build_persona(data: dict) -> PatientPersona:
     """Собрать PatientPersona из данных запроса"""
     context = data.get('context') or {}
@@ -66,6 +218,235 @@ def build_persona(data: dict) -> PatientPersona:
     )
 
 
+def check_rate_limit(event: dict) -> Optional[dict]:
+    """Вернуть ответ 429, если клиент превысил лимит, иначе None"""
+    client_id = get_client_id(event)
+    
+    if rate_limiter.is_allowed(client_id):
+        return None
+    
+    remaining = rate_limiter.get_remaining(client_id)
+    print(f"[TRAINING_API] Rate limit exceeded for {client_id}")
+    return {
+        'statusCode': 429,
+        'headers': CORS_HEADERS,
+        'body': json.dumps({
+            'error': 'Превышен лимит запросов',
+            'remaining': remaining
+        }),
+        'isBase64Encoded': False
+    }
+
+
+def unavailable_response(error: CircuitOpenError) -> dict:
+    """503 с подсказкой, когда повторить: цепь к LLM-шлюзу разомкнута"""
+    print(f"[TRAINING_API] LLM-шлюз недоступен: {llm_breaker.stats()}")
+    return {
+        'statusCode': 503,
+        'headers': {**CORS_HEADERS, 'Retry-After': str(math.ceil(error.retry_after))},
+        'body': json.dumps({
+            'error': 'Модель временно недоступна, попробуйте позже',
+            'retry_after': math.ceil(error.retry_after)
+        }),
+        'isBase64Encoded': False
+    }
+
+
+def summarize_pending_response(event: dict) -> dict:
+    """
+    Фоновая суммаризация из очереди (action=summarize_pending или таймер-триггер).
+    Служебный вызов: нужен таймер или X-Internal-Token; лимит клиентов не применяется,
+    чтобы планировщик не получал 429.
+    """
+    if not is_internal_call(event, INTERNAL_TRIGGER_SECRET):
+        print("[SUMMARIZE] Отклонён вызов summarize_pending без внутреннего токена")
+        return {
+            'statusCode': 403,
+            'headers': CORS_HEADERS,
+            'body': json.dumps({'error': 'Доступно только для внутреннего планировщика'}),
+            'isBase64Encoded': False
+        }
+    
+    if summary_jobs is None:
+        return {
+            'statusCode': 200,
+            'headers': CORS_HEADERS,
+            'body': json.dumps({'claimed': 0, 'disabled': True}),
+            'isBase64Encoded': False
+        }
+    
+    try:
+        body = {} if is_timer_trigger(event) else json.loads(event.get('body') or '{}')
+        if not isinstance(body, dict):
+            raise ValueError('Тело запроса должно быть объектом')
+        limit = body.get('limit', 10)
+        if not isinstance(limit, int) or not 1 <= limit <= 100:
+            raise ValueError('limit должен быть от 1 до 100')
+        
+        use_case = PrecomputeSummariesUseCase(summary_jobs, PostgresDialogRepository(), build_llm_service())
+        result = use_case.execute(limit)
+        print(f"[SUMMARIZE] Фоновая суммаризация: {result}")
+        
+        return {
+            'statusCode': 200,
+            'headers': CORS_HEADERS,
+            'body': json.dumps(result),
+            'isBase64Encoded': False
+        }
+    except ValueError as e:
+        return {
+            'statusCode': 400,
+            'headers': CORS_HEADERS,
+            'body': json.dumps({'error': str(e)}),
+            'isBase64Encoded': False
+        }
+    except Exception as e:
+        print(f"[SUMMARIZE] Ошибка фоновой суммаризации: {type(e).__name__}: {e}")
+        return {
+            'statusCode': 500,
+            'headers': CORS_HEADERS,
+            'body': json.dumps({'error': 'Внутренняя ошибка сервера'}),
+            'isBase64Encoded': False
+        }
+
+
+def health_response() -> dict:
+    """Состояние circuit breaker, транспорта, пула БД и кэшей инстанса"""
+    breaker = llm_breaker.stats()
+    return {
+        'statusCode': 200,
+        'headers': {**CORS_HEADERS, 'Cache-Control': 'no-store'},
+        'body': json.dumps({
+            'status': 'ok' if breaker['state'] == 'closed' else 'degraded',
+            'llm_breaker': breaker,
+            'llm_transport': get_resilient_transport().stats(),
+            'db_pool': get_pool().stats(),
+            'scenario_cache': scenario_repo.stats(),
+            'prompt_cache': prompt_builder.stats(),
+            'history_trimmer': history_trimmer.stats(),
+            'token_counter': token_counter.stats(),
+            'rate_limiter': rate_limiter.stats()
+        }),
+        'isBase64Encoded': False
+    }
+
+
+def format_sse(stream_event: dict) -> str:
+    """Сериализовать событие потока в SSE-кадр"""
+    name = stream_event.get('type', 'message')
+    data = {k: v for k, v in stream_event.items() if k != 'type'}
+    return f"event: {name}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def open_sse_response(action: str, body: dict) -> dict:
+    """
+    Начать потоковый ответ для action=message|chat.
+    
+    Первое событие запрашивается сразу, поэтому ошибки валидации и связи
+    с моделью до первого токена превращаются в обычный HTTP-ответ.
+    body ответа — итератор SSE-кадров.
+    """
+    if action == 'message':
+        dialog_id = body.get('dialog_id')
+        message = body.get('message')
+        if not dialog_id or not message:
+            raise ValueError('dialog_id и message обязательны')
+        
+        use_case = SendMessageUseCase(PostgresDialogRepository(), build_llm_service(), token_counter, summary_jobs)
+        events = use_case.stream(dialog_id, message)
+    else:
+        user_message = body.get('message', '')
+        persona_data = body.get('persona') or {}
+        if not user_message or not persona_data:
+            raise ValueError('message и persona обязательны')
+        
+        use_case = ChatWithPatientUseCase(build_llm_service(), prompt_builder, history_trimmer)
+        events = use_case.stream(
+            build_persona(persona_data),
+            body.get('history') or [],
+            user_message
+        )
+    
+    first_event = next(events)
+    
+    def frames() -> Iterator[str]:
+        yield format_sse(first_event)
+        try:
+            for stream_event in events:
+                yield format_sse(stream_event)
+        except Exception as e:
+            print(f"[TRAINING_API] Stream error: {type(e).__name__}: {e}")
+            yield format_sse({'type': 'error', 'error': 'Внутренняя ошибка сервера'})
+    
+    return {
+        'statusCode': 200,
+        'headers': SSE_HEADERS,
+        'body': frames(),
+        'isBase64Encoded': False
+    }
+
+
+def buffered_stream_response() -> dict:
+    """
+    400 на "stream": true в буферизующих точках входа (handler, async_handler):
+    склеенные SSE-кадры приходят одним куском и не ускоряют первый токен.
+    Потоковый ответ отдаёт только stream_handler.
+    """
+    return {
+        'statusCode': 400,
+        'headers': CORS_HEADERS,
+        'body': json.dumps({
+            'error': 'Потоковый ответ не поддерживается этой точкой входа, отправьте запрос без stream'
+        }),
+        'isBase64Encoded': False
+    }
+
+
+def stream_handler(event: dict, context):
+    """
+    Вариант handler для сред, которые умеют отдавать тело по частям
+    (chunked transfer / SSE-прокси). Для потоковых запросов
+    (POST action=message|chat, "stream": true) body — итератор SSE-кадров,
+    остальные запросы обрабатываются обычным handler.
+    """
+    query_params = event.get('queryStringParameters') or {}
+    params = event.get('params') or {}
+    action = params.get('action', query_params.get('action', ''))
+    
+    try:
+        body = json.loads(event.get('body') or '{}')
+    except ValueError:
+        return handler(event, context)
+    
+    if event.get('httpMethod') != 'POST' or action not in STREAM_ACTIONS or not body.get('stream'):
+        return handler(event, context)
+    
+    limited = check_rate_limit(event)
+    if limited:
+        return limited
+    
+    try:
+        return open_sse_response(action, body)
+    except CircuitOpenError as e:
+        return unavailable_response(e)
+    except ValueError as e:
+        print(f"[TRAINING_API] Validation error: {e}")
+        return {
+            'statusCode': 400,
+            'headers': CORS_HEADERS,
+            'body': json.dumps({'error': str(e)}),
+            'isBase64Encoded': False
+        }
+    except Exception as e:
+        print(f"[TRAINING_API] Unexpected error: {type(e).__name__}: {e}")
+        return {
+            'statusCode': 500,
+            'headers': CORS_HEADERS,
+            'body': json.dumps({'error': 'Внутренняя ошибка сервера'}),
+            'isBase64Encoded': False
+        }
+
+
 def handler(event: dict, context):
     """
     API для системы тренировок диалогов с Yandex LLM.
@@ -74,8 +455,20 @@ def handler(event: dict, context):
     - GET /scenarios - список сценариев
     - POST /training/start - начать тренировку
     - POST /training/message - отправить сообщение
-    - GET /training/history?dialog_id=... - история диалога
+    - GET /training/history?dialog_id=...[&since_seq=N|&since=ISO][&limit=N] - история диалога
+    - GET ?action=health - состояние circuit breaker, транспорта, пула и кэшей
+    - POST ?action=summarize_pending и таймер-триггер - фоновая суммаризация
+      (только с X-Internal-Token = INTERNAL_TRIGGER_SECRET или по таймеру)
+    
+    Ответы scenarios и history несут ETag (If-None-Match -> 304) и сжимаются
+    gzip/br при Accept-Encoding.
+    
+    action=message|chat с "stream": true отклоняются с 400: здесь ответ
+    буферизуется целиком, по частям его отдаёт только stream_handler.
     """
+    if is_timer_trigger(event):
+        return summarize_pending_response(event)
+    
     method = event.get('httpMethod', 'GET')
     
     if method == 'OPTIONS':
@@ -88,40 +481,34 @@ def handler(event: dict, context):
     
     print(f"[TRAINING_API] {method} запрос, timestamp: {datetime.now().isoformat()}")
     
-    client_id = get_client_id(event)
+    query_params = event.get('queryStringParameters') or {}
+    params = event.get('params') or {}
+    action = params.get('action', query_params.get('action', ''))
     
-    if not rate_limiter.is_allowed(client_id):
-        remaining = rate_limiter.get_remaining(client_id)
-        print(f"[TRAINING_API] Rate limit exceeded for {client_id}")
-        return {
-            'statusCode': 429,
-            'headers': CORS_HEADERS,
-            'body': json.dumps({
-                'error': 'Превышен лимит запросов',
-                'remaining': remaining
-            }),
-            'isBase64Encoded': False
-        }
+    if method == 'GET' and action == 'health':
+        return health_response()
+    
+    if method == 'POST' and action == 'summarize_pending':
+        return summarize_pending_response(event)
+    
+    limited = check_rate_limit(event)
+    if limited:
+        return limited
     
     try:
-        query_params = event.get('queryStringParameters') or {}
-        params = event.get('params') or {}
-        action = params.get('action', query_params.get('action', ''))
-        
         dialog_repo = PostgresDialogRepository()
-        scenario_repo = PostgresScenarioRepository()
         
         if method == 'GET':
             if action == 'scenarios':
                 use_case = ListScenariosUseCase(scenario_repo)
+                etag = make_etag('scenarios', use_case.version())
+                if is_not_modified(event, etag):
+                    return not_modified_response({**CORS_HEADERS, 'ETag': etag})
+                
                 scenarios = use_case.execute()
+                print(f"[TRAINING_API] Кэш сценариев: {scenario_repo.stats()}")
                 
-                return {
-                    'statusCode': 200,
-                    'headers': CORS_HEADERS,
-                    'body': json.dumps({'scenarios': scenarios}),
-                    'isBase64Encoded': False
-                }
+                return json_response(event, 200, {'scenarios': scenarios}, CORS_HEADERS, etag=etag)
             
             elif action == 'history':
                 dialog_id = query_params.get('dialog_id')
@@ -133,20 +520,27 @@ def handler(event: dict, context):
                         'isBase64Encoded': False
                     }
                 
+                since_seq = parse_int_param(query_params, 'since_seq')
+                limit = parse_int_param(query_params, 'limit')
+                since = parse_datetime_param(query_params, 'since')
+                
                 use_case = GetDialogHistoryUseCase(dialog_repo)
-                history = use_case.execute(dialog_id)
+                # Версия - один индексный запрос: на 304 сообщения не читаются
+                etag = make_etag('history', dialog_id, use_case.version(dialog_id), since_seq, since, limit)
+                if is_not_modified(event, etag):
+                    return not_modified_response({**CORS_HEADERS, 'ETag': etag})
                 
-                return {
-                    'statusCode': 200,
-                    'headers': CORS_HEADERS,
-                    'body': json.dumps(history),
-                    'isBase64Encoded': False
-                }
+                history = use_case.execute(dialog_id, since_seq=since_seq, since=since, limit=limit)
+                
+                return json_response(event, 200, history, CORS_HEADERS, etag=etag)
         
         elif method == 'POST':
             body_str = event.get('body') or '{}'
             body = json.loads(body_str)
             
+            if action in STREAM_ACTIONS and body.get('stream'):
+                return buffered_stream_response()
+            
             if action == 'start':
                 scenario_id = body.get('scenario_id')
                 user_id = body.get('user_id', 'anonymous')
@@ -192,8 +586,8 @@ def handler(event: dict, context):
                 
                 print(f"[TRAINING_API] Обработка сообщения для диалога {dialog_id}")
                 
-                llm_client = RouterAILLMClient()
-                use_case = SendMessageUseCase(dialog_repo, llm_client)
+                llm_client = build_llm_service()
+                use_case = SendMessageUseCase(dialog_repo, llm_client, token_counter, summary_jobs)
                 result = use_case.execute(dialog_id, message)
                 
                 print(f"[TRAINING_API] Ответ получен")
@@ -219,9 +613,11 @@ def handler(event: dict, context):
                     }
                 
                 persona = build_persona(persona_data)
-                llm_client = RouterAILLMClient()
-                use_case = ChatWithPatientUseCase(llm_client)
+                llm_client = build_llm_service()
+                use_case = ChatWithPatientUseCase(llm_client, prompt_builder, history_trimmer)
                 result = use_case.execute(persona, history, user_message)
+                print(f"[TRAINING_API] Кэш промптов: {prompt_builder.stats()}, "
+                      f"обрезка истории: {history_trimmer.stats()}")
                 
                 return {
                     'statusCode': 200,
@@ -237,6 +633,9 @@ def handler(event: dict, context):
             'isBase64Encoded': False
         }
     
+    except CircuitOpenError as e:
+        return unavailable_response(e)
+    
     except ValueError as e:
         print(f"[TRAINING_API] Validation error: {e}")
         return {
@@ -256,4 +655,81 @@ def handler(event: dict, context):
             'headers': CORS_HEADERS,
             'body': json.dumps({'error': 'Внутренняя ошибка сервера'}),
             'isBase64Encoded': False
-        }
\ No newline at end of file
+        }
+
+
+async def async_handler(event: dict, context):
+    """
+    Асинхронная точка входа для сред, которые вызывают async def handler.
+    
+    POST action=message|chat выполняются без блокировки потока: пока модель
+    генерирует ответ, инстанс обслуживает другие ходы диалогов. Остальные
+    запросы обрабатываются синхронным handler в пуле потоков; "stream": true,
+    как и в handler, отклоняется.
+    """
+    method = event.get('httpMethod', 'GET')
+    query_params = event.get('queryStringParameters') or {}
+    params = event.get('params') or {}
+    action = params.get('action', query_params.get('action', ''))
+    
+    if method != 'POST' or action not in STREAM_ACTIONS:
+        return await asyncio.to_thread(handler, event, context)
+    
+    # С RATE_LIMIT_BACKEND=postgres лимитер синхронно ходит в БД - не в цикле событий
+    limited = await asyncio.to_thread(check_rate_limit, event)
+    if limited:
+        return limited
+    
+    try:
+        body = json.loads(event.get('body') or '{}')
+        if body.get('stream'):
+            return buffered_stream_response()
+        
+        if action == 'message':
+            dialog_id = body.get('dialog_id')
+            message = body.get('message')
+            if not dialog_id or not message:
+                raise ValueError('dialog_id и message обязательны')
+            
+            use_case = AsyncSendMessageUseCase(
+                AsyncPostgresDialogRepository(), build_async_llm_service(), token_counter, async_summary_jobs
+            )
+            result = await use_case.execute(dialog_id, message)
+        else:
+            user_message = body.get('message', '')
+            persona_data = body.get('persona') or {}
+            if not user_message or not persona_data:
+                raise ValueError('message и persona обязательны')
+            
+            persona = build_persona(persona_data)
+            history = body.get('history') or []
+            use_case = AsyncChatWithPatientUseCase(build_async_llm_service(), prompt_builder, history_trimmer)
+            result = await use_case.execute(persona, history, user_message)
+        
+        return {
+            'statusCode': 200,
+            'headers': CORS_HEADERS,
+            'body': json.dumps(result),
+            'isBase64Encoded': False
+        }
+    
+    except CircuitOpenError as e:
+        return unavailable_response(e)
+    
+    except ValueError as e:
+        print(f"[TRAINING_API] Validation error: {e}")
+        return {
+            'statusCode': 400,
+            'headers': CORS_HEADERS,
+            'body': json.dumps({'error': str(e)}),
+            'isBase64Encoded': False
+        }
+    
+    except Exception as e:
+        print(f"[TRAINING_API] Unexpected error: {type(e).__name__}: {e}")
+        return {
+            'statusCode': 500,
+            'headers': CORS_HEADERS,
+            'body': json.dumps({'error': 'Внутренняя ошибка сервера'}),
+            'isBase64Encoded': False
+        }
@@ -0,0 +1,38 @@
+"""
+Infrastructure: асинхронный пул соединений PostgreSQL на asyncpg.
+Пул привязан к циклу событий, поэтому создаётся по одному на цикл.
+"""
+import asyncio
+import os
+import weakref
+
+import asyncpg
+
+
+_pools: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncpg.Pool]' = weakref.WeakKeyDictionary()
+_pool_locks: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]' = weakref.WeakKeyDictionary()
+
+
+async def get_async_pool() -> asyncpg.Pool:
+    """
+    Пул текущего цикла событий. asyncpg сам готовит запросы на сервере
+    и кэширует prepared statements на соединении, как execute_prepared в db_pool.
+    """
+    loop = asyncio.get_running_loop()
+    pool = _pools.get(loop)
+    if pool is not None:
+        return pool
+
+    lock = _pool_locks.setdefault(loop, asyncio.Lock())
+    async with lock:
+        pool = _pools.get(loop)
+        if pool is None:
+            pool = await asyncpg.create_pool(
+                dsn=os.environ.get('DATABASE_URL', ''),
+                min_size=0,
+                max_size=int(os.environ.get('DB_ASYNC_POOL_MAX_SIZE', '10')),
+                max_inactive_connection_lifetime=float(os.environ.get('DB_POOL_MAX_IDLE', '300'))
+            )
+            _pools[loop] = pool
+    return pool
+
@@ -0,0 +1,135 @@
+"""
+Infrastructure: асинхронные репозитории PostgreSQL на asyncpg.
+Реализация IAsyncDialogRepository и IAsyncSummaryJobRepository;
+схема и разбор строк общие с синхронными репозиториями.
+"""
+import json
+from typing import Optional
+
+from domain.entities import Dialog, PrecomputedSummary
+from domain.interfaces import IAsyncDialogRepository, IAsyncSummaryJobRepository
+from infrastructure.async_db_pool import get_async_pool
+from infrastructure.db_repositories import SCHEMA, PostgresDialogRepository
+
+
+class AsyncPostgresDialogRepository(IAsyncDialogRepository):
+    """Асинхронный вариант PostgresDialogRepository (append-only training_messages)"""
+
+    def __init__(self):
+        self.table = f"{SCHEMA}.training_dialogs"
+        self.messages_table = f"{SCHEMA}.training_messages"
+
+    async def save(self, dialog: Dialog) -> None:
+        messages, new_messages = PostgresDialogRepository._assign_seqs(dialog.messages)
+        history_start_seq = messages[0].seq if messages else 0
+
+        pool = await get_async_pool()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute(
+                    f"""
+                    INSERT INTO {self.table}
+                    (id, scenario, messages, total_tokens, created_at, updated_at, history_start_seq)
+                    VALUES ($1, $2::jsonb, '[]'::jsonb, $3, $4, $5, $6)
+                    ON CONFLICT (id) DO UPDATE SET
+                        messages = EXCLUDED.messages,
+                        total_tokens = EXCLUDED.total_tokens,
+                        updated_at = EXCLUDED.updated_at,
+                        history_start_seq = EXCLUDED.history_start_seq
+                    """,
+                    dialog.id, json.dumps(PostgresDialogRepository._scenario_payload(dialog)),
+                    dialog.total_tokens, dialog.created_at, dialog.updated_at, history_start_seq
+                )
+
+                if new_messages:
+                    await conn.executemany(
+                        f"""
+                        INSERT INTO {self.messages_table}
+                        (dialog_id, seq, role, content, token_count, created_at)
+                        VALUES ($1, $2, $3, $4, $5, $6)
+                        """,
+                        [
+                            (dialog.id, msg.seq, msg.role.value, msg.content,
+                             msg.token_count, msg.timestamp)
+                            for msg in new_messages
+                        ]
+                    )
+
+        dialog.messages = messages
+
+    async def get_by_id(self, dialog_id: str) -> Optional[Dialog]:
+        pool = await get_async_pool()
+        async with pool.acquire() as conn:
+            row = await conn.fetchrow(
+                f"""
+                SELECT id, scenario, messages, total_tokens, created_at, updated_at,
+                       history_start_seq
+                FROM {self.table}
+                WHERE id = $1
+                """,
+                dialog_id
+            )
+            if row is None:
+                return None
+
+            dialog, history_start_seq, legacy_messages = PostgresDialogRepository._header_from_row(row)
+            if history_start_seq is None:
+                dialog.messages = legacy_messages
+                return dialog
+
+            rows = await conn.fetch(
+                f"""
+                SELECT seq, role, content, token_count, created_at
+                FROM {self.messages_table}
+                WHERE dialog_id = $1 AND seq >= $2
+                ORDER BY seq
+                """,
+                dialog_id, history_start_seq
+            )
+            dialog.messages = [PostgresDialogRepository._row_to_message(r) for r in rows]
+            return dialog
+
+
+class AsyncPostgresSummaryJobRepository(IAsyncSummaryJobRepository):
+    """Операции очереди dialog_summaries, нужные ходу диалога; воркер остаётся синхронным"""
+
+    def __init__(self):
+        self.table = f"{SCHEMA}.dialog_summaries"
+
+    async def enqueue(self, dialog_id: str, from_seq: int, up_to_seq: int) -> None:
+        pool = await get_async_pool()
+        await pool.execute(
+            f"""
+            INSERT INTO {self.table} AS s (dialog_id, from_seq, up_to_seq)
+            VALUES ($1, $2, $3)
+            ON CONFLICT (dialog_id) DO UPDATE SET
+                from_seq = EXCLUDED.from_seq,
+                up_to_seq = EXCLUDED.up_to_seq,
+                status = 'pending',
+                summary = NULL,
+                attempts = 0,
+                last_error = NULL,
+                created_at = NOW(),
+                updated_at = NOW()
+            WHERE s.from_seq <> EXCLUDED.from_seq OR s.status = 'failed'
+            """,
+            dialog_id, from_seq, up_to_seq
+        )
+
+    async def get_ready(self, dialog_id: str) -> Optional[PrecomputedSummary]:
+        pool = await get_async_pool()
+        row = await pool.fetchrow(
+            f"""
+            SELECT from_seq, up_to_seq, summary
+            FROM {self.table}
+            WHERE dialog_id = $1 AND status = 'ready'
+            """,
+            dialog_id
+        )
+        if row is None:
+            return None
+        return PrecomputedSummary(dialog_id, row[0], row[1], row[2])
+
+    async def delete(self, dialog_id: str) -> None:
+        pool = await get_async_pool()
+        await pool.execute(f"DELETE FROM {self.table} WHERE dialog_id = $1", dialog_id)
@@ -0,0 +1,97 @@
+"""
+Infrastructure: асинхронный клиент RouterAI на httpx.
+Реализация интерфейса IAsyncLLMService: пока модель генерирует ответ,
+цикл событий обслуживает другие запросы.
+"""
+from typing import AsyncIterator, List
+
+import httpx
+
+from domain.interfaces import IAsyncLLMService
+from domain.entities import Message
+from infrastructure.async_transport import get_async_transport
+from infrastructure.routerai_llm_client import RouterAIProtocol, STREAM_DONE
+
+
+class AsyncRouterAILLMClient(RouterAIProtocol, IAsyncLLMService):
+    """Асинхронный клиент RouterAI; формат запросов общий с RouterAILLMClient"""
+
+    def __init__(self):
+        super().__init__()
+        self._transport = get_async_transport()
+
+    async def generate_response(self, messages: List[dict]) -> dict:
+        openai_messages = self._to_openai_messages(messages)
+        data = await self._call_api(openai_messages, self.RESPONSE_MAX_TOKENS)
+        return self._completion_result(data)
+
+    async def stream_response(self, messages: List[dict]) -> AsyncIterator[dict]:
+        openai_messages = self._to_openai_messages(messages)
+        response = await self._post(
+            self._build_payload(openai_messages, self.RESPONSE_MAX_TOKENS, stream=True),
+            stream=True
+        )
+
+        parts = []
+        usage = {}
+        try:
+            async for line in response.aiter_lines():
+                chunk = self._parse_stream_line(line)
+                if chunk is None:
+                    continue
+                if chunk is STREAM_DONE:
+                    break
+
+                if chunk.get('usage'):
+                    usage = chunk['usage']
+                for delta in self._chunk_deltas(chunk):
+                    parts.append(delta)
+                    yield {'type': 'delta', 'text': delta}
+        except httpx.HTTPError as e:
+            print(f"[LLM] Обрыв потока: {e}")
+            raise RuntimeError(f"Ошибка связи с RouterAI: {str(e)}")
+        finally:
+            await response.aclose()
+
+        yield self._stream_result(parts, usage)
+
+    async def create_summary(self, messages: List[Message]) -> str:
+        if not messages:
+            return ""
+
+        summary_request = self._build_summary_request(self._format_messages_for_summary(messages))
+        data = await self._call_api(summary_request, self.SUMMARY_MAX_TOKENS)
+        return self._summary_text(data)
+
+    async def _call_api(self, messages: List[dict], max_tokens: int) -> dict:
+        response = await self._post(self._build_payload(messages, max_tokens))
+        try:
+            return response.json()
+        except ValueError:
+            raise RuntimeError("Некорректный ответ от RouterAI")
+
+    async def _post(self, payload: dict, stream: bool = False) -> httpx.Response:
+        """POST в RouterAI через транспорт цикла событий с повторами"""
+        print(f"[LLM] Async-запрос к RouterAI ({self.model}): {len(payload['messages'])} сообщений"
+              f"{', stream' if stream else ''}")
+
+        try:
+            response = await self._transport.post(
+                self.api_url,
+                json=payload,
+                headers=self._headers(stream),
+                timeout=self.REQUEST_TIMEOUT,
+                stream=stream
+            )
+        except httpx.TimeoutException:
+            print("[LLM] Timeout при запросе к API")
+            raise RuntimeError("Превышено время ожидания ответа от модели")
+        except httpx.HTTPError as e:
+            print(f"[LLM] Ошибка запроса: {e}")
+            raise RuntimeError(f"Ошибка связи с RouterAI: {str(e)}")
+
+        if response.is_error:
+            await response.aclose()
+            print(f"[LLM] Ошибка запроса: HTTP {response.status_code}")
+            raise RuntimeError(f"Ошибка связи с RouterAI: HTTP {response.status_code}")
+        return response
@@ -0,0 +1,176 @@
+"""
+Infrastructure: асинхронный HTTP-транспорт к LLM-шлюзу на httpx.
+Один AsyncClient с пулом keep-alive соединений на цикл событий;
+повторы и бюджет времени - как у синхронного ResilientTransport.
+"""
+import asyncio
+import os
+import random
+import time
+import weakref
+from typing import Dict, Optional
+
+import httpx
+
+from infrastructure.resilience import RETRYABLE_STATUSES, parse_retry_after
+
+
+class AsyncResilientTransport:
+    """
+    POST с повторами (экспоненциальная задержка с полным джиттером)
+    в пределах общего дедлайна. Потоковые ответы возвращаются сразу
+    после заголовков, поэтому повторяются только до первого байта тела.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        max_attempts: int = 3,
+        base_delay: float = 0.25,
+        max_delay: float = 4.0,
+        deadline: float = 60.0,
+        connect_timeout: float = 5.0
+    ):
+        """
+        Args:
+            max_connections: Максимум одновременных соединений к шлюзу
+            max_keepalive_connections: Сколько простаивающих соединений держать открытыми
+            max_attempts: Максимум попыток на запрос (включая первую)
+            base_delay: Базовая задержка перед повтором (сек), удваивается
+            max_delay: Потолок задержки (сек); Retry-After шлюза соблюдается
+                как есть, пока укладывается в deadline
+            deadline: Общий бюджет времени на все попытки (сек)
+            connect_timeout: Таймаут установки соединения (сек)
+        """
+        self.max_connections = max_connections
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.connect_timeout = connect_timeout
+        self._client = httpx.AsyncClient(limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections
+        ))
+
+        self._in_flight = 0
+        self._metrics: Dict[str, int] = {
+            'requests': 0,
+            'attempts': 0,
+            'retries': 0,
+            'timeouts': 0,
+            'connection_errors': 0,
+            'retryable_statuses': 0,
+            'deadline_exhausted': 0,
+            'max_in_flight': 0,
+        }
+
+    async def post(self, url: str, timeout: Optional[float] = None, stream: bool = False, **kwargs) -> httpx.Response:
+        """
+        POST с повторами. Возвращает последний ответ (в том числе с ошибочным
+        статусом, если попытки кончились) или пробрасывает последнее исключение.
+        При stream=True тело не прочитано: вызывающий код закрывает ответ сам.
+        """
+        self._metrics['requests'] += 1
+        deadline_at = time.monotonic() + self.deadline
+        last_error: Optional[Exception] = None
+
+        for attempt in range(self.max_attempts):
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                self._metrics['deadline_exhausted'] += 1
+                break
+            attempt_timeout = min(timeout or remaining, remaining)
+            if attempt:
+                self._metrics['retries'] += 1
+
+            try:
+                response = await self._send(url, attempt_timeout, stream, kwargs)
+            except httpx.TimeoutException as e:
+                self._metrics['timeouts'] += 1
+                last_error = e
+                response = None
+            except httpx.TransportError as e:
+                self._metrics['connection_errors'] += 1
+                last_error = e
+                response = None
+
+            delay = None
+            if response is not None:
+                if response.status_code not in RETRYABLE_STATUSES:
+                    return response
+                self._metrics['retryable_statuses'] += 1
+                if attempt == self.max_attempts - 1:
+                    return response
+                delay = parse_retry_after(response.headers.get('Retry-After'))
+                if delay is not None and time.monotonic() + delay >= deadline_at:
+                    self._metrics['deadline_exhausted'] += 1
+                    print(f"[LLM] Retry-After {delay:.1f} с не укладывается в бюджет запроса")
+                    return response
+                await response.aclose()
+                last_error = httpx.HTTPStatusError(
+                    f"{response.status_code} от LLM-шлюза",
+                    request=response.request,
+                    response=response
+                )
+
+            if attempt == self.max_attempts - 1:
+                break
+            delay = self._backoff(attempt) if delay is None else delay
+            if time.monotonic() + delay >= deadline_at:
+                self._metrics['deadline_exhausted'] += 1
+                break
+            print(f"[LLM] Повтор через {delay:.2f} с после: {last_error}")
+            await asyncio.sleep(delay)
+
+        raise last_error or httpx.TimeoutException("Исчерпан бюджет времени запроса")
+
+    def stats(self) -> dict:
+        return {**self._metrics, 'in_flight': self._in_flight, 'max_connections': self.max_connections}
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    async def _send(self, url: str, timeout: float, stream: bool, kwargs: dict) -> httpx.Response:
+        self._metrics['attempts'] += 1
+        self._in_flight += 1
+        self._metrics['max_in_flight'] = max(self._metrics['max_in_flight'], self._in_flight)
+        try:
+            request = self._client.build_request(
+                'POST', url,
+                timeout=httpx.Timeout(timeout, connect=min(self.connect_timeout, timeout)),
+                **kwargs
+            )
+            return await self._client.send(request, stream=stream)
+        finally:
+            self._in_flight -= 1
+
+    def _backoff(self, attempt: int) -> float:
+        """Экспоненциальная задержка с полным джиттером"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+_transports: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncResilientTransport]' = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_async_transport() -> AsyncResilientTransport:
+    """
+    Транспорт текущего цикла событий. AsyncClient привязан к циклу,
+    в котором открыты его соединения, поэтому общий объект - на цикл, а не на процесс.
+    """
+    loop = asyncio.get_running_loop()
+    transport = _transports.get(loop)
+    if transport is None:
+        transport = AsyncResilientTransport(
+            max_connections=int(os.environ.get('ROUTERAI_ASYNC_MAX_CONNECTIONS', '100')),
+            max_keepalive_connections=int(os.environ.get('ROUTERAI_POOL_MAXSIZE', '10')),
+            max_attempts=int(os.environ.get('LLM_RETRY_MAX_ATTEMPTS', '3')),
+            base_delay=float(os.environ.get('LLM_RETRY_BASE_DELAY', '0.25')),
+            max_delay=float(os.environ.get('LLM_RETRY_MAX_DELAY', '4')),
+            deadline=float(os.environ.get('LLM_DEADLINE_SECONDS', '60'))
+        )
+        _transports[loop] = transport
+    return transport
@@ -0,0 +1,280 @@
+"""
+Infrastructure: circuit breaker для LLM-шлюза.
+Декоратор над любым ILLMService: при деградации шлюза запросы
+отклоняются сразу, а не держат воркер до таймаута.
+"""
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from typing import AsyncIterator, Callable, Deque, Iterator, List, Tuple
+
+from domain.entities import Message
+from domain.interfaces import IAsyncLLMService, ILLMService
+
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(RuntimeError):
+    """Цепь разомкнута: шлюз деградировал, повторить через retry_after секунд"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"LLM-шлюз временно недоступен, повторите через {math.ceil(retry_after)} с")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Состояния closed -> open -> half_open -> closed.
+
+    В closed учитываются вызовы за последние window_seconds. Цепь
+    размыкается, если вызовов не меньше min_calls и доля ошибок или
+    медленных вызовов (дольше slow_call_seconds) превышает порог.
+    Через open_seconds цепь пропускает half_open_max_calls пробных
+    вызовов: все успешны - замыкается, любой неуспешен - снова open.
+    """
+
+    def __init__(
+        self,
+        failure_rate_threshold: float = 0.5,
+        slow_call_seconds: float = 20.0,
+        slow_call_rate_threshold: float = 0.8,
+        window_seconds: float = 30.0,
+        min_calls: int = 10,
+        open_seconds: float = 15.0,
+        half_open_max_calls: int = 2,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            failure_rate_threshold: Доля ошибок в окне, при которой цепь размыкается
+            slow_call_seconds: Вызов дольше считается медленным (сек)
+            slow_call_rate_threshold: Доля медленных вызовов, при которой цепь размыкается
+            window_seconds: Размер скользящего окна (сек)
+            min_calls: Минимум вызовов в окне для принятия решения
+            open_seconds: Сколько цепь остаётся разомкнутой (сек)
+            half_open_max_calls: Сколько пробных вызовов пропускать в half_open
+        """
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+        self._clock = clock
+        self._lock = threading.Lock()
+
+        self._state = CLOSED
+        # (время завершения, ошибка, медленный)
+        self._calls: Deque[Tuple[float, bool, bool]] = deque()
+        self._failures = 0
+        self._slow = 0
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probes_succeeded = 0
+
+        self._rejected = 0
+        self._opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open(self._clock())
+            return self._state
+
+    def before_call(self) -> None:
+        """Пропустить вызов или бросить CircuitOpenError"""
+        now = self._clock()
+        with self._lock:
+            self._maybe_half_open(now)
+            if self._state == CLOSED:
+                return
+            if self._state == HALF_OPEN:
+                if self._probes_in_flight + self._probes_succeeded < self.half_open_max_calls:
+                    self._probes_in_flight += 1
+                    return
+            self._rejected += 1
+            retry_after = self._opened_at + self.open_seconds - now
+        raise CircuitOpenError(max(1.0, retry_after))
+
+    def record(self, duration: float, failed: bool) -> None:
+        """Учесть завершённый вызов, пропущенный before_call"""
+        now = self._clock()
+        slow = duration >= self.slow_call_seconds
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if failed or slow:
+                    self._open(now)
+                    return
+                self._probes_succeeded += 1
+                if self._probes_succeeded >= self.half_open_max_calls:
+                    print(f"[CIRCUIT] Цепь замкнута после {self._probes_succeeded} успешных проб")
+                    self._state = CLOSED
+                return
+            if self._state == OPEN:
+                return
+
+            self._calls.append((now, failed, slow))
+            self._failures += failed
+            self._slow += slow
+            self._expire(now)
+
+            total = len(self._calls)
+            if total < self.min_calls:
+                return
+            if (self._failures / total >= self.failure_rate_threshold
+                    or self._slow / total >= self.slow_call_rate_threshold):
+                print(f"[CIRCUIT] Цепь разомкнута: {self._failures} ошибок и {self._slow} "
+                      f"медленных из {total} вызовов за {self.window_seconds:.0f} с")
+                self._open(now)
+
+    def stats(self) -> dict:
+        now = self._clock()
+        with self._lock:
+            self._maybe_half_open(now)
+            self._expire(now)
+            total = len(self._calls)
+            return {
+                'state': self._state,
+                'calls_in_window': total,
+                'failure_rate': round(self._failures / total, 3) if total else 0.0,
+                'slow_call_rate': round(self._slow / total, 3) if total else 0.0,
+                'retry_after': (
+                    round(max(0.0, self._opened_at + self.open_seconds - now), 1)
+                    if self._state == OPEN else 0.0
+                ),
+                'opened': self._opened,
+                'rejected': self._rejected
+            }
+
+    def _open(self, now: float) -> None:
+        self._state = OPEN
+        self._opened_at = now
+        self._opened += 1
+        self._probes_in_flight = 0
+        self._probes_succeeded = 0
+        self._calls.clear()
+        self._failures = 0
+        self._slow = 0
+
+    def _maybe_half_open(self, now: float) -> None:
+        if self._state == OPEN and now - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+
+    def _expire(self, now: float) -> None:
+        while self._calls and now - self._calls[0][0] > self.window_seconds:
+            _, failed, slow = self._calls.popleft()
+            self._failures -= failed
+            self._slow -= slow
+
+
+class _BreakerCall:
+    """
+    Один вызов через CircuitBreaker: before_call при создании, record -
+    ровно один раз (первый исход: ошибка, первое событие потока или конец).
+    Общий для синхронной и асинхронной обёрток.
+    """
+
+    def __init__(self, breaker: CircuitBreaker):
+        breaker.before_call()
+        self._breaker = breaker
+        self._started = time.monotonic()
+        self._recorded = False
+
+    def record(self, failed: bool) -> None:
+        if not self._recorded:
+            self._recorded = True
+            self._breaker.record(time.monotonic() - self._started, failed)
+
+
+class CircuitBreakerLLMService(ILLMService):
+    """
+    Пропускает вызовы к inner через CircuitBreaker. Ошибкой считается любое
+    исключение клиента (кроме ухода потребителя потока); для потока
+    длительность - время до первого события.
+    """
+
+    def __init__(self, inner: ILLMService, breaker: CircuitBreaker):
+        self._inner = inner
+        self._breaker = breaker
+
+    def generate_response(self, messages: List[dict]) -> dict:
+        return self._call(self._inner.generate_response, messages)
+
+    def create_summary(self, messages: List[Message]) -> str:
+        return self._call(self._inner.create_summary, messages)
+
+    def stream_response(self, messages: List[dict]) -> Iterator[dict]:
+        call = _BreakerCall(self._breaker)
+        try:
+            for stream_event in self._inner.stream_response(messages):
+                call.record(failed=False)
+                yield stream_event
+        except GeneratorExit:
+            # Потребитель бросил поток - шлюз тут ни при чём
+            call.record(failed=False)
+            raise
+        except Exception:
+            call.record(failed=True)
+            raise
+        finally:
+            call.record(failed=False)
+
+    def _call(self, method, messages):
+        call = _BreakerCall(self._breaker)
+        try:
+            return method(messages)
+        except Exception:
+            call.record(failed=True)
+            raise
+        finally:
+            call.record(failed=False)
+
+
+class AsyncCircuitBreakerLLMService(IAsyncLLMService):
+    """Асинхронный вариант CircuitBreakerLLMService; breaker может быть общим с синхронным"""
+
+    def __init__(self, inner: IAsyncLLMService, breaker: CircuitBreaker):
+        self._inner = inner
+        self._breaker = breaker
+
+    async def generate_response(self, messages: List[dict]) -> dict:
+        return await self._call(self._inner.generate_response, messages)
+
+    async def create_summary(self, messages: List[Message]) -> str:
+        return await self._call(self._inner.create_summary, messages)
+
+    async def stream_response(self, messages: List[dict]) -> AsyncIterator[dict]:
+        call = _BreakerCall(self._breaker)
+        try:
+            async for stream_event in self._inner.stream_response(messages):
+                call.record(failed=False)
+                yield stream_event
+        except (GeneratorExit, asyncio.CancelledError):
+            call.record(failed=False)
+            raise
+        except Exception:
+            call.record(failed=True)
+            raise
+        finally:
+            call.record(failed=False)
+
+    async def _call(self, method, messages):
+        call = _BreakerCall(self._breaker)
+        try:
+            return await method(messages)
+        except asyncio.CancelledError:
+            # Отмена запроса клиентом - не отказ шлюза
+            call.record(failed=False)
+            raise
+        except Exception:
+            call.record(failed=True)
+            raise
+        finally:
+            call.record(failed=False)
@@ -1,122 +1,312 @@
 """
 Infrastructure: репозитории для работы с PostgreSQL.
-Реализация интерфейсов IDialogRepository и IScenarioRepository.
+Реализация интерфейсов IDialogRepository, IScenarioRepository и ISummaryJobRepository.
 """
 import os
 import json
-import psycopg2
-from typing import List, Optional
+from dataclasses import replace
+from typing import List, Optional, Tuple
 from datetime import datetime
 
-from domain.entities import Dialog, Scenario, Message, MessageRole
-from domain.interfaces import IDialogRepository, IScenarioRepository
+from psycopg2.extras import Json, execute_values
 
-
-DATABASE_URL = os.environ.get('DATABASE_URL', '')
-SCHEMA = os.environ.get('MAIN_DB_SCHEMA', 'public')
+from domain.entities import Dialog, HistoryPage, PrecomputedSummary, Scenario, Message, MessageRole
+from domain.interfaces import IDialogRepository, IScenarioRepository, ISummaryJobRepository
+from infrastructure.db_pool import execute_prepared, get_pool
 
 
-def _get_connection():
-    return psycopg2.connect(DATABASE_URL)
+SCHEMA = os.environ.get('MAIN_DB_SCHEMA', 'public')
 
 
-def _escape_str(value: str) -> str:
-    return value.replace("'", "''")
+def _connection():
+    """Соединение из общего пула процесса на время блока with"""
+    return get_pool().connection()
 
 
 class PostgresDialogRepository(IDialogRepository):
-    """Репозиторий диалогов в PostgreSQL"""
+    """
+    Репозиторий диалогов в PostgreSQL.
+    
+    Сообщения хранятся append-only в training_messages по ключу (dialog_id, seq):
+    save дописывает только новые сообщения. Активное окно истории начинается
+    с history_start_seq; диалоги со старой схемой (history_start_seq IS NULL)
+    читаются из JSONB training_dialogs.messages и переносятся при следующем save.
+    """
     
     def __init__(self):
         self.table = f"{SCHEMA}.training_dialogs"
+        self.messages_table = f"{SCHEMA}.training_messages"
     
     def save(self, dialog: Dialog) -> None:
-        conn = _get_connection()
-        try:
+        messages, new_messages = self._assign_seqs(dialog.messages)
+        history_start_seq = messages[0].seq if messages else 0
+        
+        with _connection() as conn:
             with conn.cursor() as cur:
-                messages_json = json.dumps([
-                    {
-                        'role': msg.role.value,
-                        'content': msg.content,
-                        'timestamp': msg.timestamp.isoformat(),
-                        'token_count': msg.token_count
-                    }
-                    for msg in dialog.messages
-                ])
-                
-                scenario_json = json.dumps({
-                    'id': dialog.scenario.id,
-                    'title': dialog.scenario.title,
-                    'description': dialog.scenario.description,
-                    'system_prompt': dialog.scenario.system_prompt,
-                    'max_tokens': dialog.scenario.max_tokens
-                })
+                scenario_json = Json(self._scenario_payload(dialog))
                 
-                esc_id = _escape_str(dialog.id)
-                esc_scenario = _escape_str(scenario_json)
-                esc_messages = _escape_str(messages_json)
-                created = dialog.created_at.isoformat()
-                updated = dialog.updated_at.isoformat()
-                
-                cur.execute(f"""
+                execute_prepared(
+                    cur,
+                    'dialog_upsert',
+                    f"""
                     INSERT INTO {self.table}
-                    (id, scenario, messages, total_tokens, created_at, updated_at)
-                    VALUES (
-                        '{esc_id}',
-                        '{esc_scenario}'::jsonb,
-                        '{esc_messages}'::jsonb,
-                        {dialog.total_tokens},
-                        '{created}'::timestamp,
-                        '{updated}'::timestamp
-                    )
+                    (id, scenario, messages, total_tokens, created_at, updated_at, history_start_seq)
+                    VALUES ($1, $2, '[]'::jsonb, $3, $4, $5, $6)
                     ON CONFLICT (id) DO UPDATE SET
                         messages = EXCLUDED.messages,
                         total_tokens = EXCLUDED.total_tokens,
-                        updated_at = EXCLUDED.updated_at
-                """)
+                        updated_at = EXCLUDED.updated_at,
+                        history_start_seq = EXCLUDED.history_start_seq
+                    """,
+                    (dialog.id, scenario_json, dialog.total_tokens,
+                     dialog.created_at, dialog.updated_at, history_start_seq)
+                )
+                
+                if new_messages:
+                    execute_values(
+                        cur,
+                        f"""
+                        INSERT INTO {self.messages_table}
+                        (dialog_id, seq, role, content, token_count, created_at)
+                        VALUES %s
+                        """,
+                        [
+                            (dialog.id, msg.seq, msg.role.value, msg.content,
+                             msg.token_count, msg.timestamp)
+                            for msg in new_messages
+                        ]
+                    )
                 conn.commit()
-        finally:
-            conn.close()
+        
+        dialog.messages = messages
+    
+    @staticmethod
+    def _scenario_payload(dialog: Dialog) -> dict:
+        """Сценарий диалога для колонки training_dialogs.scenario"""
+        return {
+            'id': dialog.scenario.id,
+            'title': dialog.scenario.title,
+            'description': dialog.scenario.description,
+            'system_prompt': dialog.scenario.system_prompt,
+            'max_tokens': dialog.scenario.max_tokens
+        }
     
     def get_by_id(self, dialog_id: str) -> Optional[Dialog]:
-        conn = _get_connection()
-        try:
+        with _connection() as conn:
             with conn.cursor() as cur:
-                esc_id = _escape_str(dialog_id)
-                cur.execute(f"""
-                    SELECT id, scenario, messages, total_tokens, created_at, updated_at
-                    FROM {self.table}
-                    WHERE id = '{esc_id}'
-                """)
+                header = self._fetch_header(cur, dialog_id)
+                if header is None:
+                    return None
                 
-                row = cur.fetchone()
-                if not row:
+                dialog, history_start_seq, legacy_messages = header
+                if history_start_seq is None:
+                    dialog.messages = legacy_messages
+                else:
+                    execute_prepared(
+                        cur,
+                        'dialog_messages_window',
+                        f"""
+                        SELECT seq, role, content, token_count, created_at
+                        FROM {self.messages_table}
+                        WHERE dialog_id = $1 AND seq >= $2
+                        ORDER BY seq
+                        """,
+                        (dialog_id, history_start_seq)
+                    )
+                    dialog.messages = [self._row_to_message(r) for r in cur.fetchall()]
+                
+                return dialog
+    
+    def get_history_page(
+        self,
+        dialog_id: str,
+        since_seq: Optional[int] = None,
+        since: Optional[datetime] = None,
+        limit: Optional[int] = None
+    ) -> Optional[HistoryPage]:
+        with _connection() as conn:
+            with conn.cursor() as cur:
+                header = self._fetch_header(cur, dialog_id)
+                if header is None:
                     return None
                 
-                scenario_data = row[1] if isinstance(row[1], dict) else json.loads(row[1])
-                scenario = Scenario(**scenario_data)
+                dialog, history_start_seq, legacy_messages = header
+                if history_start_seq is None:
+                    return self._legacy_history_page(dialog, legacy_messages, since_seq, since, limit)
                 
-                messages_data = row[2] if isinstance(row[2], list) else json.loads(row[2])
-                messages = [
-                    Message(
-                        role=MessageRole(msg['role']),
-                        content=msg['content'],
-                        timestamp=datetime.fromisoformat(msg['timestamp']),
-                        token_count=msg.get('token_count', 0)
+                execute_prepared(
+                    cur,
+                    'dialog_messages_page',
+                    f"""
+                    SELECT seq, role, content, token_count, created_at
+                    FROM {self.messages_table}
+                    WHERE dialog_id = $1
+                      AND seq >= $2
+                      AND seq > $3
+                      AND ($4::timestamp IS NULL OR created_at > $4::timestamp)
+                    ORDER BY seq
+                    LIMIT $5
+                    """,
+                    (
+                        dialog_id,
+                        history_start_seq,
+                        since_seq if since_seq is not None else -1,
+                        since,
+                        limit + 1 if limit is not None else None
                     )
-                    for msg in messages_data
-                ]
+                )
+                messages = [self._row_to_message(r) for r in cur.fetchall()]
                 
-                return Dialog(
-                    id=row[0],
-                    scenario=scenario,
-                    messages=messages,
-                    total_tokens=row[3] or 0,
-                    created_at=row[4],
-                    updated_at=row[5]
+                has_more = limit is not None and len(messages) > limit
+                return HistoryPage(
+                    dialog=dialog,
+                    messages=messages[:limit] if has_more else messages,
+                    has_more=has_more,
+                    window_start_seq=history_start_seq
+                )
+    
+    def get_history_version(self, dialog_id: str) -> Optional[str]:
+        """
+        updated_at меняется при каждом save, history_start_seq - при саммари,
+        MAX(seq) берётся из первичного ключа training_messages без чтения строк.
+        """
+        with _connection() as conn:
+            with conn.cursor() as cur:
+                execute_prepared(
+                    cur,
+                    'dialog_history_version',
+                    f"""
+                    SELECT d.updated_at, d.history_start_seq,
+                           (SELECT MAX(m.seq) FROM {self.messages_table} m WHERE m.dialog_id = d.id)
+                    FROM {self.table} d
+                    WHERE d.id = $1
+                    """,
+                    (dialog_id,)
                 )
-        finally:
-            conn.close()
+                row = cur.fetchone()
+                if not row:
+                    return None
+                updated_at, history_start_seq, last_seq = row
+                return f"{updated_at.isoformat() if updated_at else ''}:{history_start_seq}:{last_seq}"
+    
+    def _fetch_header(self, cur, dialog_id: str):
+        """
+        Строка training_dialogs без сообщений.
+        
+        Returns:
+            (Dialog без сообщений, history_start_seq, сообщения из JSONB) или None
+        """
+        execute_prepared(
+            cur,
+            'dialog_get_by_id',
+            f"""
+            SELECT id, scenario, messages, total_tokens, created_at, updated_at,
+                   history_start_seq
+            FROM {self.table}
+            WHERE id = $1
+            """,
+            (dialog_id,)
+        )
+        
+        row = cur.fetchone()
+        if not row:
+            return None
+        return self._header_from_row(row)
+    
+    @classmethod
+    def _header_from_row(cls, row):
+        """Строка SELECT из _fetch_header -> (Dialog, history_start_seq, сообщения из JSONB)"""
+        scenario_data = row[1] if isinstance(row[1], dict) else json.loads(row[1])
+        dialog = Dialog(
+            id=row[0],
+            scenario=Scenario(**scenario_data),
+            total_tokens=row[3] or 0,
+            created_at=row[4],
+            updated_at=row[5]
+        )
+        
+        history_start_seq = row[6]
+        legacy_messages = cls._parse_legacy_messages(row[2]) if history_start_seq is None else []
+        return dialog, history_start_seq, legacy_messages
+    
+    @staticmethod
+    def _legacy_history_page(
+        dialog: Dialog,
+        messages: List[Message],
+        since_seq: Optional[int],
+        since: Optional[datetime],
+        limit: Optional[int]
+    ) -> HistoryPage:
+        """Срез для диалога, история которого ещё в JSONB: seq = позиция в массиве"""
+        selected = [
+            replace(msg, seq=index)
+            for index, msg in enumerate(messages)
+            if (since_seq is None or index > since_seq)
+            and (since is None or msg.timestamp > since)
+        ]
+        has_more = limit is not None and len(selected) > limit
+        return HistoryPage(
+            dialog=dialog,
+            messages=selected[:limit] if has_more else selected,
+            has_more=has_more,
+            window_start_seq=0
+        )
+    
+    @staticmethod
+    def _row_to_message(row) -> Message:
+        return Message(
+            role=MessageRole(row[1]),
+            content=row[2],
+            timestamp=row[4],
+            token_count=row[3] or 0,
+            seq=row[0]
+        )
+    
+    @staticmethod
+    def _assign_seqs(messages: List[Message]) -> Tuple[List[Message], List[Message]]:
+        """
+        Присвоить seq несохранённым сообщениям.
+        
+        Обычно новые сообщения — хвост списка. Если перед уже сохранёнными
+        сообщениями появилось новое (история заменена саммари), всё окно
+        начиная с него дописывается заново, чтобы порядок seq совпадал
+        с порядком сообщений.
+        
+        Returns:
+            (сообщения с seq, сообщения для вставки)
+        """
+        first_new = next(
+            (i for i, msg in enumerate(messages) if msg.seq is None),
+            len(messages)
+        )
+        next_seq = max(
+            (msg.seq for msg in messages if msg.seq is not None),
+            default=-1
+        ) + 1
+        
+        result = list(messages[:first_new])
+        new_messages = []
+        for msg in messages[first_new:]:
+            stored = replace(msg, seq=next_seq)
+            next_seq += 1
+            result.append(stored)
+            new_messages.append(stored)
+        
+        return result, new_messages
+    
+    @staticmethod
+    def _parse_legacy_messages(raw) -> List[Message]:
+        """Сообщения из JSONB training_dialogs.messages (до переноса в training_messages)"""
+        messages_data = raw if isinstance(raw, list) else json.loads(raw)
+        return [
+            Message(
+                role=MessageRole(msg['role']),
+                content=msg['content'],
+                timestamp=datetime.fromisoformat(msg['timestamp']),
+                token_count=msg.get('token_count', 0)
+            )
+            for msg in messages_data
+        ]
     
     def list_by_user(self, user_id: str) -> List[Dialog]:
         return []
@@ -129,15 +319,18 @@ class PostgresScenarioRepository(IScenarioRepository):
         self.table = f"{SCHEMA}.training_scenarios"
     
     def get_by_id(self, scenario_id: str) -> Optional[Scenario]:
-        conn = _get_connection()
-        try:
+        with _connection() as conn:
             with conn.cursor() as cur:
-                esc_id = _escape_str(scenario_id)
-                cur.execute(f"""
+                execute_prepared(
+                    cur,
+                    'scenario_get_by_id',
+                    f"""
                     SELECT id, title, description, system_prompt, max_tokens
                     FROM {self.table}
-                    WHERE id = '{esc_id}'
-                """)
+                    WHERE id = $1
+                    """,
+                    (scenario_id,)
+                )
                 
                 row = cur.fetchone()
                 if not row:
@@ -150,12 +343,9 @@ class PostgresScenarioRepository(IScenarioRepository):
                     system_prompt=row[3],
                     max_tokens=row[4] or 8000
                 )
-        finally:
-            conn.close()
     
     def list_all(self) -> List[Scenario]:
-        conn = _get_connection()
-        try:
+        with _connection() as conn:
             with conn.cursor() as cur:
                 cur.execute(f"""
                     SELECT id, title, description, system_prompt, max_tokens
@@ -174,5 +364,114 @@ class PostgresScenarioRepository(IScenarioRepository):
                     )
                     for row in rows
                 ]
-        finally:
-            conn.close()
\ No newline at end of file
+    
+    def get_version(self) -> str:
+        with _connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"""
+                    SELECT COUNT(*), MAX(updated_at)
+                    FROM {self.table}
+                """)
+                count, last_updated = cur.fetchone()
+                return f"{count}:{last_updated.isoformat() if last_updated else ''}"
+
+
+class PostgresSummaryJobRepository(ISummaryJobRepository):
+    """
+    Очередь фоновой суммаризации в таблице dialog_summaries: одна строка
+    на диалог. Воркеры забирают задачи через FOR UPDATE SKIP LOCKED;
+    задача, зависшая в running дольше lock_seconds, выдаётся повторно.
+    """
+    
+    def __init__(self, lock_seconds: int = 300):
+        self.table = f"{SCHEMA}.dialog_summaries"
+        self.lock_seconds = lock_seconds
+    
+    def enqueue(self, dialog_id: str, from_seq: int, up_to_seq: int) -> None:
+        with _connection() as conn:
+            with conn.cursor() as cur:
+                execute_prepared(
+                    cur,
+                    'summary_enqueue',
+                    f"""
+                    INSERT INTO {self.table} AS s (dialog_id, from_seq, up_to_seq)
+                    VALUES ($1, $2, $3)
+                    ON CONFLICT (dialog_id) DO UPDATE SET
+                        from_seq = EXCLUDED.from_seq,
+                        up_to_seq = EXCLUDED.up_to_seq,
+                        status = 'pending',
+                        summary = NULL,
+                        attempts = 0,
+                        last_error = NULL,
+                        created_at = NOW(),
+                        updated_at = NOW()
+                    WHERE s.from_seq <> EXCLUDED.from_seq OR s.status = 'failed'
+                    """,
+                    (dialog_id, from_seq, up_to_seq)
+                )
+                conn.commit()
+    
+    def get_ready(self, dialog_id: str) -> Optional[PrecomputedSummary]:
+        with _connection() as conn:
+            with conn.cursor() as cur:
+                execute_prepared(
+                    cur,
+                    'summary_get_ready',
+                    f"""
+                    SELECT from_seq, up_to_seq, summary
+                    FROM {self.table}
+                    WHERE dialog_id = $1 AND status = 'ready'
+                    """,
+                    (dialog_id,)
+                )
+                row = cur.fetchone()
+                if not row:
+                    return None
+                return PrecomputedSummary(dialog_id, row[0], row[1], row[2])
+    
+    def claim_pending(self, limit: int) -> List[PrecomputedSummary]:
+        with _connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"""
+                    UPDATE {self.table}
+                    SET status = 'running',
+                        attempts = attempts + 1,
+                        locked_until = NOW() + %s * INTERVAL '1 second',
+                        updated_at = NOW()
+                    WHERE dialog_id IN (
+                        SELECT dialog_id FROM {self.table}
+                        WHERE status = 'pending'
+                           OR (status = 'running' AND locked_until < NOW())
+                        ORDER BY created_at
+                        LIMIT %s
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    RETURNING dialog_id, from_seq, up_to_seq
+                """, (self.lock_seconds, limit))
+                jobs = [PrecomputedSummary(row[0], row[1], row[2]) for row in cur.fetchall()]
+                conn.commit()
+                return jobs
+    
+    def complete(self, job: PrecomputedSummary, text: str) -> None:
+        self._finish(job, 'ready', text, None)
+    
+    def fail(self, job: PrecomputedSummary, error: str) -> None:
+        self._finish(job, 'failed', None, error)
+    
+    def delete(self, dialog_id: str) -> None:
+        with _connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"DELETE FROM {self.table} WHERE dialog_id = %s", (dialog_id,))
+                conn.commit()
+    
+    def _finish(self, job: PrecomputedSummary, status: str, text: Optional[str], error: Optional[str]) -> None:
+        """Завершить задачу, если её не успели переставить на другое окно"""
+        with _connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"""
+                    UPDATE {self.table}
+                    SET status = %s, summary = %s, last_error = %s, updated_at = NOW()
+                    WHERE dialog_id = %s AND from_seq = %s AND up_to_seq = %s
+                      AND status = 'running'
+                """, (status, text, error, job.dialog_id, job.from_seq, job.up_to_seq))
+                conn.commit()
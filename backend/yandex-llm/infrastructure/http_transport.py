@@ -0,0 +1,87 @@
+"""
+Infrastructure: общий HTTP-транспорт с пулом keep-alive соединений.
+Один Session на тёплый инстанс функции, переиспользуется всеми клиентами.
+"""
+import os
+import threading
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class PooledTransport:
+    """
+    Обёртка над requests.Session с настраиваемым пулом соединений.
+
+    pool_connections — сколько хостов держать в кэше пулов,
+    pool_maxsize — максимум keep-alive соединений к одному хосту.
+    """
+
+    def __init__(
+        self,
+        pool_connections: int = 4,
+        pool_maxsize: int = 10,
+        pool_block: bool = False
+    ):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self._adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+            max_retries=0
+        )
+        self._session = requests.Session()
+        self._session.mount('https://', self._adapter)
+        self._session.mount('http://', self._adapter)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        """POST через общий пул (keep-alive соединения переиспользуются)"""
+        return self._session.post(url, **kwargs)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Счётчики пула: сколько запросов ушло, сколько TCP+TLS рукопожатий
+        пришлось сделать и сколько раз соединение было переиспользовано.
+        """
+        requests_sent = 0
+        new_connections = 0
+        pools = self._adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            requests_sent += pool.num_requests
+            new_connections += pool.num_connections
+
+        return {
+            'requests': requests_sent,
+            'new_connections': new_connections,
+            'reused_connections': max(0, requests_sent - new_connections),
+            'pool_maxsize': self.pool_maxsize
+        }
+
+    def close(self) -> None:
+        self._session.close()
+
+
+_transport: Optional[PooledTransport] = None
+_transport_lock = threading.Lock()
+
+
+def get_transport() -> PooledTransport:
+    """
+    Общий транспорт процесса. Создаётся лениво при первом запросе
+    и живёт, пока жив тёплый инстанс функции.
+    """
+    global _transport
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                _transport = PooledTransport(
+                    pool_connections=int(os.environ.get('ROUTERAI_POOL_CONNECTIONS', '4')),
+                    pool_maxsize=int(os.environ.get('ROUTERAI_POOL_MAXSIZE', '10')),
+                    pool_block=os.environ.get('ROUTERAI_POOL_BLOCK', '') == '1'
+                )
+    return _transport
@@ -0,0 +1,180 @@
+"""
+Infrastructure: rate limiter, общий для всех инстансов функции.
+Счётчики фиксированных окон хранятся в UNLOGGED-таблице PostgreSQL.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, List
+
+from infrastructure.db_pool import execute_prepared, get_pool
+from infrastructure.db_repositories import SCHEMA
+from infrastructure.rate_limiter import RateLimiter
+
+
+class PostgresRateLimiter:
+    """
+    Rate limiter с тем же API, что и RateLimiter, но с лимитом на все инстансы.
+
+    Счётчик окна ведётся в БД, но клиенты заведомо под лимитом туда не ходят:
+    у каждого инстанса есть локальный бюджет local_budget = max_requests //
+    expected_instances запросов на клиента за окно. Пока известный инстансу
+    счётчик окна плюс несинхронизированные запросы ниже sync_fraction *
+    max_requests, запрос пропускается локально. Накопленные запросы
+    дописываются в БД одним upsert вместе со следующим запросом - когда
+    локальный бюджет исчерпан или клиент подошёл к порогу; после порога
+    каждый запрос проверяется по БД.
+
+    Граница перепуска: до синхронизации инстанс пропускает не больше
+    local_budget запросов клиента, поэтому за окно клиент получит не больше
+    max_requests + N * local_budget запросов, где N - число живых инстансов
+    (при N = expected_instances - не больше 2 * max_requests). Если запросы
+    клиента приходят на один инстанс, перепуска нет: после порога счётчик
+    точный. Несинхронизированные запросы прошлого окна не переносятся.
+    Локальный RateLimiter отсекает клиентов, превысивших лимит на этом инстансе.
+    """
+
+    def __init__(
+        self,
+        local_limiter: RateLimiter,
+        expected_instances: int = 4,
+        sync_fraction: float = 0.5,
+        max_clients: int = 100_000,
+        cleanup_interval: int = 500,
+        clock: Callable[[], float] = time.time
+    ):
+        """
+        Args:
+            local_limiter: Локальный лимитер для предварительной проверки;
+                задаёт max_requests и window_seconds
+            expected_instances: Сколько инстансов делят лимит клиента;
+                задаёт локальный бюджет
+            sync_fraction: Доля лимита, после которой каждый запрос идёт в БД
+            max_clients: Максимум клиентов с локальным состоянием в памяти
+            cleanup_interval: Раз во сколько обращений к БД удалять старые окна
+        """
+        self.max_requests = local_limiter.max_requests
+        self.window_seconds = int(local_limiter.window_seconds)
+        self.local_budget = max(1, self.max_requests // max(1, expected_instances))
+        self.sync_threshold = self.max_requests * sync_fraction
+        self.max_clients = max_clients
+        self.cleanup_interval = cleanup_interval
+        self.table = f"{SCHEMA}.rate_limit_counters"
+
+        self._local = local_limiter
+        self._clock = clock
+        self._lock = threading.Lock()
+        # client_id -> [window_start, несинхронизированные запросы, известный счётчик окна]
+        self._clients: 'OrderedDict[str, List[int]]' = OrderedDict()
+
+        self._local_denied = 0
+        self._local_allowed = 0
+        self._db_round_trips = 0
+        self._db_errors = 0
+
+    def is_allowed(self, client_id: str) -> bool:
+        if not self._local.is_allowed(client_id):
+            with self._lock:
+                self._local_denied += 1
+            return False
+
+        now = self._clock()
+        window_start = int(now - now % self.window_seconds)
+
+        with self._lock:
+            state = self._clients.get(client_id)
+            if state is None or state[0] != window_start:
+                state = [window_start, 0, 0]
+                self._clients[client_id] = state
+                if len(self._clients) > self.max_clients:
+                    self._clients.popitem(last=False)
+            self._clients.move_to_end(client_id)
+            if state[2] >= self.max_requests:
+                self._local_denied += 1
+                return False
+            if state[1] < self.local_budget and state[2] + state[1] < self.sync_threshold:
+                state[1] += 1
+                self._local_allowed += 1
+                return True
+            # Забираем накопленное: параллельные запросы начнут новый счёт
+            pending, state[1] = state[1], 0
+
+        try:
+            hits = self._sync(client_id, window_start, pending + 1)
+        except Exception as e:
+            print(f"[RATE_LIMIT] Ошибка БД, используется только локальный лимит: {e}")
+            with self._lock:
+                self._db_errors += 1
+                state[1] += pending
+            return True
+
+        with self._lock:
+            state[2] = max(state[2], hits)
+        return hits <= self.max_requests
+
+    def get_remaining(self, client_id: str) -> int:
+        """Оценка без обращения к БД: по последнему известному счётчику окна"""
+        now = self._clock()
+        window_start = int(now - now % self.window_seconds)
+        with self._lock:
+            state = self._clients.get(client_id)
+            if state is None or state[0] != window_start:
+                return self._local.get_remaining(client_id)
+            return max(0, self.max_requests - state[2] - state[1])
+
+    def cleanup_old_entries(self):
+        self._local.cleanup_old_entries()
+        now = self._clock()
+        window_start = int(now - now % self.window_seconds)
+        with self._lock:
+            for client_id in [c for c, state in self._clients.items() if state[0] != window_start]:
+                del self._clients[client_id]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'local_budget': self.local_budget,
+                'local_allowed': self._local_allowed,
+                'local_denied': self._local_denied,
+                'db_round_trips': self._db_round_trips,
+                'db_errors': self._db_errors,
+                'tracked_clients': len(self._clients)
+            }
+
+    def _sync(self, client_id: str, window_start: int, hits: int) -> int:
+        """
+        Атомарно добавить к счётчику окна hits запросов: уже пропущенные
+        локально плюс текущий. Запрос пропускается, если итог не больше лимита;
+        отклонённые тоже учитываются - клиент и так у лимита до конца окна.
+
+        Returns:
+            Счётчик окна после операции
+        """
+        with get_pool().connection() as conn:
+            with conn.cursor() as cur:
+                execute_prepared(
+                    cur,
+                    'rate_limit_sync',
+                    f"""
+                    INSERT INTO {self.table} AS c (client_id, window_start, hits)
+                    VALUES ($1, $2, $3)
+                    ON CONFLICT (client_id, window_start) DO UPDATE
+                    SET hits = c.hits + EXCLUDED.hits
+                    RETURNING hits
+                    """,
+                    (client_id, window_start, hits)
+                )
+                total = cur.fetchone()[0]
+
+                with self._lock:
+                    self._db_round_trips += 1
+                    cleanup_due = self._db_round_trips % self.cleanup_interval == 0
+                if cleanup_due:
+                    execute_prepared(
+                        cur,
+                        'rate_limit_cleanup',
+                        f"DELETE FROM {self.table} WHERE window_start < $1",
+                        (window_start - self.window_seconds,)
+                    )
+                conn.commit()
+        return total
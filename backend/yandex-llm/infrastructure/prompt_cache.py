@@ -0,0 +1,63 @@
+"""
+Infrastructure: LRU-кэш системных промптов персонажей в памяти процесса.
+Персонаж не меняется в течение сессии, поэтому повторные ходы чата
+берут готовый промпт вместо сборки из секций.
+"""
+import threading
+from collections import OrderedDict
+from typing import Tuple
+
+from domain.patient_persona import PatientPersona, PatientPromptBuilder
+
+
+class CachedPromptBuilder(PatientPromptBuilder):
+    """
+    PatientPromptBuilder, запоминающий собранные промпты.
+
+    Ключ кэша - (персонаж, VERSION билдера): персонаж неизменяем и хешируется
+    встроенным hash() по содержимому, что на порядок дешевле content_hash
+    и достаточно для кэша внутри процесса.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        """
+        Args:
+            max_entries: Максимум промптов в кэше (LRU-вытеснение сверх лимита)
+        """
+        self.max_entries = max_entries
+        self._prompts: 'OrderedDict[Tuple[PatientPersona, int], str]' = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._misses = 0
+        self._evicted = 0
+
+    def build(self, persona: PatientPersona) -> str:
+        key = (persona, self.VERSION)
+        with self._lock:
+            prompt = self._prompts.get(key)
+            if prompt is not None:
+                self._prompts.move_to_end(key)
+                self._hits += 1
+                return prompt
+            self._misses += 1
+
+        prompt = super().build(persona)
+        with self._lock:
+            self._prompts[key] = prompt
+            if len(self._prompts) > self.max_entries:
+                self._prompts.popitem(last=False)
+                self._evicted += 1
+        return prompt
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 3) if lookups else 0.0,
+                'cached_prompts': len(self._prompts),
+                'max_entries': self.max_entries,
+                'evicted': self._evicted
+            }
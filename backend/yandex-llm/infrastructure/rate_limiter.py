@@ -1,69 +1,201 @@
 """
 Infrastructure: Rate Limiter для защиты от чрезмерного количества запросов.
 """
+import threading
 import time
-from collections import defaultdict
-from typing import Dict
+from collections import OrderedDict
+from typing import Callable, List, Union
+
+
+class SlidingWindowCounter:
+    """
+    Скользящее окно на двух счётчиках фиксированных окон.
+    Запросы предыдущего окна учитываются с весом оставшейся доли окна.
+    Состояние клиента: [начало текущего окна, счётчик, счётчик предыдущего окна, last_seen].
+    """
+
+    def __init__(self, max_requests: int, window_seconds: float):
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+
+    def new_state(self, now: float) -> List[float]:
+        return [now - now % self.window_seconds, 0, 0, now]
+
+    def try_acquire(self, state: List[float], now: float) -> bool:
+        self._roll(state, now)
+        state[3] = now
+        if self._estimate(state, now) >= self.max_requests:
+            return False
+        state[1] += 1
+        return True
+
+    def remaining(self, state: List[float], now: float) -> int:
+        snapshot = list(state)
+        self._roll(snapshot, now)
+        return max(0, self.max_requests - int(self._estimate(snapshot, now) + 0.999999))
+
+    def is_idle(self, state: List[float], now: float) -> bool:
+        """Состояние больше ни на что не влияет - клиента можно забыть"""
+        return now - state[3] >= 2 * self.window_seconds
+
+    def _roll(self, state: List[float], now: float) -> None:
+        window_start = now - now % self.window_seconds
+        if window_start == state[0]:
+            return
+        elapsed_windows = (window_start - state[0]) / self.window_seconds
+        state[2] = state[1] if elapsed_windows < 1.5 else 0
+        state[1] = 0
+        state[0] = window_start
+
+    def _estimate(self, state: List[float], now: float) -> float:
+        weight = 1 - (now - state[0]) / self.window_seconds
+        return state[1] + state[2] * weight
+
+
+class TokenBucket:
+    """
+    Token bucket: ёмкость max_requests, пополнение max_requests за window_seconds.
+    Состояние клиента: [токены, время последнего пополнения].
+    """
+
+    def __init__(self, max_requests: int, window_seconds: float):
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+        self._rate = max_requests / window_seconds
+
+    def new_state(self, now: float) -> List[float]:
+        return [float(self.max_requests), now]
+
+    def try_acquire(self, state: List[float], now: float) -> bool:
+        self._refill(state, now)
+        if state[0] < 1:
+            return False
+        state[0] -= 1
+        return True
+
+    def remaining(self, state: List[float], now: float) -> int:
+        tokens = min(self.max_requests, state[0] + (now - state[1]) * self._rate)
+        return int(tokens)
+
+    def is_idle(self, state: List[float], now: float) -> bool:
+        return now - state[1] >= self.window_seconds
+
+    def _refill(self, state: List[float], now: float) -> None:
+        state[0] = min(self.max_requests, state[0] + (now - state[1]) * self._rate)
+        state[1] = now
+
+
+ENGINES = {
+    'sliding_window': SlidingWindowCounter,
+    'token_bucket': TokenBucket,
+}
 
 
 class RateLimiter:
     """
-    Простой rate limiter на основе sliding window.
+    Rate limiter в памяти процесса с O(1) проверкой на запрос.
     Не требует внешних зависимостей (Redis и т.п.).
+
+    Клиенты хранятся в LRU-таблице с жёстким лимитом max_clients;
+    неактивные клиенты вытесняются понемногу каждые eviction_interval проверок.
     """
-    
-    def __init__(self, max_requests: int = 10, window_seconds: int = 60):
+
+    def __init__(
+        self,
+        max_requests: int = 10,
+        window_seconds: int = 60,
+        algorithm: Union[str, SlidingWindowCounter, TokenBucket] = 'sliding_window',
+        max_clients: int = 100_000,
+        eviction_interval: int = 64,
+        eviction_batch: int = 32,
+        clock: Callable[[], float] = time.monotonic
+    ):
         """
         Args:
             max_requests: Максимум запросов в окне
             window_seconds: Размер окна в секундах
+            algorithm: 'sliding_window', 'token_bucket' или готовый движок
+            max_clients: Максимум отслеживаемых клиентов (LRU-вытеснение сверх лимита)
+            eviction_interval: Раз во сколько проверок чистить неактивных клиентов
+            eviction_batch: Сколько неактивных клиентов удалять за одну чистку
         """
         self.max_requests = max_requests
         self.window_seconds = window_seconds
-        self._requests: Dict[str, list] = defaultdict(list)
-    
+        self.max_clients = max_clients
+        self.eviction_interval = eviction_interval
+        self.eviction_batch = eviction_batch
+        self._clock = clock
+
+        if isinstance(algorithm, str):
+            algorithm = ENGINES[algorithm](max_requests, window_seconds)
+        self._engine = algorithm
+
+        self._clients: 'OrderedDict[str, List[float]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._checks = 0
+        self._evicted = 0
+
     def is_allowed(self, client_id: str) -> bool:
         """
         Проверка, разрешён ли запрос для клиента.
-        
+
         Args:
             client_id: Идентификатор клиента (IP, user_id и т.п.)
-        
+
         Returns:
             True если разрешён, False если превышен лимит
         """
-        now = time.time()
-        
-        # Очищаем старые записи
-        self._requests[client_id] = [
-            ts for ts in self._requests[client_id]
-            if now - ts < self.window_seconds
-        ]
-        
-        # Проверяем лимит
-        if len(self._requests[client_id]) >= self.max_requests:
-            return False
-        
-        # Добавляем новый запрос
-        self._requests[client_id].append(now)
-        return True
-    
+        now = self._clock()
+        with self._lock:
+            state = self._clients.get(client_id)
+            if state is None:
+                state = self._engine.new_state(now)
+                self._clients[client_id] = state
+                if len(self._clients) > self.max_clients:
+                    self._clients.popitem(last=False)
+                    self._evicted += 1
+            else:
+                self._clients.move_to_end(client_id)
+
+            self._checks += 1
+            if self._checks % self.eviction_interval == 0:
+                self._evict_idle(now, self.eviction_batch)
+
+            return self._engine.try_acquire(state, now)
+
     def get_remaining(self, client_id: str) -> int:
-        """Сколько запросов осталось"""
-        now = time.time()
-        self._requests[client_id] = [
-            ts for ts in self._requests[client_id]
-            if now - ts < self.window_seconds
-        ]
-        return max(0, self.max_requests - len(self._requests[client_id]))
-    
+        """Сколько запросов осталось (без учёта текущей проверки и без изменения состояния)"""
+        now = self._clock()
+        with self._lock:
+            state = self._clients.get(client_id)
+            if state is None:
+                return self.max_requests
+            return self._engine.remaining(state, now)
+
     def cleanup_old_entries(self):
-        """Периодическая очистка старых записей"""
-        now = time.time()
-        for client_id in list(self._requests.keys()):
-            self._requests[client_id] = [
-                ts for ts in self._requests[client_id]
-                if now - ts < self.window_seconds
-            ]
-            if not self._requests[client_id]:
-                del self._requests[client_id]
+        """Полная очистка неактивных клиентов"""
+        with self._lock:
+            self._evict_idle(self._clock(), len(self._clients))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'tracked_clients': len(self._clients),
+                'max_clients': self.max_clients,
+                'checks': self._checks,
+                'evicted': self._evicted
+            }
+
+    def _evict_idle(self, now: float, limit: int) -> None:
+        """
+        Клиенты упорядочены по последнему обращению, поэтому неактивные
+        лежат в начале таблицы: удаляем с начала до первого активного.
+        """
+        for _ in range(limit):
+            if not self._clients:
+                return
+            client_id, state = next(iter(self._clients.items()))
+            if not self._engine.is_idle(state, now):
+                return
+            del self._clients[client_id]
+            self._evicted += 1
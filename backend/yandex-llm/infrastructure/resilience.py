@@ -0,0 +1,299 @@
+"""
+Infrastructure: повторы, бюджет времени и хеджирование запросов к LLM-шлюзу.
+Обёртка над PooledTransport с тем же методом post.
+"""
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Deque, Dict, Optional
+
+import requests
+
+from infrastructure.http_transport import PooledTransport, get_transport
+
+
+RETRYABLE_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Retry-After в секундах: число секунд или HTTP-дата (RFC 9110).
+    None - заголовка нет или он не разобран (тогда повтор по своей задержке).
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        print(f"[LLM] Не разобран Retry-After: {value!r}")
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return max(0.0, (moment - datetime.now(timezone.utc)).total_seconds())
+
+
+class LatencyTracker:
+    """Скользящее окно длительностей успешных запросов для перцентилей"""
+
+    def __init__(self, window: int = 200):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+
+class ResilientTransport:
+    """
+    Повторы с экспоненциальной задержкой и полным джиттером в пределах
+    общего дедлайна запроса; опционально - хеджирование: если ответа нет
+    дольше p95 недавних запросов, уходит дублирующий запрос и берётся
+    первый успешный ответ.
+
+    Потоковые запросы повторяются только до первого байта тела: post
+    возвращает ответ после заголовков, а тело читает уже вызывающий код.
+    """
+
+    def __init__(
+        self,
+        transport: PooledTransport,
+        max_attempts: int = 3,
+        base_delay: float = 0.25,
+        max_delay: float = 4.0,
+        deadline: float = 60.0,
+        connect_timeout: float = 5.0,
+        hedge: bool = False,
+        hedge_quantile: float = 0.95,
+        hedge_min_samples: int = 20,
+        max_hedge_ratio: float = 0.1,
+        latency: Optional[LatencyTracker] = None,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        """
+        Args:
+            transport: Пул HTTP-соединений
+            max_attempts: Максимум попыток на запрос (включая первую)
+            base_delay: Базовая задержка перед повтором (сек), удваивается
+            max_delay: Потолок задержки (сек); Retry-After шлюза соблюдается
+                как есть, пока укладывается в deadline
+            deadline: Общий бюджет времени на все попытки (сек)
+            connect_timeout: Таймаут установки соединения (сек)
+            hedge: Включить хеджирование непотоковых запросов
+            hedge_quantile: Перцентиль задержки, после которого уходит дубль
+            hedge_min_samples: Сколько замеров нужно, прежде чем хеджировать
+            max_hedge_ratio: Максимальная доля дублей от числа запросов
+        """
+        self._transport = transport
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.connect_timeout = connect_timeout
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.max_hedge_ratio = max_hedge_ratio
+        self._latency = latency or LatencyTracker()
+        self._sleep = sleep
+        self._executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='llm-hedge') if hedge else None
+
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, int] = {
+            'requests': 0,
+            'attempts': 0,
+            'retries': 0,
+            'timeouts': 0,
+            'connection_errors': 0,
+            'retryable_statuses': 0,
+            'deadline_exhausted': 0,
+            'hedges_sent': 0,
+            'hedges_won': 0,
+        }
+
+    def post(self, url: str, timeout: Optional[float] = None, stream: bool = False, **kwargs) -> requests.Response:
+        """
+        POST с повторами. Возвращает последний ответ (в том числе с ошибочным
+        статусом, если попытки кончились) или пробрасывает последнее исключение.
+
+        Args:
+            timeout: Таймаут одной попытки (сек), не больше оставшегося бюджета
+        """
+        self._count('requests')
+        deadline_at = time.monotonic() + self.deadline
+        last_error: Optional[Exception] = None
+
+        for attempt in range(self.max_attempts):
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                self._count('deadline_exhausted')
+                break
+            attempt_timeout = min(timeout or remaining, remaining)
+            if attempt:
+                self._count('retries')
+
+            try:
+                response = self._attempt(url, attempt_timeout, stream, kwargs)
+            except requests.exceptions.Timeout as e:
+                self._count('timeouts')
+                last_error = e
+                response = None
+            except requests.exceptions.ConnectionError as e:
+                self._count('connection_errors')
+                last_error = e
+                response = None
+
+            if response is not None:
+                if response.status_code not in RETRYABLE_STATUSES:
+                    return response
+                self._count('retryable_statuses')
+                if attempt == self.max_attempts - 1:
+                    return response
+                delay = parse_retry_after(response.headers.get('Retry-After'))
+                if delay is not None and time.monotonic() + delay >= deadline_at:
+                    # Шлюз просит ждать дольше бюджета: повтор заведомо опоздает
+                    self._count('deadline_exhausted')
+                    print(f"[LLM] Retry-After {delay:.1f} с не укладывается в бюджет запроса")
+                    return response
+                response.close()
+                last_error = requests.exceptions.HTTPError(
+                    f"{response.status_code} от LLM-шлюза", response=response
+                )
+            else:
+                delay = None
+
+            if attempt == self.max_attempts - 1:
+                break
+            delay = self._backoff(attempt) if delay is None else delay
+            if time.monotonic() + delay >= deadline_at:
+                self._count('deadline_exhausted')
+                break
+            print(f"[LLM] Повтор через {delay:.2f} с после: {last_error}")
+            self._sleep(delay)
+
+        raise last_error or requests.exceptions.Timeout("Исчерпан бюджет времени запроса")
+
+    def stats(self) -> dict:
+        with self._lock:
+            metrics = dict(self._metrics)
+        p50 = self._latency.percentile(0.5)
+        p95 = self._latency.percentile(0.95)
+        p99 = self._latency.percentile(0.99)
+        metrics.update({
+            'latency_p50_ms': round(p50 * 1000) if p50 is not None else None,
+            'latency_p95_ms': round(p95 * 1000) if p95 is not None else None,
+            'latency_p99_ms': round(p99 * 1000) if p99 is not None else None,
+            'transport': self._transport.stats()
+        })
+        return metrics
+
+    def _attempt(self, url: str, timeout: float, stream: bool, kwargs: dict) -> requests.Response:
+        """Одна попытка; для непотоковых запросов - возможно, с дублем"""
+        hedge_delay = None if stream else self._hedge_delay()
+        if hedge_delay is None or hedge_delay >= timeout:
+            return self._send(url, timeout, stream, kwargs)
+
+        primary = self._executor.submit(self._send, url, timeout, stream, kwargs)
+        done, _ = wait([primary], timeout=hedge_delay)
+        if done:
+            return primary.result()
+
+        self._count('hedges_sent')
+        hedged = self._executor.submit(self._send, url, max(0.1, timeout - hedge_delay), stream, kwargs)
+        pending = {primary, hedged}
+        first_error: Optional[Exception] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    response = future.result()
+                except requests.exceptions.RequestException as e:
+                    first_error = first_error or e
+                    continue
+                if response.status_code in RETRYABLE_STATUSES and pending:
+                    response.close()
+                    continue
+                if future is hedged:
+                    self._count('hedges_won')
+                for loser in pending:
+                    loser.add_done_callback(self._close_loser)
+                return response
+        raise first_error
+
+    def _send(self, url: str, timeout: float, stream: bool, kwargs: dict) -> requests.Response:
+        self._count('attempts')
+        started = time.monotonic()
+        response = self._transport.post(
+            url,
+            timeout=(min(self.connect_timeout, timeout), timeout),
+            stream=stream,
+            **kwargs
+        )
+        if response.status_code < 400:
+            self._latency.record(time.monotonic() - started)
+        return response
+
+    def _hedge_delay(self) -> Optional[float]:
+        if not self.hedge or len(self._latency) < self.hedge_min_samples:
+            return None
+        with self._lock:
+            if self._metrics['hedges_sent'] >= self._metrics['requests'] * self.max_hedge_ratio:
+                return None
+        return self._latency.percentile(self.hedge_quantile)
+
+    def _backoff(self, attempt: int) -> float:
+        """Экспоненциальная задержка с полным джиттером"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    @staticmethod
+    def _close_loser(future) -> None:
+        """Ответ проигравшего запроса не нужен - вернуть соединение в пул"""
+        if future.exception() is None:
+            future.result().close()
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._metrics[name] += 1
+
+
+_resilient: Optional[ResilientTransport] = None
+_resilient_lock = threading.Lock()
+
+
+def get_resilient_transport() -> ResilientTransport:
+    """Общий для процесса транспорт LLM с повторами, настраивается переменными окружения"""
+    global _resilient
+    if _resilient is None:
+        with _resilient_lock:
+            if _resilient is None:
+                _resilient = ResilientTransport(
+                    get_transport(),
+                    max_attempts=int(os.environ.get('LLM_RETRY_MAX_ATTEMPTS', '3')),
+                    base_delay=float(os.environ.get('LLM_RETRY_BASE_DELAY', '0.25')),
+                    max_delay=float(os.environ.get('LLM_RETRY_MAX_DELAY', '4')),
+                    deadline=float(os.environ.get('LLM_DEADLINE_SECONDS', '60')),
+                    hedge=os.environ.get('LLM_HEDGE', '0') == '1',
+                    hedge_quantile=float(os.environ.get('LLM_HEDGE_QUANTILE', '0.95')),
+                    max_hedge_ratio=float(os.environ.get('LLM_HEDGE_MAX_RATIO', '0.1'))
+                )
+    return _resilient
@@ -3,30 +3,189 @@ Infrastructure: клиент для RouterAI (OpenAI-совместимый шл
 Реализация интерфейса ILLMService.
 """
 import os
+import json
 import requests
-from typing import List, Dict
+from typing import Iterator, List, Dict
 
 from domain.interfaces import ILLMService
 from domain.entities import Message
+from infrastructure.resilience import get_resilient_transport
 
 
-class RouterAILLMClient(ILLMService):
-    """Клиент для работы с RouterAI через OpenAI-совместимый API"""
+STREAM_DONE = object()
+
+
+class RouterAIProtocol:
+    """
+    Формат запросов и ответов RouterAI без транспорта.
+    Общий для синхронного и асинхронного клиентов.
+    """
 
     API_URL = 'https://routerai.ru/v1/chat/completions'
     DEFAULT_MODEL = 'anthropic/claude-3.5-sonnet'
     RESPONSE_TEMPERATURE = 0.7
     RESPONSE_MAX_TOKENS = 2000
     SUMMARY_MAX_TOKENS = 600
-    REQUEST_TIMEOUT = 60
+    # Таймаут одной попытки; общий бюджет на все повторы - LLM_DEADLINE_SECONDS
+    REQUEST_TIMEOUT = 25
+    # Модели, которым нужна явная разметка кэшируемого префикса (cache_control);
+    # OpenAI-модели кэшируют префикс автоматически
+    PROMPT_CACHE_MODEL_PREFIXES = ('anthropic/',)
 
     def __init__(self):
         self.api_key = os.environ.get('ROUTERAI_API_KEY', '')
         self.model = os.environ.get('ROUTERAI_MODEL', self.DEFAULT_MODEL)
+        # Локальный шлюз для нагрузочных тестов: benchmarks/fake_routerai.py
+        self.api_url = os.environ.get('ROUTERAI_API_URL') or self.API_URL
+        self.prompt_cache = (
+            os.environ.get('ROUTERAI_PROMPT_CACHE', '1') == '1'
+            and self.model.startswith(self.PROMPT_CACHE_MODEL_PREFIXES)
+        )
 
         if not self.api_key:
             raise ValueError("ROUTERAI_API_KEY обязателен")
 
+    def _headers(self, stream: bool = False) -> Dict[str, str]:
+        headers = {
+            'Authorization': f'Bearer {self.api_key}',
+            'Content-Type': 'application/json'
+        }
+        if stream:
+            headers['Accept'] = 'text/event-stream'
+        return headers
+
+    def _build_payload(self, messages: List[dict], max_tokens: int, stream: bool = False) -> dict:
+        payload = {
+            'model': self.model,
+            'messages': messages,
+            'temperature': self.RESPONSE_TEMPERATURE,
+            'max_tokens': max_tokens
+        }
+        if stream:
+            payload['stream'] = True
+            payload['stream_options'] = {'include_usage': True}
+        return payload
+
+    def _completion_result(self, data: dict) -> dict:
+        """Ответ chat/completions -> {'text', 'tokens', ...}"""
+        choices = data.get('choices', [])
+        if not choices:
+            raise RuntimeError("Пустой ответ от API")
+
+        text = choices[0].get('message', {}).get('content', '')
+        metrics = self._usage_metrics(data.get('usage') or {})
+
+        print(f"[LLM] Ответ получен: {len(text)} символов, "
+              f"completion={metrics['tokens']}, total={metrics['total_tokens']}, "
+              f"cached={metrics['cached_tokens']}")
+
+        return {'text': text, **metrics}
+
+    @staticmethod
+    def _summary_text(data: dict) -> str:
+        choices = data.get('choices', [])
+        text = choices[0].get('message', {}).get('content', '') if choices else ''
+        if not text:
+            raise RuntimeError("Пустой ответ при суммаризации")
+        return text
+
+    @staticmethod
+    def _parse_stream_line(line: str):
+        """
+        Строка SSE-потока -> чанк (dict), STREAM_DONE в конце потока
+        или None для служебных и пустых строк.
+        """
+        if not line or not line.startswith('data:'):
+            return None
+        chunk_data = line[len('data:'):].strip()
+        if chunk_data == '[DONE]':
+            return STREAM_DONE
+        return json.loads(chunk_data)
+
+    @staticmethod
+    def _chunk_deltas(chunk: dict) -> Iterator[str]:
+        for choice in chunk.get('choices', []):
+            delta = (choice.get('delta') or {}).get('content')
+            if delta:
+                yield delta
+
+    def _stream_result(self, parts: List[str], usage: dict) -> dict:
+        """Финальное событие потока по собранным фрагментам"""
+        text = ''.join(parts)
+        if not text:
+            raise RuntimeError("Пустой ответ от API")
+
+        metrics = self._usage_metrics(usage)
+        print(f"[LLM] Поток завершён: {len(text)} символов, "
+              f"completion={metrics['tokens']}, total={metrics['total_tokens']}, "
+              f"cached={metrics['cached_tokens']}")
+
+        return {'type': 'done', 'text': text, **metrics}
+
+    def _to_openai_messages(self, messages: List[dict]) -> List[dict]:
+        """
+        Преобразовать формат {'role','text'} в OpenAI {'role','content'}.
+        Сообщения с 'cache': True получают cache_control - провайдер кэширует
+        префикс запроса до этого места включительно.
+        """
+        result = []
+        for msg in messages:
+            text = msg.get('text', msg.get('content', ''))
+            if self.prompt_cache and msg.get('cache'):
+                content = [{'type': 'text', 'text': text, 'cache_control': {'type': 'ephemeral'}}]
+            else:
+                content = text
+            result.append({'role': msg['role'], 'content': content})
+        return result
+
+    @staticmethod
+    def _usage_metrics(usage: dict) -> dict:
+        """
+        Токены из usage. Прочитанное из кэша префикса шлюз отдаёт
+        в prompt_tokens_details.cached_tokens (формат OpenAI)
+        или в cache_read_input_tokens (формат Anthropic).
+        """
+        details = usage.get('prompt_tokens_details') or {}
+        return {
+            'tokens': usage.get('completion_tokens', 0),
+            'total_tokens': usage.get('total_tokens', 0),
+            'prompt_tokens': usage.get('prompt_tokens', 0),
+            'cached_tokens': details.get('cached_tokens') or usage.get('cache_read_input_tokens', 0)
+        }
+
+    @staticmethod
+    def _format_messages_for_summary(messages: List[Message]) -> str:
+        """Сформировать текст диалога для запроса саммари"""
+        return "\n".join(
+            f"{msg.role.value}: {msg.content}" for msg in messages
+        )
+
+    @staticmethod
+    def _build_summary_request(dialog_text: str) -> List[Dict[str, str]]:
+        """Сформировать запрос на создание саммари"""
+        return [
+            {
+                'role': 'system',
+                'content': (
+                    'Ты помощник, который создаёт краткие саммари диалогов. '
+                    'Сохраняй ключевые факты, договорённости и важную информацию. '
+                    'Отвечай кратко, не более 500 символов.'
+                )
+            },
+            {
+                'role': 'user',
+                'content': f'Создай краткое саммари следующего диалога:\n\n{dialog_text}'
+            }
+        ]
+
+
+class RouterAILLMClient(RouterAIProtocol, ILLMService):
+    """Клиент для работы с RouterAI через OpenAI-совместимый API"""
+
+    def __init__(self):
+        super().__init__()
+        self._transport = get_resilient_transport()
+
     def generate_response(self, messages: List[dict]) -> dict:
         """
         Генерация ответа от модели.
@@ -35,28 +194,54 @@ class RouterAILLMClient(ILLMService):
             messages: История в формате [{'role': 'system|user|assistant', 'text': '...'}]
 
         Returns:
-            {'text': str, 'tokens': int, 'total_tokens': int}
+            {'text': str, 'tokens': int, 'total_tokens': int,
+             'prompt_tokens': int, 'cached_tokens': int}
         """
         openai_messages = self._to_openai_messages(messages)
         data = self._call_api(openai_messages, self.RESPONSE_MAX_TOKENS)
+        return self._completion_result(data)
 
-        choices = data.get('choices', [])
-        if not choices:
-            raise RuntimeError("Пустой ответ от API")
+    def stream_response(self, messages: List[dict]) -> Iterator[dict]:
+        """
+        Потоковая генерация ответа (SSE, stream: true).
 
-        text = choices[0].get('message', {}).get('content', '')
-        usage = data.get('usage', {})
-        completion_tokens = usage.get('completion_tokens', 0)
-        total_tokens = usage.get('total_tokens', 0)
+        Args:
+            messages: История в формате [{'role': 'system|user|assistant', 'text': '...'}]
 
-        print(f"[LLM] Ответ получен: {len(text)} символов, "
-              f"completion={completion_tokens}, total={total_tokens}")
+        Yields:
+            {'type': 'delta', 'text': str} для каждого фрагмента,
+            затем {'type': 'done', 'text': str, 'tokens': int, 'total_tokens': int,
+            'prompt_tokens': int, 'cached_tokens': int}
+        """
+        openai_messages = self._to_openai_messages(messages)
+        response = self._post(
+            self._build_payload(openai_messages, self.RESPONSE_MAX_TOKENS, stream=True),
+            stream=True
+        )
 
-        return {
-            'text': text,
-            'tokens': completion_tokens,
-            'total_tokens': total_tokens
-        }
+        parts = []
+        usage = {}
+        try:
+            response.encoding = 'utf-8'
+            for line in response.iter_lines(decode_unicode=True):
+                chunk = self._parse_stream_line(line)
+                if chunk is None:
+                    continue
+                if chunk is STREAM_DONE:
+                    break
+
+                if chunk.get('usage'):
+                    usage = chunk['usage']
+                for delta in self._chunk_deltas(chunk):
+                    parts.append(delta)
+                    yield {'type': 'delta', 'text': delta}
+        except requests.exceptions.RequestException as e:
+            print(f"[LLM] Обрыв потока: {e}")
+            raise RuntimeError(f"Ошибка связи с RouterAI: {str(e)}")
+        finally:
+            response.close()
+
+        yield self._stream_result(parts, usage)
 
     def create_summary(self, messages: List[Message]) -> str:
         """
@@ -67,6 +252,9 @@ class RouterAILLMClient(ILLMService):
 
         Returns:
             Краткое содержание
+
+        Raises:
+            RuntimeError: Ошибка API или пустой ответ
         """
         if not messages:
             return ""
@@ -74,77 +262,40 @@ class RouterAILLMClient(ILLMService):
         dialog_text = self._format_messages_for_summary(messages)
         summary_request = self._build_summary_request(dialog_text)
 
-        try:
-            data = self._call_api(summary_request, self.SUMMARY_MAX_TOKENS)
-            choices = data.get('choices', [])
-            if not choices:
-                raise RuntimeError("Пустой ответ при суммаризации")
-            return choices[0].get('message', {}).get('content', '')
-        except Exception as e:
-            print(f"[LLM] Ошибка создания саммари: {e}")
-            return f"[Краткое содержание {len(messages)} сообщений]"
+        data = self._call_api(summary_request, self.SUMMARY_MAX_TOKENS)
+        return self._summary_text(data)
 
     def _call_api(self, messages: List[dict], max_tokens: int) -> dict:
         """Низкоуровневый вызов RouterAI API"""
-        headers = {
-            'Authorization': f'Bearer {self.api_key}',
-            'Content-Type': 'application/json'
-        }
-
-        payload = {
-            'model': self.model,
-            'messages': messages,
-            'temperature': self.RESPONSE_TEMPERATURE,
-            'max_tokens': max_tokens
-        }
+        response = self._post(self._build_payload(messages, max_tokens))
+        try:
+            return response.json()
+        except ValueError:
+            raise RuntimeError("Некорректный ответ от RouterAI")
 
-        print(f"[LLM] Запрос к RouterAI ({self.model}): {len(messages)} сообщений")
+    def _post(self, payload: dict, stream: bool = False) -> requests.Response:
+        """POST в RouterAI через общий транспорт с повторами и хеджированием"""
+        print(f"[LLM] Запрос к RouterAI ({self.model}): {len(payload['messages'])} сообщений"
+              f"{', stream' if stream else ''}")
 
         try:
-            response = requests.post(
-                self.API_URL,
+            response = self._transport.post(
+                self.api_url,
                 json=payload,
-                headers=headers,
-                timeout=self.REQUEST_TIMEOUT
+                headers=self._headers(stream),
+                timeout=self.REQUEST_TIMEOUT,
+                stream=stream
             )
-            response.raise_for_status()
-            return response.json()
+            try:
+                response.raise_for_status()
+            except requests.exceptions.HTTPError:
+                # Непрочитанный потоковый ответ держит соединение пула
+                response.close()
+                raise
+            return response
         except requests.exceptions.Timeout:
             print("[LLM] Timeout при запросе к API")
             raise RuntimeError("Превышено время ожидания ответа от модели")
         except requests.exceptions.RequestException as e:
             print(f"[LLM] Ошибка запроса: {e}")
             raise RuntimeError(f"Ошибка связи с RouterAI: {str(e)}")
-
-    @staticmethod
-    def _to_openai_messages(messages: List[dict]) -> List[Dict[str, str]]:
-        """Преобразовать формат {'role','text'} в OpenAI {'role','content'}"""
-        return [
-            {'role': msg['role'], 'content': msg.get('text', msg.get('content', ''))}
-            for msg in messages
-        ]
-
-    @staticmethod
-    def _format_messages_for_summary(messages: List[Message]) -> str:
-        """Сформировать текст диалога для запроса саммари"""
-        return "\n".join(
-            f"{msg.role.value}: {msg.content}" for msg in messages
-        )
-
-    @staticmethod
-    def _build_summary_request(dialog_text: str) -> List[Dict[str, str]]:
-        """Сформировать запрос на создание саммари"""
-        return [
-            {
-                'role': 'system',
-                'content': (
-                    'Ты помощник, который создаёт краткие саммари диалогов. '
-                    'Сохраняй ключевые факты, договорённости и важную информацию. '
-                    'Отвечай кратко, не более 500 символов.'
-                )
-            },
-            {
-                'role': 'user',
-                'content': f'Создай краткое саммари следующего диалога:\n\n{dialog_text}'
-            }
-        ]
@@ -0,0 +1,111 @@
+"""
+Infrastructure: кэш сценариев в памяти процесса.
+Декоратор над любым IScenarioRepository: сценарии меняются редко,
+поэтому на тёплом инстансе список и сценарии по id отдаются без БД.
+"""
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from domain.entities import Scenario
+from domain.interfaces import IScenarioRepository
+
+
+class CachedScenarioRepository(IScenarioRepository):
+    """
+    Кэширует get_by_id и list_all на ttl_seconds. По истечении TTL кэш
+    не сбрасывается сразу, а ревалидируется дешёвым get_version():
+    если версия не изменилась, закэшированные данные живут дальше.
+    """
+
+    def __init__(
+        self,
+        inner: IScenarioRepository,
+        ttl_seconds: float = 60,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self._inner = inner
+        self._ttl = ttl_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+
+        self._by_id: Dict[str, Scenario] = {}
+        self._all: Optional[List[Scenario]] = None
+        self._version: Optional[str] = None
+        self._checked_at = 0.0
+
+        self._hits = 0
+        self._misses = 0
+        self._revalidations = 0
+        self._invalidations = 0
+
+    def get_by_id(self, scenario_id: str) -> Optional[Scenario]:
+        self._revalidate()
+        with self._lock:
+            scenario = self._by_id.get(scenario_id)
+            if scenario is not None:
+                self._hits += 1
+                return scenario
+            self._misses += 1
+
+        scenario = self._inner.get_by_id(scenario_id)
+        if scenario is not None:
+            with self._lock:
+                self._by_id[scenario_id] = scenario
+        return scenario
+
+    def list_all(self) -> List[Scenario]:
+        self._revalidate()
+        with self._lock:
+            if self._all is not None:
+                self._hits += 1
+                return list(self._all)
+            self._misses += 1
+
+        scenarios = self._inner.list_all()
+        with self._lock:
+            self._all = list(scenarios)
+            self._by_id.update({s.id: s for s in scenarios})
+        return scenarios
+
+    def get_version(self) -> str:
+        self._revalidate()
+        return self._version or ''
+
+    def invalidate(self) -> None:
+        """Сбросить кэш (например, после изменения сценариев в этом процессе)"""
+        with self._lock:
+            self._drop()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 3) if lookups else 0.0,
+                'revalidations': self._revalidations,
+                'invalidations': self._invalidations,
+                'cached_scenarios': len(self._by_id)
+            }
+
+    def _revalidate(self) -> None:
+        now = self._clock()
+        with self._lock:
+            if self._version is not None and now - self._checked_at < self._ttl:
+                return
+
+        version = self._inner.get_version()
+        with self._lock:
+            self._revalidations += 1
+            if version != self._version:
+                self._drop()
+                self._version = version
+            self._checked_at = now
+
+    def _drop(self) -> None:
+        if self._by_id or self._all is not None:
+            self._invalidations += 1
+        self._by_id = {}
+        self._all = None
+        self._version = None
@@ -0,0 +1,143 @@
+"""
+Presentation слой: условные запросы (ETag / 304) и сжатие тел ответов.
+"""
+import base64
+import gzip
+import hashlib
+import json
+from typing import Optional
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+COMPRESSION_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def make_etag(*parts) -> str:
+    """Сильный ETag из частей, однозначно определяющих содержимое ответа"""
+    digest = hashlib.sha256('|'.join(str(part) for part in parts).encode('utf-8'))
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def request_header(event: dict, name: str) -> str:
+    headers = event.get('headers') or {}
+    name = name.lower()
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value or ''
+    return ''
+
+
+def is_not_modified(event: dict, etag: str) -> bool:
+    """
+    Совпадает ли If-None-Match с текущим ETag.
+    ETag сжатых ответов несут суффикс кодировки, сравнение идёт по базовой части.
+    """
+    header = request_header(event, 'If-None-Match')
+    if not header:
+        return False
+
+    base = etag.strip('"')
+    for candidate in header.split(','):
+        candidate = candidate.strip()
+        if candidate == '*':
+            return True
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        candidate = candidate.strip('"')
+        for suffix in ('-gzip', '-br'):
+            if candidate.endswith(suffix):
+                candidate = candidate[:-len(suffix)]
+        if candidate == base:
+            return True
+    return False
+
+
+def negotiate_encoding(event: dict) -> Optional[str]:
+    """Выбрать br или gzip по Accept-Encoding (с учётом q=0)"""
+    header = request_header(event, 'Accept-Encoding')
+    if not header:
+        return None
+
+    accepted = {}
+    for item in header.split(','):
+        token, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[token.strip().lower()] = quality
+
+    if brotli is not None and accepted.get('br', 0) > 0:
+        return 'br'
+    if accepted.get('gzip', 0) > 0:
+        return 'gzip'
+    return None
+
+
+def json_response(
+    event: dict,
+    status_code: int,
+    payload,
+    headers: dict,
+    etag: Optional[str] = None
+) -> dict:
+    """
+    Ответ с JSON-телом: ETag и 304 для совпадающего If-None-Match,
+    сжатие gzip/br для тел больше COMPRESSION_MIN_BYTES.
+    Vary: Accept-Encoding ставится на любой ответ, включая несжатый и 304:
+    иначе общий кэш может отдать gzip-клиенту несжатое тело или наоборот.
+    """
+    response_headers = {**headers, 'Vary': 'Accept-Encoding'}
+
+    if etag is not None:
+        if is_not_modified(event, etag):
+            response_headers['ETag'] = etag
+            return not_modified_response(response_headers)
+        response_headers['ETag'] = etag
+
+    body = json.dumps(payload)
+    raw = body.encode('utf-8')
+    encoding = negotiate_encoding(event) if len(raw) >= COMPRESSION_MIN_BYTES else None
+
+    if encoding is None:
+        return {
+            'statusCode': status_code,
+            'headers': response_headers,
+            'body': body,
+            'isBase64Encoded': False
+        }
+
+    if encoding == 'br':
+        compressed = brotli.compress(raw, quality=BROTLI_QUALITY)
+    else:
+        compressed = gzip.compress(raw, compresslevel=GZIP_LEVEL)
+
+    response_headers['Content-Encoding'] = encoding
+    if etag is not None:
+        response_headers['ETag'] = f'{etag[:-1]}-{encoding}"'
+
+    return {
+        'statusCode': status_code,
+        'headers': response_headers,
+        'body': base64.b64encode(compressed).decode('ascii'),
+        'isBase64Encoded': True
+    }
+
+
+def not_modified_response(headers: dict) -> dict:
+    """304 для ресурса, тело которого согласуется по Accept-Encoding"""
+    return {
+        'statusCode': 304,
+        'headers': {**headers, 'Vary': 'Accept-Encoding'},
+        'body': '',
+        'isBase64Encoded': False
+    }
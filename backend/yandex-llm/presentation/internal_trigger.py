@@ -0,0 +1,31 @@
+"""
+Presentation слой: служебные вызовы функции - по таймер-триггеру
+или по HTTP с общим секретом (планировщик, ручной запуск).
+"""
+import hmac
+
+from presentation.http_responses import request_header
+
+
+INTERNAL_TOKEN_HEADER = 'X-Internal-Token'
+TIMER_EVENT_TYPE = 'yandex.cloud.events.serverless.triggers.TimerMessage'
+
+
+def is_timer_trigger(event: dict) -> bool:
+    """Событие таймер-триггера: приходит не через HTTP-шлюз, подделать его снаружи нельзя"""
+    messages = event.get('messages')
+    if not isinstance(messages, list) or not messages:
+        return False
+    metadata = messages[0].get('event_metadata') if isinstance(messages[0], dict) else None
+    return isinstance(metadata, dict) and metadata.get('event_type') == TIMER_EVENT_TYPE
+
+
+def is_internal_call(event: dict, secret: str) -> bool:
+    """
+    Таймер-триггер или HTTP-запрос с заголовком X-Internal-Token, равным secret.
+    Без заданного secret по HTTP служебные действия недоступны.
+    """
+    if is_timer_trigger(event):
+        return True
+    token = request_header(event, INTERNAL_TOKEN_HEADER)
+    return bool(secret) and bool(token) and hmac.compare_digest(token.encode('utf-8'), secret.encode('utf-8'))
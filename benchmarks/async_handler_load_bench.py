@@ -0,0 +1,132 @@
+"""
+Нагрузочный тест: сколько ходов диалога один инстанс yandex-llm ведёт одновременно.
+Синхронный handler (один запрос к модели за раз) против async_handler.
+
+Модель заменена локальной заглушкой benchmarks/fake_routerai.py (её параметры
+задержки, скорости и ошибок принимаются здесь же), поэтому тест не тратит токены. action=chat не требует БД;
+для action=message нужен DATABASE_URL с применёнными db_migrations.
+
+Запуск:
+    python benchmarks/async_handler_load_bench.py [--requests 200] [--concurrency 50] [--latency fixed:0.5]
+    DATABASE_URL=postgresql://... MAIN_DB_SCHEMA=... python benchmarks/async_handler_load_bench.py --action message
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'yandex-llm'))
+
+os.environ.setdefault('ROUTERAI_API_KEY', 'bench')
+os.environ.setdefault('RATE_LIMIT_BACKEND', 'memory')
+
+from fake_routerai import FakeRouterAI, add_arguments, config_from_args
+
+
+PERSONA = {
+    'context': {'role': 'Пациентка стоматологии, 34 года', 'situation': 'Третий день болит зуб',
+                'goal': 'Понять, сколько стоит лечение'},
+    'personality': {'character': 'тревожная', 'emotionalState': 'worried'}
+}
+
+
+def make_events(action: str, count: int) -> list:
+    if action == 'chat':
+        bodies = [{'message': f'Здравствуйте, что вас беспокоит? #{i}', 'persona': PERSONA} for i in range(count)]
+    else:
+        from application.use_cases import StartTrainingUseCase
+        from infrastructure.db_repositories import PostgresDialogRepository, PostgresScenarioRepository
+
+        scenario_id = PostgresScenarioRepository().list_all()[0].id
+        start = StartTrainingUseCase(PostgresDialogRepository(), PostgresScenarioRepository())
+        bodies = [
+            {'dialog_id': start.execute(scenario_id, 'bench').id, 'message': 'Здравствуйте, что вас беспокоит?'}
+            for _ in range(count)
+        ]
+    return [
+        {
+            'httpMethod': 'POST',
+            'queryStringParameters': {'action': action},
+            'headers': {'X-Forwarded-For': f'10.0.{i // 250}.{i % 250}'},
+            'body': json.dumps(body)
+        }
+        for i, body in enumerate(bodies)
+    ]
+
+
+def report(name: str, latencies: list, elapsed: float, statuses: list, extra: str = '') -> str:
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+    errors = sum(1 for status in statuses if status != 200)
+    return (f"  {name:<6} {len(latencies) / elapsed:7.1f} req/s  p50={statistics.median(latencies) * 1000:7.1f} ms  "
+          f"p95={p95 * 1000:7.1f} ms  ошибок={errors}{extra}")
+
+
+def run_sync(index, events: list) -> str:
+    latencies, statuses = [], []
+    started = time.perf_counter()
+    for event in events:
+        t0 = time.perf_counter()
+        statuses.append(index.handler(event, None)['statusCode'])
+        latencies.append(time.perf_counter() - t0)
+    return report('sync', latencies, time.perf_counter() - started, statuses)
+
+
+async def run_async(index, events: list, concurrency: int) -> str:
+    from infrastructure.async_transport import get_async_transport
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, statuses = [], []
+
+    async def one(event):
+        async with semaphore:
+            t0 = time.perf_counter()
+            response = await index.async_handler(event, None)
+            latencies.append(time.perf_counter() - t0)
+            statuses.append(response['statusCode'])
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(event) for event in events))
+    elapsed = time.perf_counter() - started
+    in_flight = get_async_transport().stats()['max_in_flight']
+    return report('async', latencies, elapsed, statuses, f"  одновременно к модели: {in_flight}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--action', choices=['chat', 'message'], default='chat')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--sync-requests', type=int, default=20,
+                        help='Синхронный путь последовательный - хватит меньшей выборки')
+    parser.add_argument('--concurrency', type=int, default=50)
+    add_arguments(parser)
+    parser.set_defaults(latency='fixed:0.5')
+    args = parser.parse_args()
+
+    gateway = FakeRouterAI(config_from_args(args))
+    os.environ['ROUTERAI_API_URL'] = gateway.start()
+    os.environ.setdefault('ROUTERAI_ASYNC_MAX_CONNECTIONS', str(args.concurrency))
+
+    import index
+
+    sync_events = make_events(args.action, args.sync_requests)
+    async_events = make_events(args.action, args.requests)
+
+    print(f"action={args.action}, задержка модели {args.latency}, "
+          f"async: {args.requests} запросов, concurrency={args.concurrency}")
+
+    # Логи обработчиков ([TRAINING_API], [LLM]) в отчёт не выводим
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        sync_line = run_sync(index, sync_events)
+        async_line = asyncio.run(run_async(index, async_events, args.concurrency))
+    print(sync_line)
+    print(async_line)
+    print(f"  шлюз: {gateway.stats()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Бенчмарк проверки паролей: логинов в секунду на ядро при разной стоимости bcrypt
+и пропускная способность PasswordHasher при параллельных логинах.
+
+Запуск:
+    python benchmarks/bcrypt_bench.py [--costs 8 10 12] [--logins 40] [--workers N]
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'auth-api'))
+
+from password_hasher import PasswordHasher
+
+
+def measure(cost: int, logins: int, workers: int) -> None:
+    hasher = PasswordHasher(rounds=cost, max_workers=workers, max_pending=logins)
+    password_hash = hasher.hash('correct horse battery staple')
+
+    started = time.perf_counter()
+    for _ in range(logins):
+        hasher.verify('correct horse battery staple', password_hash)
+    serial = time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=logins) as clients:
+        list(clients.map(
+            lambda _: hasher.verify('correct horse battery staple', password_hash),
+            range(logins)
+        ))
+    parallel = time.perf_counter() - started
+
+    print(f"cost={cost:<3} "
+          f"{serial / logins * 1000:8.1f} мс/логин  "
+          f"{logins / serial:8.1f} логинов/с на ядро  "
+          f"{logins / parallel:8.1f} логинов/с на {workers} потоках "
+          f"(x{serial / parallel:.2f})")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--costs', type=int, nargs='+', default=[8, 10, 12])
+    parser.add_argument('--logins', type=int, default=40)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    print(f"Ядер: {os.cpu_count()}, логинов на замер: {args.logins}")
+    for cost in args.costs:
+        measure(cost, args.logins, args.workers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,634 @@
+"""
+Сквозной бенчмарк API тренировок: handler функций auth-api и yandex-llm от события до БД.
+
+Функции вызываются в процессе (--transport inprocess) или через локальный
+HTTP-адаптер benchmarks/http_adapter.py (--transport http). БД - локальный
+Postgres: схема создаётся и догоняется файлами db_migrations (плюс объекты,
+созданные в проде вне миграций, - PREREQUISITES), применённые версии
+запоминаются в bench_schema_history. Модель - заглушка
+benchmarks/fake_routerai.py (её параметры принимаются здесь же).
+
+Сценарии:
+- login_storm: одновременный вход многих пользователей (bcrypt + сессия в БД);
+- scenario_listing: список сценариев, половина запросов с If-None-Match;
+- long_dialog: параллельные диалоги по 50 ходов action=message;
+- summary_thresholds: диалог со сценарием max_tokens=1000 проходит мягкий
+  и жёсткий пороги саммари - без фонового воркера и с ним (summarize_pending);
+- concurrent_chat: одновременные ходы action=chat с историей на клиенте.
+
+По каждому сценарию: p50/p95/p99, пропускная способность и запросы к БД на запрос
+(счётчик queries пулов db_pool). Прогон дописывается строкой в историю
+(benchmarks/results/e2e_history.jsonl) и сравнивается с предыдущим прогоном
+с теми же параметрами (транспорт, нагрузка, задержка модели).
+
+Запуск:
+    python benchmarks/e2e_bench.py --database-url postgresql://postgres:@/bench?host=/tmp/pgdata
+    python benchmarks/e2e_bench.py --transport http --scenarios login_storm,concurrent_chat
+    python benchmarks/e2e_bench.py --reset-schema    # пересоздать схему и применить db_migrations заново
+"""
+import argparse
+import contextlib
+import glob
+import itertools
+import json
+import math
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+import psycopg2
+import requests
+
+from fake_routerai import FakeRouterAI, add_arguments, config_from_args
+from http_adapter import FunctionAdapter, load_module
+
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+MIGRATIONS_DIR = os.path.join(ROOT_DIR, 'db_migrations')
+DEFAULT_HISTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results', 'e2e_history.jsonl')
+
+# auth-api обращается к таблицам с явной схемой, yandex-llm берёт её из MAIN_DB_SCHEMA
+SCHEMA = 't_p66738329_webapp_functionality'
+# Секрет служебных вызовов (summarize_pending) для функций, поднятых бенчмарком
+INTERNAL_TOKEN = 'e2e-bench'
+
+BENCH_PASSWORD = 'bench-password'
+SUMMARY_SCENARIO = 'bench-summary'
+DIALOG_SCENARIO = 'dental-first-call'
+
+PERSONA = {
+    'context': {'role': 'Пациентка стоматологии, 34 года', 'situation': 'Третий день болит зуб',
+                'goal': 'Понять, сколько стоит лечение'},
+    'personality': {'character': 'тревожная', 'emotionalState': 'worried'}
+}
+
+SCENARIOS = ('login_storm', 'scenario_listing', 'long_dialog', 'summary_thresholds', 'concurrent_chat')
+
+
+# Объекты, которые в проде появились вне db_migrations, а миграции на них ссылаются.
+# Создаются перед миграцией в её транзакции, чтобы схема бенчмарка совпадала с продом
+PREREQUISITES = {
+    # V0007 переименовывает роли в группы доступа и правит записи журнала аудита
+    'V0007': """
+        CREATE TABLE IF NOT EXISTS audit_log (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER REFERENCES users(id),
+            action_type VARCHAR(100) NOT NULL,
+            entity_type VARCHAR(50),
+            entity_id INTEGER,
+            details JSONB,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """,
+    # V0013 заводит пользователей второй компании, созданной в проде через интерфейс (id=4)
+    'V0013': """
+        INSERT INTO companies (id, name, description)
+        SELECT id, 'Компания ' || id, 'Создана бенчмарком вместо ручной записи в проде'
+        FROM generate_series(2, 4) AS id
+        ON CONFLICT (id) DO NOTHING;
+        SELECT setval(pg_get_serial_sequence('companies', 'id'), (SELECT MAX(id) FROM companies));
+    """
+}
+
+
+def apply_migrations(dsn: str, reset: bool) -> str:
+    """
+    Создать схему и применить недостающие db_migrations по порядку версий,
+    каждую в своей транзакции вместе с её PREREQUISITES.
+    RuntimeError, если миграция не применилась: замер на схеме,
+    отличной от прода, ничего не говорит о проде.
+    """
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn.cursor() as cur:
+            if reset:
+                cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+            cur.execute(f"""
+                SELECT EXISTS (SELECT 1 FROM information_schema.tables WHERE table_schema = %s AND table_name = 'users'),
+                       EXISTS (SELECT 1 FROM information_schema.tables
+                               WHERE table_schema = %s AND table_name = 'bench_schema_history')
+            """, (SCHEMA, SCHEMA))
+            has_tables, has_history = cur.fetchone()
+            if has_tables and not has_history:
+                raise RuntimeError(
+                    f"Схема {SCHEMA} создана не бенчмарком (нет bench_schema_history); "
+                    f"--reset-schema пересоздаст её"
+                )
+
+            cur.execute(f"CREATE SCHEMA IF NOT EXISTS {SCHEMA}")
+            cur.execute(f"SET search_path TO {SCHEMA}")
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS bench_schema_history (
+                    version VARCHAR(10) PRIMARY KEY,
+                    script VARCHAR(255) NOT NULL,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            cur.execute("SELECT version FROM bench_schema_history")
+            done = {row[0] for row in cur.fetchall()}
+        conn.commit()
+
+        applied = []
+        for path in sorted(glob.glob(os.path.join(MIGRATIONS_DIR, 'V*__*.sql'))):
+            script = os.path.basename(path)
+            version = script.split('__')[0]
+            if version in done:
+                continue
+            with open(path, encoding='utf-8') as f:
+                sql = f.read()
+            with conn.cursor() as cur:
+                try:
+                    if version in PREREQUISITES:
+                        cur.execute(PREREQUISITES[version])
+                    cur.execute(sql)
+                    cur.execute(f"SET search_path TO {SCHEMA}")
+                    cur.execute("INSERT INTO bench_schema_history (version, script) VALUES (%s, %s)",
+                                (version, script))
+                    conn.commit()
+                except psycopg2.Error as e:
+                    conn.rollback()
+                    raise RuntimeError(f"Миграция {script} не применилась: {str(e).strip()}")
+            applied.append(version)
+    finally:
+        conn.close()
+
+    return f"миграции: применено {len(applied)}, уже были {len(done)}"
+
+
+def seed(dsn: str, users: int, rounds: int) -> None:
+    """Пользователи для login_storm и сценарий с низким max_tokens для summary_thresholds"""
+    import bcrypt
+
+    password_hash = bcrypt.hashpw(BENCH_PASSWORD.encode(), bcrypt.gensalt(rounds)).decode()
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"SET search_path TO {SCHEMA}")
+            # Хеш пересчитывается, только если сменилась стоимость: иначе вход сделает rehash
+            cur.execute("SELECT password_hash FROM users WHERE username = 'bench_user_0'")
+            row = cur.fetchone()
+            if row and not row[0].startswith(f"$2b${rounds:02d}$"):
+                cur.execute("UPDATE users SET password_hash = %s WHERE username LIKE 'bench\\_user\\_%%'",
+                            (password_hash,))
+            cur.executemany(
+                """
+                INSERT INTO users (username, email, password_hash, full_name)
+                VALUES (%s, %s, %s, %s)
+                ON CONFLICT (username) DO NOTHING
+                """,
+                [(f'bench_user_{i}', f'bench_user_{i}@bench.local', password_hash, f'Бенчмарк {i}')
+                 for i in range(users)]
+            )
+            cur.execute(
+                """
+                INSERT INTO training_scenarios (id, title, description, system_prompt, max_tokens)
+                VALUES (%s, 'Бенчмарк: пороги саммари', 'Короткий бюджет токенов', %s, 1000)
+                ON CONFLICT (id) DO NOTHING
+                """,
+                (SUMMARY_SCENARIO, 'Ты пациент стоматологии. Отвечай коротко, как живой человек.')
+            )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+_client_ips = itertools.count(1)
+
+
+def next_client_ip() -> str:
+    """Свой X-Forwarded-For на каждый запрос: лимит 20 запросов в минуту на клиента не мешает замеру"""
+    n = next(_client_ips)
+    return f"10.{(n >> 16) & 255}.{(n >> 8) & 255}.{n & 255}"
+
+
+class InProcessClient:
+    """Вызов handler напрямую с событием того же формата, что собирает адаптер"""
+
+    def __init__(self, functions: Dict[str, Callable]):
+        self.functions = functions
+
+    def call(self, function: str, method: str, query: str = '', body: Optional[dict] = None,
+             headers: Optional[dict] = None) -> Tuple[int, object, dict]:
+        event = FunctionAdapter.build_event(
+            method, f"/?{query}" if query else '/',
+            {'X-Forwarded-For': next_client_ip(), **(headers or {})},
+            json.dumps(body).encode() if body is not None else b'',
+            '127.0.0.1'
+        )
+        response = self.functions[function](event, None)
+        payload = response.get('body', '')
+        if not isinstance(payload, str):
+            payload = ''.join(payload)
+        return response['statusCode'], parse_body(payload), response.get('headers') or {}
+
+
+class HttpClient:
+    """Те же вызовы через FunctionAdapter по HTTP; сессия requests на поток"""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self._local = threading.local()
+
+    def call(self, function: str, method: str, query: str = '', body: Optional[dict] = None,
+             headers: Optional[dict] = None) -> Tuple[int, object, dict]:
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        response = session.request(
+            method, f"{self.base_url}/{function}/" + (f"?{query}" if query else ''),
+            json=body,
+            headers={'X-Forwarded-For': next_client_ip(), **(headers or {})},
+            timeout=120
+        )
+        return response.status_code, parse_body(response.text), dict(response.headers)
+
+
+def parse_body(payload: str):
+    try:
+        return json.loads(payload) if payload else None
+    except ValueError:
+        return payload
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Перцентиль по рангу (nearest-rank)"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class Bench:
+    """Общий контекст сценариев: клиент, шлюз-заглушка и счётчики запросов к БД"""
+
+    def __init__(self, client, gateway: FakeRouterAI, pools: List[Callable], args: argparse.Namespace):
+        self.client = client
+        self.gateway = gateway
+        self.pools = pools
+        self.args = args
+
+    def db_queries(self) -> int:
+        return sum(get_pool().stats()['queries'] for get_pool in self.pools)
+
+    def measure(self, name: str, operations: List[Callable[[], int]], concurrency: int,
+                ok_statuses=(200,), extra: Optional[dict] = None) -> dict:
+        """
+        Выполнить операции в concurrency потоков. Операция делает один запрос
+        к API и возвращает его статус.
+        """
+        latencies, statuses = [], []
+        lock = threading.Lock()
+
+        def run(operation):
+            t0 = time.perf_counter()
+            status = operation()
+            elapsed = time.perf_counter() - t0
+            with lock:
+                latencies.append(elapsed)
+                statuses.append(status)
+
+        queries_before = self.db_queries()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(run, operations))
+        elapsed = time.perf_counter() - started
+        return self.result(name, latencies, statuses, elapsed, self.db_queries() - queries_before,
+                           ok_statuses, extra)
+
+    @staticmethod
+    def result(name: str, latencies: List[float], statuses: List[int], elapsed: float, queries: int,
+               ok_statuses=(200,), extra: Optional[dict] = None) -> dict:
+        latencies = sorted(latencies)
+        count = len(latencies)
+        errors = Counter(status for status in statuses if status not in ok_statuses)
+        if errors:
+            extra = {**(extra or {}), 'error_statuses': dict(errors)}
+        return {
+            'scenario': name,
+            'requests': count,
+            'errors': sum(errors.values()),
+            'throughput': round(count / elapsed, 1) if elapsed else 0.0,
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 1),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+            'db_queries_per_request': round(queries / count, 2) if count else 0.0,
+            'extra': extra or {}
+        }
+
+    def start_dialog(self, scenario_id: str) -> str:
+        status, body, _ = self.client.call('yandex-llm', 'POST', 'action=start',
+                                           {'scenario_id': scenario_id, 'user_id': 'bench'})
+        if status != 200:
+            raise RuntimeError(f"action=start вернул {status}: {body}")
+        return body['dialog_id']
+
+    def send_message(self, dialog_id: str, turn: int) -> int:
+        status, _, _ = self.client.call('yandex-llm', 'POST', 'action=message', {
+            'dialog_id': dialog_id,
+            'message': f'Ход {turn}: расскажите подробнее, что именно беспокоит и когда это началось?'
+        })
+        return status
+
+
+def run_login_storm(bench: Bench) -> List[dict]:
+    args = bench.args
+
+    def login(i):
+        return lambda: bench.client.call('auth-api', 'POST', body={
+            'action': 'login', 'username': f'bench_user_{i % args.users}', 'password': BENCH_PASSWORD
+        })[0]
+
+    return [bench.measure('login_storm', [login(i) for i in range(args.logins)], args.concurrency,
+                          extra={'users': args.users})]
+
+
+def run_scenario_listing(bench: Bench) -> List[dict]:
+    args = bench.args
+    _, _, headers = bench.client.call('yandex-llm', 'GET', 'action=scenarios')
+    etag = headers.get('ETag')
+
+    def listing(i):
+        conditional = {'If-None-Match': etag} if etag and i % 2 else {}
+        return lambda: bench.client.call('yandex-llm', 'GET', 'action=scenarios', headers=conditional)[0]
+
+    return [bench.measure('scenario_listing', [listing(i) for i in range(args.requests)], args.concurrency,
+                          ok_statuses=(200, 304), extra={'conditional_share': 0.5 if etag else 0.0})]
+
+
+def run_long_dialog(bench: Bench) -> List[dict]:
+    """Диалоги идут параллельно, ходы внутри диалога - последовательно"""
+    args = bench.args
+    dialogs = [bench.start_dialog(DIALOG_SCENARIO) for _ in range(args.dialogs)]
+    turn_latencies: Dict[int, List[float]] = {}
+    lock = threading.Lock()
+
+    def dialog_operations(dialog_id):
+        def run():
+            statuses = []
+            for turn in range(args.turns):
+                t0 = time.perf_counter()
+                statuses.append(bench.send_message(dialog_id, turn))
+                with lock:
+                    turn_latencies.setdefault(turn, []).append(time.perf_counter() - t0)
+            return statuses
+        return run
+
+    gateway_before = bench.gateway.stats()
+    queries_before = bench.db_queries()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.dialogs) as pool:
+        statuses = [status for run in pool.map(lambda op: op(), map(dialog_operations, dialogs)) for status in run]
+    elapsed = time.perf_counter() - started
+    gateway = bench.gateway.stats()
+
+    first = sorted(t for turn in range(min(10, args.turns)) for t in turn_latencies[turn])
+    last = sorted(t for turn in range(max(0, args.turns - 10), args.turns) for t in turn_latencies[turn])
+    latencies = [t for values in turn_latencies.values() for t in values]
+    requests_to_model = gateway['requests'] - gateway_before['requests']
+    return [bench.result('long_dialog', latencies, statuses, elapsed, bench.db_queries() - queries_before, extra={
+        'dialogs': args.dialogs,
+        'turns': args.turns,
+        'first_10_p50_ms': round(percentile(first, 0.5) * 1000, 1),
+        'last_10_p50_ms': round(percentile(last, 0.5) * 1000, 1),
+        'inline_summaries': gateway['summaries'] - gateway_before['summaries'],
+        'prompt_tokens_per_call': round(
+            (gateway['prompt_tokens'] - gateway_before['prompt_tokens']) / max(1, requests_to_model)
+        )
+    })]
+
+
+def run_summary_thresholds(bench: Bench) -> List[dict]:
+    """
+    Диалоги на сценарии с max_tokens=1000 идут последовательно, поэтому саммари,
+    запрошенные у модели во время хода, относятся к этому ходу (ход ждёт саммари).
+    Воркер вызывается после каждого хода, как частый cron; его время и запросы
+    к БД в метрики хода не входят.
+    """
+    args = bench.args
+    results = []
+    for worker in (False, True):
+        latencies, statuses, summary_turns = [], [], []
+        turn_queries = 0
+        background = 0
+        worker_time = 0.0
+        started = time.perf_counter()
+        for _ in range(args.summary_dialogs):
+            dialog_id = bench.start_dialog(SUMMARY_SCENARIO)
+            for turn in range(args.summary_turns):
+                summaries_before = bench.gateway.stats()['summaries']
+                queries_before = bench.db_queries()
+                t0 = time.perf_counter()
+                statuses.append(bench.send_message(dialog_id, turn))
+                latencies.append(time.perf_counter() - t0)
+                turn_queries += bench.db_queries() - queries_before
+                if bench.gateway.stats()['summaries'] > summaries_before:
+                    summary_turns.append(latencies[-1])
+
+                if worker:
+                    t0 = time.perf_counter()
+                    _, body, _ = bench.client.call(
+                        'yandex-llm', 'POST', 'action=summarize_pending', {'limit': 10},
+                        headers={'X-Internal-Token': INTERNAL_TOKEN}
+                    )
+                    worker_time += time.perf_counter() - t0
+                    background += body.get('completed', 0) if isinstance(body, dict) else 0
+        elapsed = time.perf_counter() - started - worker_time
+
+        name = 'summary_thresholds/' + ('worker' if worker else 'no_worker')
+        results.append(bench.result(name, latencies, statuses, elapsed, turn_queries, extra={
+            'inline_summaries': len(summary_turns),
+            'background_summaries': background,
+            'inline_summary_turn_p50_ms': round(percentile(sorted(summary_turns), 0.5) * 1000, 1)
+        }))
+    return results
+
+
+def run_concurrent_chat(bench: Bench) -> List[dict]:
+    args = bench.args
+    history = []
+    for turn in range(args.chat_history):
+        history.append({'role': 'user', 'text': f'Вопрос {turn}: что вас беспокоит?'})
+        history.append({'role': 'assistant', 'text': 'Зуб болит, особенно ночью. Сколько будет стоить лечение?'})
+
+    def chat(i):
+        body = {'message': f'Давайте запишу вас на осмотр #{i}', 'persona': PERSONA, 'history': history}
+        if args.chat_stream:
+            body['stream'] = True
+        return lambda: bench.client.call('yandex-llm', 'POST', 'action=chat', body)[0]
+
+    return [bench.measure('concurrent_chat', [chat(i) for i in range(args.requests)], args.concurrency,
+                          extra={'history_messages': len(history), 'stream': args.chat_stream})]
+
+
+RUNNERS = {
+    'login_storm': run_login_storm,
+    'scenario_listing': run_scenario_listing,
+    'long_dialog': run_long_dialog,
+    'summary_thresholds': run_summary_thresholds,
+    'concurrent_chat': run_concurrent_chat
+}
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_params(args: argparse.Namespace, bcrypt_rounds: int) -> dict:
+    """Параметры, от которых зависят цифры: сравнивать можно только прогоны с одинаковыми"""
+    return {
+        'transport': args.transport,
+        'concurrency': args.concurrency,
+        'requests': args.requests,
+        'logins': args.logins,
+        'users': args.users,
+        'dialogs': args.dialogs,
+        'turns': args.turns,
+        'summary_dialogs': args.summary_dialogs,
+        'summary_turns': args.summary_turns,
+        'chat_history': args.chat_history,
+        'chat_stream': args.chat_stream,
+        'gateway_latency': args.latency,
+        'bcrypt_rounds': bcrypt_rounds
+    }
+
+
+def previous_run(history_path: str, params: dict) -> Optional[dict]:
+    """Последний записанный прогон с теми же параметрами"""
+    if not os.path.exists(history_path):
+        return None
+    previous = None
+    with open(history_path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                run = json.loads(line)
+                if run.get('params') == params:
+                    previous = run
+    return previous
+
+
+def format_delta(current: float, before: Optional[float]) -> str:
+    if not before:
+        return ''
+    return f"{(current - before) / before * 100:+.0f}%"
+
+
+def format_report(results: List[dict], previous: Optional[dict]) -> str:
+    before = {r['scenario']: r for r in (previous or {}).get('results', [])}
+    lines = [
+        f"  {'сценарий':<30} {'запросов':>8} {'ошибок':>6} {'req/s':>8} {'p50 мс':>8} {'p95 мс':>8} "
+        f"{'p99 мс':>8} {'БД/запрос':>9} {'Δp95':>6} {'Δreq/s':>7}"
+    ]
+    for r in results:
+        old = before.get(r['scenario'], {})
+        lines.append(
+            f"  {r['scenario']:<30} {r['requests']:>8} {r['errors']:>6} {r['throughput']:>8.1f} "
+            f"{r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['db_queries_per_request']:>9.2f} "
+            f"{format_delta(r['p95_ms'], old.get('p95_ms')):>6} "
+            f"{format_delta(r['throughput'], old.get('throughput')):>7}"
+        )
+        if r['extra']:
+            lines.append(f"  {'':<30} {r['extra']}")
+    if previous:
+        lines.append(f"  Δ - относительно прогона {previous['timestamp']} ({previous.get('commit') or '?'})")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL'))
+    parser.add_argument('--reset-schema', action='store_true', help=f'DROP SCHEMA {SCHEMA} CASCADE перед миграциями')
+    parser.add_argument('--transport', choices=['inprocess', 'http'], default='inprocess')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=400, help='Запросов в scenario_listing и concurrent_chat')
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--dialogs', type=int, default=8)
+    parser.add_argument('--turns', type=int, default=50)
+    parser.add_argument('--summary-dialogs', type=int, default=2)
+    parser.add_argument('--summary-turns', type=int, default=20)
+    parser.add_argument('--chat-history', type=int, default=10, help='Пар реплик в истории action=chat')
+    parser.add_argument('--chat-stream', action='store_true')
+    parser.add_argument('--history', default=DEFAULT_HISTORY, help='JSONL с историей прогонов')
+    parser.add_argument('--no-record', action='store_true', help='Не дописывать прогон в историю')
+    parser.add_argument('--verbose', action='store_true', help='Не глушить логи обработчиков')
+    add_arguments(parser)
+    parser.set_defaults(latency='fixed:0.05')
+    args = parser.parse_args()
+
+    scenarios = args.scenarios.split(',')
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"неизвестные сценарии: {', '.join(sorted(unknown))}")
+    if not args.database_url:
+        parser.error('нужен --database-url или DATABASE_URL')
+
+    try:
+        print(apply_migrations(args.database_url, args.reset_schema))
+    except RuntimeError as e:
+        sys.exit(str(e))
+    rounds = int(os.environ.get('BCRYPT_ROUNDS', '12'))
+    seed(args.database_url, args.users, rounds)
+
+    gateway = FakeRouterAI(config_from_args(args))
+    os.environ['ROUTERAI_API_URL'] = gateway.start()
+    os.environ['DATABASE_URL'] = args.database_url
+    os.environ['MAIN_DB_SCHEMA'] = SCHEMA
+    os.environ['INTERNAL_TRIGGER_SECRET'] = INTERNAL_TOKEN
+    os.environ.setdefault('ROUTERAI_API_KEY', 'bench')
+    os.environ.setdefault('RATE_LIMIT_BACKEND', 'memory')
+    # Потоки бенчмарка заменяют параллельные инстансы функции: пулу нужно соединение на поток
+    os.environ.setdefault('DB_POOL_MAX_SIZE', str(max(args.concurrency, args.dialogs)))
+
+    auth = load_module('auth-api')
+    training = load_module('yandex-llm')
+    functions = {'auth-api': auth.handler, 'yandex-llm': training.stream_handler}
+    adapter = None
+    if args.transport == 'http':
+        adapter = FunctionAdapter(functions)
+        client = HttpClient(adapter.start())
+    else:
+        client = InProcessClient(functions)
+    bench = Bench(client, gateway, [auth.get_pool, training.get_pool], args)
+
+    print(f"transport={args.transport}, concurrency={args.concurrency}, задержка модели {args.latency}, "
+          f"bcrypt rounds={rounds}")
+    results = []
+    with contextlib.ExitStack() as stack:
+        if not args.verbose:
+            stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, 'w'))))
+        for name in scenarios:
+            results.extend(RUNNERS[name](bench))
+    if adapter:
+        adapter.stop()
+    gateway.stop()
+
+    params = run_params(args, rounds)
+    previous = previous_run(args.history, params)
+    print(format_report(results, previous))
+
+    if not args.no_record:
+        run = {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'params': params,
+            'results': results
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(args.history)), exist_ok=True)
+        with open(args.history, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(run, ensure_ascii=False) + '\n')
+        print(f"  записано в {os.path.relpath(args.history)}")
+
+
+if __name__ == '__main__':
+    main()
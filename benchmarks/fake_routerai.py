@@ -0,0 +1,418 @@
+"""
+Локальная заглушка RouterAI: OpenAI-совместимый POST /v1/chat/completions
+для воспроизводимых замеров задержки, пропускной способности и отказоустойчивости
+без расхода токенов.
+
+Умеет:
+- задержку до первого токена из распределения (fixed / uniform / lognormal)
+  и медленный хвост (--tail-rate, --tail-latency);
+- генерацию с заданной скоростью токенов, в том числе потоком (stream: true);
+- инъекцию ошибок: HTTP-статус с Retry-After, зависание, обрыв потока;
+- сценарные реплики персонажей: ответ выбирается по системному промпту
+  и номеру хода, поэтому прогоны детерминированы;
+- usage с prompt_tokens и cached_tokens (кэш префикса по разметке cache_control).
+
+Запуск отдельным процессом:
+    python benchmarks/fake_routerai.py --port 8900 --latency lognormal:0.6,0.4 --error-rate 0.02
+    ROUTERAI_API_URL=http://127.0.0.1:8900/v1/chat/completions ...
+
+Или из бенчмарка:
+    gateway = FakeRouterAI(GatewayConfig(latency='fixed:0.5'))
+    os.environ['ROUTERAI_API_URL'] = gateway.start()
+"""
+import argparse
+import hashlib
+import http.server
+import json
+import math
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'yandex-llm'))
+
+from infrastructure.token_counter import OfflineTokenCounter
+
+
+DEFAULT_SCRIPT = {
+    'personas': [
+        {
+            'match': 'стоматолог|зуб',
+            'replies': [
+                'Здравствуйте. У меня уже третий день болит зуб, особенно ночью.',
+                'Слева внизу. На холодное реагирует очень сильно.',
+                'А это больно? Я, честно говоря, боюсь лечить зубы.',
+                'Сколько примерно будет стоить лечение?',
+                'Дороговато... А можно как-то разбить оплату?',
+                'Хорошо. А когда ближайшее свободное время?',
+            ]
+        }
+    ],
+    'default': [
+        'Здравствуйте. Я хотел бы кое-что уточнить.',
+        'Понятно. А можно подробнее?',
+        'Хм, не уверен, что мне это подходит.',
+        'Хорошо, допустим. Что дальше?',
+    ],
+    'summary': 'Клиент обратился с проблемой, обсудили детали, стоимость и сроки. Договорённости не зафиксированы.'
+}
+
+
+@dataclass
+class GatewayConfig:
+    """Параметры заглушки; значения по умолчанию - быстрый шлюз без ошибок"""
+    latency: str = 'fixed:0.05'
+    tail_rate: float = 0.0
+    tail_latency: float = 2.0
+    tokens_per_second: float = 0.0
+    error_rate: float = 0.0
+    error_status: int = 503
+    retry_after: Optional[float] = None
+    hang_rate: float = 0.0
+    hang_seconds: float = 120.0
+    stream_drop_rate: float = 0.0
+    min_cache_tokens: int = 1024
+    seed: int = 42
+    script: Dict = field(default_factory=lambda: DEFAULT_SCRIPT)
+
+
+class LatencyModel:
+    """Задержка до первого токена: 'fixed:S', 'uniform:LO,HI' или 'lognormal:MEDIAN,SIGMA' (сек)"""
+
+    def __init__(self, spec: str, tail_rate: float, tail_latency: float, rng: random.Random):
+        kind, _, raw = spec.partition(':')
+        params = [float(value) for value in raw.split(',') if value]
+        if kind == 'fixed' and len(params) == 1:
+            self._sample = lambda: params[0]
+        elif kind == 'uniform' and len(params) == 2:
+            self._sample = lambda: rng.uniform(params[0], params[1])
+        elif kind == 'lognormal' and len(params) == 2:
+            self._sample = lambda: rng.lognormvariate(math.log(params[0]), params[1])
+        else:
+            raise ValueError(f"Неизвестное распределение задержки: {spec}")
+        self._tail_rate = tail_rate
+        self._tail_latency = tail_latency
+        self._rng = rng
+
+    def sample(self) -> float:
+        if self._tail_rate and self._rng.random() < self._tail_rate:
+            return self._tail_latency
+        return self._sample()
+
+
+class FakeRouterAI:
+    """HTTP-сервер заглушки в фоновом потоке"""
+
+    def __init__(self, config: Optional[GatewayConfig] = None):
+        self.config = config or GatewayConfig()
+        self._rng = random.Random(self.config.seed)
+        self._rng_lock = threading.Lock()
+        self._latency = LatencyModel(
+            self.config.latency, self.config.tail_rate, self.config.tail_latency, self._rng
+        )
+        self._personas: List[Tuple[re.Pattern, List[str]]] = [
+            (re.compile(item['match'], re.IGNORECASE), item['replies'])
+            for item in self.config.script.get('personas', [])
+        ]
+        self._counter = OfflineTokenCounter()
+        self._prefixes: 'OrderedDict[str, int]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._server: Optional[http.server.ThreadingHTTPServer] = None
+        self.reset_stats()
+
+    def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        """Запустить сервер; возвращает URL для ROUTERAI_API_URL"""
+        gateway = self
+
+        class Handler(_Handler):
+            pass
+        Handler.gateway = gateway
+
+        self._server = _Server((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f"http://{host}:{self._server.server_address[1]}/v1/chat/completions"
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._stats = {
+                'requests': 0,
+                'streams': 0,
+                'summaries': 0,
+                'injected_errors': 0,
+                'hangs': 0,
+                'dropped_streams': 0,
+                'prompt_tokens': 0,
+                'cached_tokens': 0,
+                'completion_tokens': 0,
+                'in_flight': 0,
+                'max_in_flight': 0,
+            }
+
+    def plan(self) -> dict:
+        """Случайные решения для одного запроса (под общим seed)"""
+        with self._rng_lock:
+            roll = self._rng.random()
+            error = roll < self.config.error_rate
+            hang = not error and roll < self.config.error_rate + self.config.hang_rate
+            return {
+                'error': error,
+                'hang': hang,
+                'drop': self._rng.random() < self.config.stream_drop_rate,
+                'latency': self._latency.sample()
+            }
+
+    def reply_for(self, messages: List[dict]) -> Tuple[str, bool]:
+        """(текст ответа, это запрос саммари)"""
+        system = ' '.join(_text(m) for m in messages if m.get('role') == 'system')
+        if 'саммари' in system:
+            return self.config.script.get('summary', DEFAULT_SCRIPT['summary']), True
+
+        turn = sum(1 for m in messages if m.get('role') == 'user') - 1
+        for pattern, replies in self._personas:
+            if pattern.search(system):
+                return replies[turn % len(replies)], False
+        replies = self.config.script.get('default') or DEFAULT_SCRIPT['default']
+        return replies[turn % len(replies)], False
+
+    def usage_for(self, messages: List[dict], reply: str) -> dict:
+        """usage в формате OpenAI; cached_tokens - самый длинный уже виденный размеченный префикс"""
+        prompt_tokens = 0
+        cached_tokens = 0
+        breakpoints = []
+        digest = hashlib.sha1()
+        for message in messages:
+            text = _text(message)
+            prompt_tokens += self._counter.count(text) + 4
+            digest.update(message.get('role', '').encode() + b'\0' + text.encode() + b'\0')
+            if _has_cache_control(message) and prompt_tokens >= self.config.min_cache_tokens:
+                breakpoints.append((digest.hexdigest(), prompt_tokens))
+
+        with self._lock:
+            for key, tokens in breakpoints:
+                if key in self._prefixes:
+                    self._prefixes.move_to_end(key)
+                    cached_tokens = max(cached_tokens, tokens)
+                else:
+                    self._prefixes[key] = tokens
+                    if len(self._prefixes) > 4096:
+                        self._prefixes.popitem(last=False)
+
+        completion_tokens = self._counter.count(reply)
+        return {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens,
+            'prompt_tokens_details': {'cached_tokens': cached_tokens}
+        }
+
+    def count(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self._stats[name] += value
+            if name == 'in_flight':
+                self._stats['max_in_flight'] = max(self._stats['max_in_flight'], self._stats['in_flight'])
+
+
+class _Server(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    # Очередь accept по умолчанию (5) рвёт пачку одновременных соединений
+    request_queue_size = 1024
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    gateway: FakeRouterAI = None
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/stats':
+            self._json(200, self.gateway.stats())
+        else:
+            self._json(404, {'error': {'message': 'not found'}})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._json(404, {'error': {'message': 'not found'}})
+            return
+        if not self.headers.get('Authorization', '').startswith('Bearer '):
+            self._json(401, {'error': {'message': 'missing api key'}})
+            return
+
+        gateway = self.gateway
+        gateway.count('requests')
+        gateway.count('in_flight')
+        try:
+            self._complete(json.loads(body or b'{}'))
+        finally:
+            gateway.count('in_flight', -1)
+
+    def log_message(self, *args):
+        pass
+
+    def _complete(self, request: dict) -> None:
+        gateway = self.gateway
+        config = gateway.config
+        plan = gateway.plan()
+
+        if plan['hang']:
+            gateway.count('hangs')
+            time.sleep(config.hang_seconds)
+        time.sleep(plan['latency'])
+
+        if plan['error']:
+            gateway.count('injected_errors')
+            headers = {'Retry-After': f"{config.retry_after:g}"} if config.retry_after is not None else {}
+            self._json(config.error_status, {'error': {'message': 'injected error'}}, headers)
+            return
+
+        messages = request.get('messages') or []
+        reply, is_summary = gateway.reply_for(messages)
+        usage = gateway.usage_for(messages, reply)
+        gateway.count('summaries', int(is_summary))
+        gateway.count('prompt_tokens', usage['prompt_tokens'])
+        gateway.count('cached_tokens', usage['prompt_tokens_details']['cached_tokens'])
+        gateway.count('completion_tokens', usage['completion_tokens'])
+
+        if request.get('stream'):
+            gateway.count('streams')
+            self._stream(reply, usage, request.get('model', ''), plan['drop'])
+            return
+
+        if config.tokens_per_second:
+            time.sleep(usage['completion_tokens'] / config.tokens_per_second)
+        self._json(200, {
+            'id': f"chatcmpl-{gateway.stats()['requests']}",
+            'object': 'chat.completion',
+            'model': request.get('model', ''),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': reply}, 'finish_reason': 'stop'}],
+            'usage': usage
+        })
+
+    def _stream(self, reply: str, usage: dict, model: str, drop: bool) -> None:
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        pieces = re.findall(r'\S+\s*', reply) or [reply]
+        delay = 0.0
+        if self.gateway.config.tokens_per_second:
+            delay = usage['completion_tokens'] / self.gateway.config.tokens_per_second / len(pieces)
+
+        for index, piece in enumerate(pieces):
+            if drop and index == len(pieces) // 2:
+                self.gateway.count('dropped_streams')
+                self.close_connection = True
+                return
+            self._chunk({'object': 'chat.completion.chunk', 'model': model,
+                         'choices': [{'index': 0, 'delta': {'content': piece}}]})
+            if delay:
+                time.sleep(delay)
+
+        self._chunk({'object': 'chat.completion.chunk', 'model': model, 'choices': [], 'usage': usage})
+        self._write_chunk(b'data: [DONE]\n\n')
+        self._write_chunk(b'')
+
+    def _chunk(self, data: dict) -> None:
+        self._write_chunk(f"data: {json.dumps(data, ensure_ascii=False)}\n\n".encode())
+
+    def _write_chunk(self, payload: bytes) -> None:
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(payload), payload))
+        self.wfile.flush()
+
+    def _json(self, status: int, data: dict, headers: Optional[dict] = None) -> None:
+        body = json.dumps(data, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _text(message: dict) -> str:
+    content = message.get('content', '')
+    if isinstance(content, list):
+        return ''.join(part.get('text', '') for part in content)
+    return content
+
+
+def _has_cache_control(message: dict) -> bool:
+    content = message.get('content')
+    return isinstance(content, list) and any('cache_control' in part for part in content)
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Параметры заглушки для CLI этого модуля и бенчмарков, которые её поднимают"""
+    defaults = GatewayConfig()
+    parser.add_argument('--latency', default=defaults.latency,
+                        help="fixed:S | uniform:LO,HI | lognormal:MEDIAN,SIGMA (сек до первого токена)")
+    parser.add_argument('--tail-rate', type=float, default=defaults.tail_rate)
+    parser.add_argument('--tail-latency', type=float, default=defaults.tail_latency)
+    parser.add_argument('--tokens-per-second', type=float, default=defaults.tokens_per_second,
+                        help='Скорость генерации; 0 - ответ целиком сразу')
+    parser.add_argument('--error-rate', type=float, default=defaults.error_rate)
+    parser.add_argument('--error-status', type=int, default=defaults.error_status)
+    parser.add_argument('--retry-after', type=float, default=defaults.retry_after)
+    parser.add_argument('--hang-rate', type=float, default=defaults.hang_rate)
+    parser.add_argument('--hang-seconds', type=float, default=defaults.hang_seconds)
+    parser.add_argument('--stream-drop-rate', type=float, default=defaults.stream_drop_rate)
+    parser.add_argument('--seed', type=int, default=defaults.seed)
+    parser.add_argument('--script', help='JSON со сценарием реплик (формат DEFAULT_SCRIPT)')
+
+
+def config_from_args(args: argparse.Namespace) -> GatewayConfig:
+    script = DEFAULT_SCRIPT
+    if args.script:
+        with open(args.script, encoding='utf-8') as f:
+            script = json.load(f)
+    return GatewayConfig(
+        latency=args.latency,
+        tail_rate=args.tail_rate,
+        tail_latency=args.tail_latency,
+        tokens_per_second=args.tokens_per_second,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        retry_after=args.retry_after,
+        hang_rate=args.hang_rate,
+        hang_seconds=args.hang_seconds,
+        stream_drop_rate=args.stream_drop_rate,
+        seed=args.seed,
+        script=script
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    gateway = FakeRouterAI(config_from_args(args))
+    url = gateway.start(args.host, args.port)
+    print(f"[FAKE_ROUTERAI] Слушаю {url}, статистика: GET /stats")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        gateway.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+"""
+Локальный HTTP-адаптер для облачных функций: HTTP-запрос -> event -> handler(event, context) -> HTTP-ответ.
+Повторяет то, что делает шлюз перед функцией, поэтому бенчмарки и фронтенд
+могут ходить в backend/* по HTTP без деплоя.
+
+Функция выбирается по первому сегменту пути (имена как в backend/func2url.json):
+    POST /auth-api/            {"action": "login", ...}
+    GET  /yandex-llm/?action=scenarios
+
+Тело ответа с isBase64Encoded декодируется, итератор (stream_handler) отдаётся
+по частям через chunked transfer.
+
+Запуск:
+    DATABASE_URL=postgresql://... MAIN_DB_SCHEMA=... ROUTERAI_API_KEY=... \\
+        python benchmarks/http_adapter.py [--port 8800] [--functions auth-api,yandex-llm]
+
+Или из бенчмарка:
+    adapter = FunctionAdapter({'auth-api': auth.handler, 'yandex-llm': training.stream_handler})
+    base_url = adapter.start()
+"""
+import argparse
+import base64
+import http.server
+import importlib.util
+import json
+import os
+import sys
+import threading
+import time
+from types import ModuleType
+from typing import Callable, Dict, Optional
+from urllib.parse import parse_qsl, urlsplit
+
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+
+
+def load_module(name: str) -> ModuleType:
+    """
+    Импортировать backend/<name>/index.py под уникальным именем модуля,
+    чтобы index.py разных функций не затирали друг друга в sys.modules.
+    """
+    module_name = name.replace('-', '_') + '_index'
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(BACKEND_DIR, name, 'index.py'))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+class FunctionAdapter:
+    """HTTP-сервер с маршрутизацией /<function>/... на handler функции"""
+
+    def __init__(self, functions: Dict[str, Callable]):
+        self.functions = functions
+        self._server: Optional[_Server] = None
+
+    def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        """Запустить сервер; возвращает базовый URL"""
+        adapter = self
+
+        class Handler(_Handler):
+            pass
+        Handler.adapter = adapter
+
+        self._server = _Server((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f"http://{host}:{self._server.server_address[1]}"
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    @staticmethod
+    def build_event(method: str, path: str, headers: dict, body: bytes, client_ip: str) -> dict:
+        """Событие в формате, который функции получают от шлюза"""
+        parts = urlsplit(path)
+        return {
+            'httpMethod': method,
+            'path': parts.path,
+            'queryStringParameters': dict(parse_qsl(parts.query)),
+            'headers': headers,
+            'body': body.decode('utf-8') if body else '',
+            'isBase64Encoded': False,
+            'requestContext': {'identity': {'sourceIp': client_ip}}
+        }
+
+
+class _Server(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    # Очередь accept по умолчанию (5) рвёт пачку одновременных соединений
+    request_queue_size = 1024
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    adapter: FunctionAdapter = None
+
+    def do_GET(self):
+        self._dispatch()
+
+    def do_POST(self):
+        self._dispatch()
+
+    def do_OPTIONS(self):
+        self._dispatch()
+
+    def log_message(self, *args):
+        pass
+
+    def _dispatch(self) -> None:
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        parts = urlsplit(self.path)
+        name, _, rest = parts.path.lstrip('/').partition('/')
+        function = self.adapter.functions.get(name)
+        if function is None:
+            self._send(404, {'Content-Type': 'application/json'},
+                       json.dumps({'error': f'Функция {name} не найдена'}).encode())
+            return
+
+        path = '/' + rest + (f'?{parts.query}' if parts.query else '')
+        event = FunctionAdapter.build_event(
+            self.command, path, dict(self.headers.items()), body, self.client_address[0]
+        )
+        response = function(event, None)
+
+        status = response.get('statusCode', 200)
+        headers = response.get('headers') or {}
+        payload = response.get('body', '')
+        if isinstance(payload, str):
+            if response.get('isBase64Encoded'):
+                self._send(status, headers, base64.b64decode(payload))
+            else:
+                self._send(status, headers, payload.encode('utf-8'))
+            return
+
+        self.send_response(status)
+        for header, value in headers.items():
+            self.send_header(header, value)
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for frame in payload:
+            self._write_chunk(frame.encode('utf-8'))
+        self._write_chunk(b'')
+
+    def _send(self, status: int, headers: dict, body: bytes) -> None:
+        self.send_response(status)
+        for header, value in headers.items():
+            self.send_header(header, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, payload: bytes) -> None:
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(payload), payload))
+        self.wfile.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8800)
+    parser.add_argument('--functions', default='auth-api,yandex-llm')
+    args = parser.parse_args()
+
+    # stream_handler отдаёт SSE по частям, остальные запросы передаёт в handler
+    entries = {'yandex-llm': 'stream_handler'}
+    functions = {
+        name: getattr(load_module(name), entries.get(name, 'handler'))
+        for name in args.functions.split(',')
+    }
+    adapter = FunctionAdapter(functions)
+    url = adapter.start(args.host, args.port)
+    print(f"[HTTP_ADAPTER] Слушаю {url}: " + ', '.join(f"{url}/{name}/" for name in functions))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        adapter.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+"""
+Микробенчмарк: запросы репозитория диалогов с литералами в тексте SQL
+(как было: f-string + _escape_str) против серверных prepared statements.
+
+Меряет время на клиенте и Planning Time из EXPLAIN ANALYZE на сервере.
+Работает на временных таблицах, миграции не нужны.
+
+Запуск:
+    DATABASE_URL=postgresql://... python benchmarks/prepared_statements_bench.py [--iterations 500]
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime
+
+import psycopg2
+from psycopg2.extras import Json
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'yandex-llm'))
+
+from infrastructure.db_pool import PooledConnection, execute_prepared
+
+
+SETUP_SQL = """
+CREATE TEMP TABLE bench_dialogs (
+    id VARCHAR(36) PRIMARY KEY,
+    scenario JSONB NOT NULL,
+    messages JSONB NOT NULL DEFAULT '[]',
+    total_tokens INTEGER DEFAULT 0,
+    created_at TIMESTAMP NOT NULL,
+    updated_at TIMESTAMP NOT NULL
+)
+"""
+
+UPSERT_PREPARED = """
+    INSERT INTO bench_dialogs (id, scenario, messages, total_tokens, created_at, updated_at)
+    VALUES ($1, $2, $3, $4, $5, $6)
+    ON CONFLICT (id) DO UPDATE SET
+        messages = EXCLUDED.messages,
+        total_tokens = EXCLUDED.total_tokens,
+        updated_at = EXCLUDED.updated_at
+"""
+
+SELECT_PREPARED = """
+    SELECT id, scenario, messages, total_tokens, created_at, updated_at
+    FROM bench_dialogs
+    WHERE id = $1
+"""
+
+
+def _escape_str(value: str) -> str:
+    return value.replace("'", "''")
+
+
+def build_payload(messages_count: int) -> list:
+    text = "Здравствуйте, у меня болит зуб уже второй день, можно записаться? " * 4
+    return [
+        {
+            'role': 'user' if i % 2 == 0 else 'assistant',
+            'content': text,
+            'timestamp': datetime.now().isoformat(),
+            'token_count': len(text) // 4
+        }
+        for i in range(messages_count)
+    ]
+
+
+def upsert_literal(cur, dialog_id: str, scenario: dict, messages: list) -> None:
+    now = datetime.now().isoformat()
+    cur.execute(f"""
+        INSERT INTO bench_dialogs (id, scenario, messages, total_tokens, created_at, updated_at)
+        VALUES (
+            '{_escape_str(dialog_id)}',
+            '{_escape_str(json.dumps(scenario))}'::jsonb,
+            '{_escape_str(json.dumps(messages))}'::jsonb,
+            {len(messages)},
+            '{now}'::timestamp,
+            '{now}'::timestamp
+        )
+        ON CONFLICT (id) DO UPDATE SET
+            messages = EXCLUDED.messages,
+            total_tokens = EXCLUDED.total_tokens,
+            updated_at = EXCLUDED.updated_at
+    """)
+
+
+def upsert_prepared(cur, dialog_id: str, scenario: dict, messages: list) -> None:
+    now = datetime.now()
+    execute_prepared(
+        cur, 'bench_upsert', UPSERT_PREPARED,
+        (dialog_id, Json(scenario), Json(messages), len(messages), now, now)
+    )
+
+
+def select_literal(cur, dialog_id: str) -> None:
+    cur.execute(f"""
+        SELECT id, scenario, messages, total_tokens, created_at, updated_at
+        FROM bench_dialogs
+        WHERE id = '{_escape_str(dialog_id)}'
+    """)
+    cur.fetchone()
+
+
+def select_prepared(cur, dialog_id: str) -> None:
+    execute_prepared(cur, 'bench_select', SELECT_PREPARED, (dialog_id,))
+    cur.fetchone()
+
+
+def timed(fn, iterations: int) -> dict:
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        'mean_ms': round(statistics.mean(samples), 3),
+        'p50_ms': round(samples[len(samples) // 2], 3),
+        'p95_ms': round(samples[int(len(samples) * 0.95) - 1], 3)
+    }
+
+
+def planning_time(cur, statement: str, params: tuple = None) -> float:
+    cur.execute(f"EXPLAIN (ANALYZE, SUMMARY ON) {statement}", params)
+    plan = "\n".join(row[0] for row in cur.fetchall())
+    match = re.search(r'Planning Time: ([\d.]+) ms', plan)
+    return float(match.group(1)) if match else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--iterations', type=int, default=500)
+    parser.add_argument('--messages', type=int, default=40, help='Сообщений в payload диалога')
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(os.environ['DATABASE_URL'], connection_factory=PooledConnection)
+    conn.autocommit = True
+    cur = conn.cursor()
+    cur.execute(SETUP_SQL)
+
+    scenario = {'id': 'bench', 'title': 'Бенчмарк', 'description': '', 'system_prompt': 'Ты пациент'}
+    messages = build_payload(args.messages)
+    dialog_id = str(uuid.uuid4())
+    payload_kb = len(json.dumps(messages)) / 1024
+
+    results = {
+        'upsert_literal': timed(lambda: upsert_literal(cur, dialog_id, scenario, messages), args.iterations),
+        'upsert_prepared': timed(lambda: upsert_prepared(cur, dialog_id, scenario, messages), args.iterations),
+        'select_literal': timed(lambda: select_literal(cur, dialog_id), args.iterations),
+        'select_prepared': timed(lambda: select_prepared(cur, dialog_id), args.iterations),
+    }
+
+    plan_literal = [
+        planning_time(cur, f"SELECT * FROM bench_dialogs WHERE id = '{_escape_str(dialog_id)}'")
+        for _ in range(20)
+    ]
+    plan_prepared = [
+        planning_time(cur, "EXECUTE bench_select (%s)", (dialog_id,))
+        for _ in range(20)
+    ]
+
+    print(f"payload: {args.messages} сообщений, {payload_kb:.1f} KB, iterations={args.iterations}")
+    for name, stats in results.items():
+        print(f"  {name:<16} mean={stats['mean_ms']:.3f} ms  p50={stats['p50_ms']:.3f} ms  "
+              f"p95={stats['p95_ms']:.3f} ms")
+    print(f"  planning (server) literal={statistics.median(plan_literal):.3f} ms  "
+          f"prepared={statistics.median(plan_prepared):.3f} ms")
+
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
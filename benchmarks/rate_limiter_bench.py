@@ -0,0 +1,93 @@
+"""
+Бенчмарк rate limiter: прежняя реализация (список отметок времени на клиента)
+против O(1)-движков sliding_window и token_bucket на 100k разных клиентов.
+
+Запуск:
+    python benchmarks/rate_limiter_bench.py [--clients 100000] [--requests 500000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend', 'yandex-llm'))
+
+from infrastructure.rate_limiter import RateLimiter
+
+
+class LegacyRateLimiter:
+    """Реализация до перехода на движки: список отметок времени на клиента"""
+
+    def __init__(self, max_requests: int = 10, window_seconds: int = 60):
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+        self._requests = defaultdict(list)
+
+    def is_allowed(self, client_id: str) -> bool:
+        now = time.time()
+        self._requests[client_id] = [
+            ts for ts in self._requests[client_id]
+            if now - ts < self.window_seconds
+        ]
+        if len(self._requests[client_id]) >= self.max_requests:
+            return False
+        self._requests[client_id].append(now)
+        return True
+
+    def get_remaining(self, client_id: str) -> int:
+        now = time.time()
+        self._requests[client_id] = [
+            ts for ts in self._requests[client_id]
+            if now - ts < self.window_seconds
+        ]
+        return max(0, self.max_requests - len(self._requests[client_id]))
+
+
+def run(name: str, limiter, client_ids: list) -> None:
+    tracemalloc.start()
+    started = time.perf_counter()
+    allowed = 0
+    for client_id in client_ids:
+        if limiter.is_allowed(client_id):
+            allowed += 1
+        else:
+            limiter.get_remaining(client_id)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"  {name:<15} {len(client_ids) / elapsed:>12,.0f} checks/s  "
+          f"{elapsed / len(client_ids) * 1e6:6.2f} us/check  "
+          f"allowed={allowed:<8} peak_mem={peak / 1024 / 1024:7.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--clients', type=int, default=100_000)
+    parser.add_argument('--requests', type=int, default=500_000)
+    parser.add_argument('--max-requests', type=int, default=20)
+    parser.add_argument('--hot-share', type=float, default=0.2,
+                        help='Доля запросов от 1% "горячих" клиентов')
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    clients = [f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(args.clients)]
+    hot = clients[:max(1, args.clients // 100)]
+    client_ids = [
+        rng.choice(hot) if rng.random() < args.hot_share else rng.choice(clients)
+        for _ in range(args.requests)
+    ]
+
+    print(f"clients={args.clients} requests={args.requests} limit={args.max_requests}/60s")
+    run('legacy', LegacyRateLimiter(args.max_requests, 60), client_ids)
+    run('sliding_window', RateLimiter(args.max_requests, 60, 'sliding_window',
+                                      max_clients=args.clients), client_ids)
+    run('token_bucket', RateLimiter(args.max_requests, 60, 'token_bucket',
+                                    max_clients=args.clients), client_ids)
+
+
+if __name__ == '__main__':
+    main()
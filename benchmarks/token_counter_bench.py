@@ -0,0 +1,92 @@
+"""
+Бенчмарк оценки токенов: len(text) // 4 против OfflineTokenCounter.
+Точность сравнивается с эталонным токенизатором, скорость - на всём корпусе
+(холодный проход и повторный, как при пересчёте истории на каждом ходу).
+
+Корпус по умолчанию - абзацы русскоязычных *.md из корня репозитория.
+Эталон: tokenizer.json в формате HuggingFace tokenizers (--tokenizer)
+или кодировка tiktoken (--tiktoken cl100k_base), если установлены.
+
+Запуск:
+    python benchmarks/token_counter_bench.py --tokenizer path/to/tokenizer.json
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+from typing import Callable, List, Optional
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, os.path.join(ROOT, 'backend', 'yandex-llm'))
+
+from infrastructure.token_counter import OfflineTokenCounter, _word_tokens
+
+
+def load_corpus(pattern: str) -> List[str]:
+    texts = []
+    for path in sorted(glob.glob(pattern, recursive=True)):
+        with open(path, encoding='utf-8') as f:
+            texts.extend(p.strip() for p in f.read().split('\n\n') if len(p.strip()) > 20)
+    return texts
+
+
+def load_reference(args) -> Optional[Callable[[str], int]]:
+    if args.tokenizer:
+        from tokenizers import Tokenizer
+        tokenizer = Tokenizer.from_file(args.tokenizer)
+        return lambda text: len(tokenizer.encode(text).ids)
+    if args.tiktoken:
+        import tiktoken
+        encoding = tiktoken.get_encoding(args.tiktoken)
+        return lambda text: len(encoding.encode(text))
+    return None
+
+
+def accuracy(name: str, estimates: List[int], reference: List[int]) -> None:
+    errors = [abs(e - r) / r for e, r in zip(estimates, reference) if r]
+    bias = sum(estimates) / sum(reference) - 1
+    print(f"{name:<22} средняя ошибка {sum(errors) / len(errors) * 100:5.1f}%  "
+          f"смещение суммы {bias * 100:+6.1f}%")
+
+
+def throughput(name: str, count_many: Callable[[List[str]], List[int]], texts: List[str], chars: int) -> None:
+    started = time.perf_counter()
+    count_many(texts)
+    elapsed = time.perf_counter() - started
+    print(f"{name:<22} {elapsed * 1000:8.1f} мс  {chars / elapsed / 1e6:6.2f} млн символов/с")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--corpus', default=os.path.join(ROOT, '*.md'))
+    parser.add_argument('--tokenizer', help='tokenizer.json (HuggingFace tokenizers)')
+    parser.add_argument('--tiktoken', help='Кодировка tiktoken, например cl100k_base')
+    args = parser.parse_args()
+
+    texts = load_corpus(args.corpus)
+    chars = sum(map(len, texts))
+    print(f"Корпус: {len(texts)} текстов, {chars} символов")
+
+    counter = OfflineTokenCounter()
+    heuristic = lambda items: [len(text) // 4 for text in items]
+
+    reference = load_reference(args)
+    if reference:
+        expected = [reference(text) for text in texts]
+        print(f"Эталон: {sum(expected)} токенов, {chars / sum(expected):.2f} символа на токен")
+        accuracy('len // 4', heuristic(texts), expected)
+        accuracy('OfflineTokenCounter', counter.count_many(texts), expected)
+    else:
+        print("Эталонный токенизатор не задан - только скорость")
+
+    _word_tokens.cache_clear()
+    counter = OfflineTokenCounter()
+    throughput('len // 4', heuristic, texts, chars)
+    throughput('Offline (холодный)', counter.count_many, texts, chars)
+    throughput('Offline (повторный)', counter.count_many, texts, chars)
+    print(f"Память счётчика: {counter.stats()}")
+
+
+if __name__ == '__main__':
+    main()
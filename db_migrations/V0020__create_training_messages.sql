@@ -0,0 +1,32 @@
+-- Сообщения тренировочных диалогов: append-only вместо перезаписи JSONB на каждом ходе
+CREATE TABLE IF NOT EXISTS training_messages (
+    dialog_id VARCHAR(36) NOT NULL REFERENCES training_dialogs(id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    role VARCHAR(16) NOT NULL,
+    content TEXT NOT NULL,
+    token_count INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP NOT NULL,
+    PRIMARY KEY (dialog_id, seq)
+);
+
+-- Начало активного окна истории: после саммари старые сообщения остаются в таблице,
+-- а окно начинается с сообщения-саммари. NULL - история ещё в training_dialogs.messages
+ALTER TABLE training_dialogs ADD COLUMN IF NOT EXISTS history_start_seq INTEGER;
+
+-- Перенос существующих диалогов из JSONB
+INSERT INTO training_messages (dialog_id, seq, role, content, token_count, created_at)
+SELECT
+    d.id,
+    (m.ord - 1)::INTEGER,
+    m.msg->>'role',
+    m.msg->>'content',
+    COALESCE((m.msg->>'token_count')::INTEGER, 0),
+    COALESCE((m.msg->>'timestamp')::TIMESTAMP, d.created_at)
+FROM training_dialogs d
+CROSS JOIN LATERAL jsonb_array_elements(d.messages) WITH ORDINALITY AS m(msg, ord)
+WHERE d.history_start_seq IS NULL
+ON CONFLICT (dialog_id, seq) DO NOTHING;
+
+UPDATE training_dialogs
+SET history_start_seq = 0, messages = '[]'::jsonb
+WHERE history_start_seq IS NULL;
@@ -0,0 +1,17 @@
+-- Версия сценариев для дешёвой ревалидации кэша в yandex-llm
+ALTER TABLE training_scenarios
+ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+
+UPDATE training_scenarios SET updated_at = created_at WHERE updated_at IS NULL;
+
+CREATE OR REPLACE FUNCTION touch_training_scenarios_updated_at() RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = CURRENT_TIMESTAMP;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_training_scenarios_updated_at ON training_scenarios;
+CREATE TRIGGER trg_training_scenarios_updated_at
+BEFORE UPDATE ON training_scenarios
+FOR EACH ROW EXECUTE FUNCTION touch_training_scenarios_updated_at();
@@ -0,0 +1,10 @@
+-- Общие для всех инстансов yandex-llm счётчики rate limiting.
+-- UNLOGGED: счётчики краткоживущие, потеря при сбое БД допустима, WAL не нужен
+CREATE UNLOGGED TABLE IF NOT EXISTS rate_limit_counters (
+    client_id VARCHAR(255) NOT NULL,
+    window_start BIGINT NOT NULL,
+    hits INTEGER NOT NULL,
+    PRIMARY KEY (client_id, window_start)
+);
+
+CREATE INDEX IF NOT EXISTS idx_rate_limit_counters_window ON rate_limit_counters(window_start);
@@ -0,0 +1,31 @@
+-- Список отзыва для подписанных токенов сессий (auth-api проверяет их без БД).
+-- id служит эпохой: токен помнит эпоху на момент выпуска
+CREATE TABLE IF NOT EXISTS session_revocations (
+    id BIGSERIAL PRIMARY KEY,
+    session_id VARCHAR(64),
+    user_id INTEGER REFERENCES users(id),
+    expires_at TIMESTAMP NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_session_revocations_expires ON session_revocations(expires_at);
+
+-- Блокировка пользователя отзывает все его токены.
+-- Схема берётся из таблицы триггера: функции не зависят от search_path вызывающего
+CREATE OR REPLACE FUNCTION revoke_sessions_of_blocked_user() RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.is_blocked AND NOT COALESCE(OLD.is_blocked, FALSE) THEN
+        EXECUTE format(
+            'INSERT INTO %I.session_revocations (user_id, expires_at) '
+            'VALUES ($1, CURRENT_TIMESTAMP + INTERVAL ''7 days'')',
+            TG_TABLE_SCHEMA
+        ) USING NEW.id;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_users_blocked_revoke_sessions ON users;
+CREATE TRIGGER trg_users_blocked_revoke_sessions
+AFTER UPDATE OF is_blocked ON users
+FOR EACH ROW EXECUTE FUNCTION revoke_sessions_of_blocked_user();
@@ -0,0 +1,10 @@
+-- session_token уже проиндексирован ограничением UNIQUE, idx_user_sessions_token
+-- дублировал его и удваивал стоимость каждой вставки при логине.
+--
+-- Секционирование user_sessions по expires_at не подходит: уникальный ключ
+-- секционированной таблицы обязан включать ключ секционирования, а logout
+-- меняет expires_at и переносил бы строку между секциями. Частичный индекс
+-- "WHERE expires_at > NOW()" Postgres не допускает (NOW() не IMMUTABLE).
+-- Поэтому рост таблицы ограничивает session-sweeper, удаляя истёкшие сессии
+-- пачками по idx_user_sessions_expires.
+DROP INDEX IF EXISTS idx_user_sessions_token;
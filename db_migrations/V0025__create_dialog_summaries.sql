@@ -0,0 +1,18 @@
+-- Очередь фоновой суммаризации диалогов: саммари начала истории считается
+-- заранее (после мягкого порога) и применяется на ходу без второго вызова LLM
+CREATE TABLE IF NOT EXISTS dialog_summaries (
+    dialog_id VARCHAR(36) PRIMARY KEY REFERENCES training_dialogs(id) ON DELETE CASCADE,
+    from_seq INTEGER NOT NULL,
+    up_to_seq INTEGER NOT NULL,
+    status VARCHAR(16) NOT NULL DEFAULT 'pending',
+    summary TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    locked_until TIMESTAMP,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_dialog_summaries_queue
+    ON dialog_summaries(created_at)
+    WHERE status IN ('pending', 'running');